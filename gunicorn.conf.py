@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for the production serving profile.
+
+SERVER_MODE=wsgi (default) runs project.wsgi with threaded workers.
+SERVER_MODE=asgi runs project.asgi with uvicorn workers, one event loop each.
+Worker and thread counts default to values derived from the CPUs available
+to the container and can be overridden with GUNICORN_* environment variables.
+"""
+import os
+
+
+def _cpu_count():
+    # Respect CPU affinity limits (e.g. docker --cpuset-cpus) where available
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi').lower()
+cpus = _cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+if server_mode == 'asgi':
+    wsgi_app = 'project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Each worker multiplexes I/O on its event loop, so one per CPU is enough
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpus + 1))
+else:
+    wsgi_app = 'project.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpus * 2 + 1))
+    # Threads overlap DB and Redis waits within a worker
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+from project.throttling import throttle_async
+from .intake import parse_wait
+from .models import Order
+from .serializers import OrderSerializer
+
+
+def serialize_order(order_id):
+    order = Order.objects.prefetch_related('order_items__product__category').get(id=order_id)
+    return OrderSerializer(order).data
+
+
+@require_GET
+@throttle_async()
+async def order_detail_async(request, order_id):
+    """
+    Async version of order_detail for ASGI deployments, where a long poll
+    waits on the event loop instead of holding a worker thread.
+    """
+    try:
+        wait = parse_wait(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    statuses = Order.objects.filter(id=order_id).values_list('status', flat=True)
+    order_status = await statuses.afirst()
+    if order_status is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    deadline = time.monotonic() + wait
+    while order_status == Order.PENDING and time.monotonic() < deadline:
+        await asyncio.sleep(min(settings.ORDER_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        order_status = await statuses.afirst()
+
+    data = await sync_to_async(serialize_order)(order_id)
+    return JsonResponse({'order': data, 'status': data['status']}, encoder=JSONEncoder)
@@ -0,0 +1,184 @@
+"""
+Queued order intake with per-store group commit.
+
+With QUEUED_ORDER_INTAKE enabled, create_order only records the order as
+PENDING and answers 202. The PENDING orders of a store are its queue:
+drain_store_orders settles them in id order, ORDER_INTAKE_BATCH_SIZE at a
+time, each batch in one transaction that holds the store row lock. A store
+therefore has a single writer, and each of its inventory rows is locked and
+written once per batch instead of once per order.
+
+Orders are settled first come, first served: an order that does not fit
+in the stock left by the orders before it is rejected, and later, smaller
+orders in the same batch can still be confirmed.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderItem, OutboxMessage
+from stores.hot_stock import compensate_on_error, decrement_hot_stock
+from stores.models import Store, Inventory
+from stores.stock import stock_change_source
+
+# PENDING orders older than this are picked up by the drain_pending_orders
+# sweep in case their drain task was lost
+STALE_PENDING_SECONDS = 10
+
+# How long a scheduled drain blocks scheduling another one for the store
+DRAIN_SCHEDULED_TIMEOUT = 60
+
+
+def drain_scheduled_key(store_id):
+    return f'order_drain_scheduled_{store_id}'
+
+
+def schedule_store_drain(store_id):
+    """
+    Queue a drain of the store's pending orders unless one is already
+    waiting to start.
+    """
+    from project.tasks import drain_store_orders
+
+    if cache.add(drain_scheduled_key(store_id), True, DRAIN_SCHEDULED_TIMEOUT):
+        drain_store_orders.delay(store_id)
+
+
+def settle_batch(store_id, batch_size):
+    """
+    Confirm or reject the store's oldest pending orders in one transaction.
+    Returns the number of orders settled.
+    """
+    from project.tasks import schedule_outbox_relay
+
+    with compensate_on_error(), transaction.atomic():
+        # The store row lock makes this the store's only writer
+        store = Store.objects.select_for_update().filter(id=store_id).first()
+        if store is None:
+            return 0
+
+        orders = list(
+            Order.objects.filter(store_id=store_id, status=Order.PENDING).order_by('id')[:batch_size]
+        )
+        if not orders:
+            return 0
+
+        requested = defaultdict(dict)
+        for order_id, product_id, quantity in OrderItem.objects.filter(
+            order__in=orders
+        ).values_list('order_id', 'product_id', 'quantity_requested'):
+            requested[order_id][product_id] = requested[order_id].get(product_id, 0) + quantity
+
+        product_ids = sorted({product_id for items in requested.values() for product_id in items})
+        stock = {
+            inventory.product_id: inventory
+            for inventory in Inventory.objects.select_for_update().filter(
+                store_id=store_id, product_id__in=product_ids
+            ).order_by('product_id')
+        }
+        remaining = {
+            product_id: inventory.quantity
+            for product_id, inventory in stock.items()
+            if not inventory.is_hot
+        }
+
+        confirmed, rejected = [], []
+        for order in orders:
+            items = requested[order.id]
+            fits = all(
+                product_id in stock and (
+                    stock[product_id].is_hot or remaining[product_id] >= quantity
+                )
+                for product_id, quantity in items.items()
+            )
+            hot_items = {
+                product_id: quantity
+                for product_id, quantity in items.items()
+                if product_id in stock and stock[product_id].is_hot
+            }
+            if fits and hot_items and decrement_hot_stock(store_id, hot_items):
+                fits = False
+            if not fits:
+                rejected.append(order.id)
+                continue
+            for product_id, quantity in items.items():
+                if product_id in remaining:
+                    remaining[product_id] -= quantity
+            confirmed.append(order)
+
+        # One write per inventory row for the whole batch
+        with stock_change_source('order'):
+            for product_id, quantity in remaining.items():
+                inventory = stock[product_id]
+                if inventory.quantity != quantity:
+                    inventory.quantity = quantity
+                    inventory.save(update_fields=['quantity'])
+
+        Order.objects.filter(id__in=[order.id for order in confirmed]).update(status=Order.CONFIRMED)
+        Order.objects.filter(id__in=rejected).update(status=Order.REJECTED)
+        if confirmed:
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage.order_confirmed(order, store) for order in confirmed
+            ])
+            transaction.on_commit(schedule_outbox_relay, robust=True)
+
+    return len(orders)
+
+
+def drain_store(store_id, batch_size=None):
+    """
+    Settle the store's pending orders batch by batch until none are left.
+    Returns the number of orders settled.
+    """
+    batch_size = batch_size or settings.ORDER_INTAKE_BATCH_SIZE
+    # Orders queued from now on schedule a new drain, so none are stranded
+    cache.delete(drain_scheduled_key(store_id))
+
+    settled = 0
+    while True:
+        count = settle_batch(store_id, batch_size)
+        settled += count
+        if count < batch_size:
+            return settled
+
+
+def stale_pending_stores():
+    """
+    Stores with pending orders that have waited longer than a drain should take.
+    """
+    cutoff = timezone.now() - timedelta(seconds=STALE_PENDING_SECONDS)
+    return list(
+        Order.objects.filter(
+            status=Order.PENDING, created_at__lte=cutoff
+        ).values_list('store_id', flat=True).distinct().order_by()
+    )
+
+
+def parse_wait(params):
+    """
+    Seconds a status request may wait for its order to leave PENDING,
+    capped at ORDER_POLL_MAX_WAIT. Raises ValueError on bad input.
+    """
+    try:
+        wait = float(params.get('wait', 0))
+    except ValueError:
+        raise ValueError('wait must be a number of seconds')
+    if wait < 0:
+        raise ValueError('wait must not be negative')
+    return min(wait, settings.ORDER_POLL_MAX_WAIT)
+
+
+def wait_for_order(order, wait):
+    """
+    Poll the order's status until it is settled or `wait` seconds pass.
+    """
+    deadline = time.monotonic() + wait
+    while order.status == Order.PENDING and time.monotonic() < deadline:
+        time.sleep(min(settings.ORDER_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        order.status = Order.objects.filter(id=order.id).values_list('status', flat=True).get()
+    return order
@@ -0,0 +1,27 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRejection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('store_id', models.IntegerField()),
+                ('items', models.JSONField(default=dict)),
+                ('insufficient_stock', models.JSONField(default=list)),
+                ('stage', models.CharField(choices=[('precheck', 'Pre-check'), ('checkout', 'Checkout')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['store_id', 'created_at'], name='rejection_store_created_idx')],
+            },
+        ),
+    ]
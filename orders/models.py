@@ -1,4 +1,7 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 
 
 class Order(models.Model):
@@ -15,11 +18,26 @@ class Order(models.Model):
     store = models.ForeignKey('stores.Store', on_delete=models.CASCADE, related_name='orders')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the order is counted in the sales rollups (orders.rollups)
+    rolled_up = models.BooleanField(default=False)
     
     class Meta:
         indexes = [
             models.Index(fields=['store', 'created_at']),
-            models.Index(fields=['status']),
+            # Order history for a store filtered by status, newest first
+            models.Index(fields=['store', 'status', 'created_at'], name='order_store_status_created_idx'),
+            # Queued orders waiting for their store's drain, oldest first
+            models.Index(
+                fields=['store', 'id'],
+                condition=models.Q(status='PENDING'),
+                name='order_pending_queue_idx',
+            ),
+            # Confirmed orders not yet counted in the sales rollups
+            models.Index(
+                fields=['id'],
+                condition=models.Q(status='CONFIRMED', rolled_up=False),
+                name='order_rollup_queue_idx',
+            ),
         ]
         ordering = ['-created_at']
     
@@ -42,3 +60,198 @@ class OrderItem(models.Model):
     
     def __str__(self):
         return f'{self.product.title} (x{self.quantity_requested})'
+
+
+class OutboxMessage(models.Model):
+    """
+    Message written in the same transaction as the change it announces.
+    A relay task publishes pending messages to Celery after the commit.
+    """
+    ORDER_CONFIRMED = 'order.confirmed'
+    
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Only undelivered messages are scanned by the relay
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(dispatched_at__isnull=True),
+                name='outbox_pending_idx',
+            ),
+        ]
+        ordering = ['id']
+    
+    def __str__(self):
+        return f'{self.topic} #{self.id}'
+    
+    @classmethod
+    def order_confirmed(cls, order, store):
+        """
+        Unsaved confirmation message for an order.
+        """
+        return cls(
+            topic=cls.ORDER_CONFIRMED,
+            payload={
+                'order_id': order.id,
+                'store_name': store.name,
+                'customer_email': 'customer@example.com'  # In real app, get from request
+            }
+        )
+
+
+class Reservation(models.Model):
+    """
+    Short-lived hold on stock for a cart.
+    
+    Stock is deducted when the hold is placed, so confirming it only turns
+    the reservation into an order. Holds that are neither confirmed nor
+    released before expires_at are returned to stock by a sweep task.
+    """
+    ACTIVE = 'ACTIVE'
+    CONFIRMED = 'CONFIRMED'
+    RELEASED = 'RELEASED'
+    EXPIRED = 'EXPIRED'
+    
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (CONFIRMED, 'Confirmed'),
+        (RELEASED, 'Released'),
+        (EXPIRED, 'Expired'),
+    ]
+    
+    # Random ids, since holding the id is what allows confirming or releasing
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    store = models.ForeignKey('stores.Store', on_delete=models.CASCADE, related_name='reservations')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACTIVE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    order = models.OneToOneField(
+        Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservation'
+    )
+    
+    class Meta:
+        indexes = [
+            # Only active holds are scanned by the expiry sweep
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='ACTIVE'),
+                name='reservation_active_expiry_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'Reservation {self.id} ({self.status})'
+
+
+class ReservationItem(models.Model):
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    
+    def __str__(self):
+        return f'{self.product_id} (x{self.quantity})'
+
+
+class OrderRejection(models.Model):
+    """
+    Order attempt rejected for lack of stock. Kept out of the order tables
+    and written in batches by orders.rejections.
+    """
+    PRECHECK = 'precheck'
+    CHECKOUT = 'checkout'
+    
+    STAGE_CHOICES = [
+        (PRECHECK, 'Pre-check'),
+        (CHECKOUT, 'Checkout'),
+    ]
+    
+    # Plain ids: log entries must not block deleting stores or products
+    store_id = models.IntegerField()
+    items = models.JSONField(default=dict)
+    insufficient_stock = models.JSONField(default=list)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['store_id', 'created_at'], name='rejection_store_created_idx'),
+        ]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f'Rejected order for store #{self.store_id} ({self.stage})'
+
+
+class StoreSalesRollup(models.Model):
+    """
+    Units and orders a store sold in one hour or day (UTC), maintained
+    incrementally by orders.rollups from confirmed orders.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    
+    PERIOD_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    
+    store = models.ForeignKey('stores.Store', on_delete=models.CASCADE, related_name='sales_rollups')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store', 'period', 'period_start'], name='store_sales_rollup_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'Store #{self.store_id} {self.period} {self.period_start:%Y-%m-%d %H:%M}: {self.units}'
+
+
+class ProductSalesRollup(models.Model):
+    """
+    Units of one product a store sold in one hour or day (UTC), and the
+    number of orders they came in.
+    """
+    store = models.ForeignKey('stores.Store', on_delete=models.CASCADE, related_name='product_sales_rollups')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='sales_rollups')
+    period = models.CharField(max_length=10, choices=StoreSalesRollup.PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            # Also serves a store's top products over a range of periods
+            models.UniqueConstraint(
+                fields=['store', 'period', 'period_start', 'product'], name='product_sales_rollup_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return (
+            f'Store #{self.store_id} product #{self.product_id} '
+            f'{self.period} {self.period_start:%Y-%m-%d %H:%M}: {self.units}'
+        )
+
+
+class SalesRollupState(models.Model):
+    """
+    Single row locked by each sales rollup run, so the rollup rows have one
+    writer at a time. updated_at is when orders were last rolled up.
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f'Sales rolled up at {self.updated_at}'
@@ -0,0 +1,72 @@
+"""
+Batched log of rejected order attempts.
+
+Rejections are buffered in the process and written with one bulk insert
+once REJECTION_LOG_BATCH_SIZE entries are waiting or the oldest has waited
+REJECTION_LOG_FLUSH_INTERVAL seconds (checked when the next one arrives),
+and when the process exits. The log is best effort: entries still in the
+buffer of a process that is killed are lost.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import OrderRejection
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = []
+_oldest = None
+
+
+def log_rejection(store_id, product_quantities, insufficient_stock, stage):
+    """
+    Queue a rejected attempt for the log, flushing if a batch is due.
+    """
+    global _oldest
+
+    entry = OrderRejection(
+        store_id=store_id,
+        items={str(product_id): quantity for product_id, quantity in product_quantities.items()},
+        insufficient_stock=insufficient_stock,
+        stage=stage
+    )
+    with _lock:
+        _buffer.append(entry)
+        if _oldest is None:
+            _oldest = time.monotonic()
+        due = (
+            len(_buffer) >= settings.REJECTION_LOG_BATCH_SIZE or
+            time.monotonic() - _oldest >= settings.REJECTION_LOG_FLUSH_INTERVAL
+        )
+    if due:
+        flush_rejections()
+
+
+def flush_rejections():
+    """
+    Write the buffered rejections. Returns how many were written.
+    """
+    global _oldest
+
+    with _lock:
+        batch = _buffer[:]
+        _buffer.clear()
+        _oldest = None
+    if not batch:
+        return 0
+
+    try:
+        OrderRejection.objects.bulk_create(batch)
+    except DatabaseError:
+        logger.exception('Could not write %d order rejections', len(batch))
+        return 0
+    return len(batch)
+
+
+atexit.register(flush_rejections)
@@ -0,0 +1,178 @@
+"""
+Incrementally maintained sales rollups.
+
+StoreSalesRollup and ProductSalesRollup hold the units sold and the number
+of orders per store, and per store and product, for each hour and day
+(UTC). roll_up_sales folds confirmed orders that are not rolled up yet into
+them, and sets their rolled_up flag in the same transaction, so an order is
+counted exactly once and reports never scan OrderItem.
+
+Orders are picked by their committed state rather than by id or time: an
+order is only seen once the transaction confirming it has committed,
+however long that took, and orders still PENDING in one store hold up
+nothing. The partial order_rollup_queue_idx index keeps the lookup small.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderItem, ProductSalesRollup, SalesRollupState, StoreSalesRollup
+
+# Default reporting range per period when ?since= is not given
+DEFAULT_RANGES = {
+    StoreSalesRollup.HOUR: timedelta(hours=48),
+    StoreSalesRollup.DAY: timedelta(days=30),
+}
+DEFAULT_TOP_PRODUCTS = 10
+MAX_TOP_PRODUCTS = 100
+
+
+def period_starts(moment):
+    """
+    Start of the hour and of the day moment falls in, in UTC.
+    """
+    moment = moment.astimezone(dt_timezone.utc)
+    hour = moment.replace(minute=0, second=0, microsecond=0)
+    return [
+        (StoreSalesRollup.HOUR, hour),
+        (StoreSalesRollup.DAY, hour.replace(hour=0)),
+    ]
+
+
+def apply_totals(model, key_fields, totals):
+    """
+    Add totals, {key: [units, orders]}, to the model's rollup rows,
+    creating the rows that do not exist yet.
+    """
+    if not totals:
+        return
+    # One query for a superset of the rows, matched up by key here
+    lookups = {
+        f'{field}__in': {key[position] for key in totals}
+        for position, field in enumerate(key_fields)
+    }
+    existing = {
+        tuple(getattr(row, field) for field in key_fields): row
+        for row in model.objects.filter(**lookups)
+    }
+    updated = []
+    created = []
+    for key, (units, orders) in totals.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(model(units=units, orders=orders, **dict(zip(key_fields, key))))
+            continue
+        row.units += units
+        row.orders += orders
+        updated.append(row)
+    model.objects.bulk_update(updated, ['units', 'orders'])
+    model.objects.bulk_create(created)
+
+
+def roll_up_batch(batch_size):
+    """
+    Fold up to batch_size confirmed orders that are not rolled up yet into
+    the rollups in one transaction. Returns the number of orders added.
+    """
+    SalesRollupState.objects.get_or_create(pk=1)
+    with transaction.atomic():
+        # One run at a time, so each rollup row has a single writer
+        state = SalesRollupState.objects.select_for_update().get(pk=1)
+        orders = list(
+            Order.objects.filter(status=Order.CONFIRMED, rolled_up=False).order_by('id').values_list(
+                'id', 'store_id', 'created_at'
+            )[:batch_size]
+        )
+        if not orders:
+            return 0
+
+        units_by_order = defaultdict(lambda: defaultdict(int))
+        for order_id, product_id, quantity in OrderItem.objects.filter(
+            order_id__in=[order[0] for order in orders]
+        ).values_list('order_id', 'product_id', 'quantity_requested'):
+            units_by_order[order_id][product_id] += quantity
+
+        store_totals = defaultdict(lambda: [0, 0])
+        product_totals = defaultdict(lambda: [0, 0])
+        for order_id, store_id, created_at in orders:
+            products = units_by_order.get(order_id, {})
+            for period, start in period_starts(created_at):
+                total = store_totals[(store_id, period, start)]
+                total[0] += sum(products.values())
+                total[1] += 1
+                for product_id, units in products.items():
+                    total = product_totals[(store_id, product_id, period, start)]
+                    total[0] += units
+                    total[1] += 1
+
+        apply_totals(StoreSalesRollup, ('store_id', 'period', 'period_start'), store_totals)
+        apply_totals(ProductSalesRollup, ('store_id', 'product_id', 'period', 'period_start'), product_totals)
+
+        Order.objects.filter(id__in=[order[0] for order in orders]).update(rolled_up=True)
+        state.save()
+    return len(orders)
+
+
+def roll_up_sales(batch_size=None):
+    """
+    Fold all confirmed orders not rolled up yet into the rollups, a batch
+    per transaction. Returns the number of orders added.
+    """
+    batch_size = batch_size or settings.SALES_ROLLUP_BATCH_SIZE
+    rolled_up = 0
+    while True:
+        count = roll_up_batch(batch_size)
+        rolled_up += count
+        if count < batch_size:
+            return rolled_up
+
+
+def _parse_moment(value, name):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def parse_sales_params(params):
+    """
+    Period, range, product and top products limit of a sales report request.
+    Raises ValueError for invalid values.
+    """
+    period = params.get('period', StoreSalesRollup.DAY)
+    if period not in DEFAULT_RANGES:
+        raise ValueError('period must be "hour" or "day"')
+
+    until = _parse_moment(params['until'], 'until') if params.get('until') else timezone.now()
+    if params.get('since'):
+        since = _parse_moment(params['since'], 'since')
+    else:
+        since = until - DEFAULT_RANGES[period]
+    if since > until:
+        raise ValueError('since must not be after until')
+
+    try:
+        product_id = int(params['product_id']) if params.get('product_id') else None
+        limit = int(params.get('limit', DEFAULT_TOP_PRODUCTS))
+    except ValueError:
+        raise ValueError('product_id and limit must be integers')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+
+    return {
+        'period': period,
+        # Whole periods: the one since falls in up to the one until falls in
+        'since': dict(period_starts(since))[period],
+        'until': until,
+        'product_id': product_id,
+        'limit': min(limit, MAX_TOP_PRODUCTS),
+    }
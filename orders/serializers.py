@@ -1,9 +1,10 @@
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import Order, OrderItem, Reservation, ReservationItem
 from products.serializers import ProductSerializer
+from project.serializers import SparseFieldsetsMixin
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     
@@ -12,7 +13,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_id', 'quantity_requested']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True)
     total_items = serializers.SerializerMethodField()
     
@@ -20,6 +21,9 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'store', 'status', 'created_at', 'order_items', 'total_items']
         read_only_fields = ['status', 'created_at']
+        expandable_fields = {'store': ('stores.serializers.StoreSerializer', {})}
+        # total_items counts the prefetched order_items
+        sparse_sources = {'total_items': ['order_items']}
     
     def get_total_items(self, obj):
         return obj.get_total_items()
@@ -31,4 +35,18 @@ class OrderSerializer(serializers.ModelSerializer):
         for item_data in order_items_data:
             OrderItem.objects.create(order=order, **item_data)
         
-        return order
\ No newline at end of file
+        return order
+
+
+class ReservationItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReservationItem
+        fields = ['product', 'quantity']
+
+
+class ReservationSerializer(serializers.ModelSerializer):
+    items = ReservationItemSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Reservation
+        fields = ['id', 'store', 'status', 'created_at', 'expires_at', 'order', 'items']
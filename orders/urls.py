@@ -1,6 +1,11 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('orders/', views.create_order, name='create_order'),
+    path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
+    path('api/async/orders/<int:order_id>/', async_views.order_detail_async, name='order_detail_async'),
+    path('reservations/', views.create_reservation, name='create_reservation'),
+    path('reservations/<uuid:reservation_id>/confirm/', views.confirm_reservation, name='confirm_reservation'),
+    path('reservations/<uuid:reservation_id>/release/', views.release_reservation, name='release_reservation'),
 ]
\ No newline at end of file
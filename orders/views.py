@@ -1,12 +1,179 @@
+from datetime import timedelta
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.conf import settings
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from .models import Order, OrderItem
-from .serializers import OrderSerializer
+from django.urls import reverse
+from django.utils import timezone
+from .models import Order, OrderItem, OrderRejection, OutboxMessage, Reservation, ReservationItem
+from .intake import parse_wait, schedule_store_drain, wait_for_order
+from .rejections import log_rejection
+from .serializers import OrderSerializer, ReservationSerializer
 from stores.models import Store, Inventory
-from project.tasks import send_order_confirmation_email
+from stores.hot_stock import compensate_on_error, get_hot_stock
+from stores.stock import adjust_stock, get_availability, stock_change_source
+from project.db_router import pin_to_primary
+from project.tasks import schedule_outbox_relay
+
+
+def parse_order_items(order_items_data):
+    """
+    Validate requested items and return {product_id: quantity}.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    if not isinstance(order_items_data, list):
+        raise ValueError('items must be a list')
+    
+    # Check if all products exist and validate quantities
+    product_quantities = {}
+    for item in order_items_data:
+        product_id = item.get('product_id')
+        quantity = item.get('quantity_requested')
+        
+        if not product_id or not quantity:
+            raise ValueError('Each item must have product_id and quantity_requested')
+        
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f'Invalid quantity for product {product_id}')
+        
+        product_quantities[product_id] = quantity
+    
+    return product_quantities
+
+
+class InsufficientStock(Exception):
+    def __init__(self, insufficient_stock):
+        super().__init__('Insufficient stock')
+        self.insufficient_stock = insufficient_stock
+
+
+def precheck_stock(store_id, product_quantities):
+    """
+    Find the items that clearly cannot be fulfilled, from the cached
+    availability and without opening a transaction.
+    
+    Only ever rejects: passing the check does not reserve anything, and the
+    conditional updates that take the stock in the order transaction still
+    decide. The cache can be up to a minute old, so products it shows short
+    are read again from the primary before being reported. Hot products,
+    whose database quantity trails the hot stock store, are checked against
+    that store instead, and left to the order transaction if it does not
+    track them yet.
+    """
+    # Ids sent as strings are left to the check in the transaction
+    product_ids = [product_id for product_id in product_quantities if isinstance(product_id, int)]
+    availability = get_availability(product_ids)
+    
+    short = {}
+    for product_id in product_ids:
+        available = availability[product_id].get(store_id, 0)
+        if available < product_quantities[product_id]:
+            short[product_id] = available
+    if not short:
+        return []
+    
+    # Not stocked at all unless the primary has a row
+    confirmed = dict.fromkeys(short, 0)
+    for product_id, quantity, is_hot in Inventory.objects.filter(
+        store_id=store_id, product_id__in=short
+    ).values_list('product_id', 'quantity', 'is_hot'):
+        if not is_hot:
+            confirmed[product_id] = quantity
+            continue
+        hot_quantity = get_hot_stock().get(store_id, product_id)
+        if hot_quantity is None:
+            # Not loaded into the hot stock store yet: nothing fresh to go by
+            del confirmed[product_id]
+        else:
+            confirmed[product_id] = hot_quantity
+    short = confirmed
+    
+    return [
+        {
+            'product_id': product_id,
+            'available': available,
+            'requested': product_quantities[product_id]
+        }
+        for product_id, available in short.items()
+        if available < product_quantities[product_id]
+    ]
+
+
+def stock_on_hand(store_id, product_id):
+    """
+    A store's current stock of a product, from the hot stock store for hot
+    products it tracks.
+    """
+    row = Inventory.objects.filter(
+        store_id=store_id, product_id=product_id
+    ).values_list('quantity', 'is_hot').first()
+    if row is None:
+        return 0
+    quantity, is_hot = row
+    if is_hot:
+        hot_quantity = get_hot_stock().get(store_id, product_id)
+        if hot_quantity is not None:
+            return hot_quantity
+    return quantity
+
+
+def reject_order(store, product_quantities, insufficient_stock, stage):
+    """
+    Answer an order that cannot be fulfilled. Nothing is written to the
+    order tables; the attempt goes to the batched rejection log.
+    """
+    log_rejection(store.id, product_quantities, insufficient_stock, stage)
+    return Response({
+        'order': None,
+        'status': 'REJECTED',
+        'message': 'Order rejected due to insufficient stock',
+        'insufficient_stock': insufficient_stock
+    }, status=status.HTTP_201_CREATED)
+
+
+def order_payload(store, order_items_data):
+    return {
+        'store': store.id,
+        'order_items': [
+            {
+                'product_id': item['product_id'],
+                'quantity_requested': item['quantity_requested']
+            }
+            for item in order_items_data
+        ]
+    }
+
+
+def enqueue_order(store, order_items_data):
+    """
+    Accept an order as PENDING and leave the stock to the store's drain
+    (orders.intake). Answers 202 with the URL to poll for the outcome.
+    """
+    serializer = OrderSerializer(data=order_payload(store, order_items_data))
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    with transaction.atomic():
+        order = serializer.save()
+        transaction.on_commit(lambda: schedule_store_drain(store.id), robust=True)
+    
+    return pin_to_primary(Response({
+        'order': OrderSerializer(order).data,
+        'status': order.status,
+        'message': 'Order accepted and queued',
+        'status_url': reverse('order_detail', args=[order.id])
+    }, status=status.HTTP_202_ACCEPTED))
+
+
+def queue_order_confirmation(order, store):
+    """
+    Queue the confirmation in the outbox as part of the current transaction;
+    it is only published to Celery once the order is committed.
+    """
+    OutboxMessage.order_confirmed(order, store).save()
+    transaction.on_commit(schedule_outbox_relay, robust=True)
 
 
 @api_view(['POST'])
@@ -26,111 +193,218 @@ def create_order(request):
     store = get_object_or_404(Store, id=store_id)
     
     # Validate input data
-    if not isinstance(order_items_data, list):
-        return Response(
-            {'error': 'items must be a list'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    try:
+        product_quantities = parse_order_items(order_items_data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Check if all products exist and validate quantities
-    product_quantities = {}
-    for item in order_items_data:
-        product_id = item.get('product_id')
-        quantity = item.get('quantity_requested')
-        
-        if not product_id or not quantity:
-            return Response(
-                {'error': 'Each item must have product_id and quantity_requested'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if not isinstance(quantity, int) or quantity <= 0:
-            return Response(
-                {'error': f'Invalid quantity for product {product_id}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        product_quantities[product_id] = quantity
+    # Turn away orders the cached stock already rules out before taking
+    # any row locks
+    insufficient_stock = precheck_stock(store.id, product_quantities)
+    if insufficient_stock:
+        return reject_order(store, product_quantities, insufficient_stock, OrderRejection.PRECHECK)
+    
+    if settings.QUEUED_ORDER_INTAKE:
+        return enqueue_order(store, order_items_data)
+    
+    # Validated before any stock is taken, so an invalid payload never has
+    # hot stock to give back
+    serializer = OrderSerializer(data=order_payload(store, order_items_data))
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        with transaction.atomic():
-            # Check inventory availability
+        # A rollback also returns any stock taken from the hot stock store
+        with compensate_on_error(), transaction.atomic():
+            # Each item is taken with one conditional UPDATE, in product order
+            # like reservations, so concurrent orders and holds on the same
+            # rows neither deadlock nor overwrite each other. Hot products
+            # are taken from the hot stock store instead of their rows.
             insufficient_stock = []
-            inventory_items = {}
-            
-            for product_id, quantity_requested in product_quantities.items():
-                try:
-                    inventory = Inventory.objects.get(store=store, product_id=product_id)
-                    inventory_items[product_id] = inventory
-                    
-                    if inventory.quantity < quantity_requested:
+            with stock_change_source('order'):
+                for product_id, quantity_requested in sorted(
+                    product_quantities.items(), key=lambda item: int(item[0])
+                ):
+                    if adjust_stock(store.id, product_id, -quantity_requested) is None:
                         insufficient_stock.append({
                             'product_id': product_id,
-                            'available': inventory.quantity,
+                            'available': stock_on_hand(store.id, product_id),
                             'requested': quantity_requested
                         })
-                except Inventory.DoesNotExist:
-                    insufficient_stock.append({
-                        'product_id': product_id,
-                        'available': 0,
-                        'requested': quantity_requested
-                    })
             
-            # Create order
-            order_data = {
-                'store': store_id,
-                'order_items': [
-                    {
-                        'product_id': item['product_id'],
-                        'quantity_requested': item['quantity_requested']
-                    }
-                    for item in order_items_data
-                ]
-            }
-            
-            serializer = OrderSerializer(data=order_data)
-            if not serializer.is_valid():
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Stock ran out since the pre-check; rolling back returns what
+            # was already taken
+            if insufficient_stock:
+                raise InsufficientStock(insufficient_stock)
             
+            # Create and confirm the order
             order = serializer.save()
+            order.status = Order.CONFIRMED
+            order.save()
             
-            # Handle stock deduction based on availability
-            if insufficient_stock:
-                # Reject order if any item has insufficient stock
-                order.status = Order.REJECTED
-                order.save()
-                
-                return Response({
-                    'order': OrderSerializer(order).data,
-                    'status': 'REJECTED',
-                    'message': 'Order rejected due to insufficient stock',
-                    'insufficient_stock': insufficient_stock
-                }, status=status.HTTP_201_CREATED)
-            else:
-                # Deduct stock and confirm order
-                for product_id, quantity_requested in product_quantities.items():
-                    inventory = inventory_items[product_id]
-                    inventory.quantity -= quantity_requested
-                    inventory.save()
-                
-                order.status = Order.CONFIRMED
-                order.save()
-                
-                # Trigger async order confirmation task
-                send_order_confirmation_email.delay(
-                    order_id=order.id,
-                    store_name=store.name,
-                    customer_email='customer@example.com'  # In real app, get from request
-                )
-                
-                return Response({
-                    'order': OrderSerializer(order).data,
-                    'status': 'CONFIRMED',
-                    'message': 'Order confirmed and stock deducted'
-                }, status=status.HTTP_201_CREATED)
-                
+            queue_order_confirmation(order, store)
+            
+            # Let the client read its new order before replicas catch up
+            return pin_to_primary(Response({
+                'order': OrderSerializer(order).data,
+                'status': 'CONFIRMED',
+                'message': 'Order confirmed and stock deducted'
+            }, status=status.HTTP_201_CREATED))
+    
+    except InsufficientStock as e:
+        return reject_order(store, product_quantities, e.insufficient_stock, OrderRejection.CHECKOUT)
     except Exception as e:
         return Response(
             {'error': f'Failed to process order: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+def order_detail(request, order_id):
+    """
+    Order status. With ?wait=<seconds> a PENDING order is long-polled until
+    its store's drain settles it or the wait (at most ORDER_POLL_MAX_WAIT)
+    runs out; long polls are best served by the ASGI endpoint.
+    """
+    try:
+        wait = parse_wait(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    order = wait_for_order(get_object_or_404(Order, id=order_id), wait)
+    order = Order.objects.prefetch_related('order_items__product__category').get(id=order.id)
+    return Response({
+        'order': OrderSerializer(order).data,
+        'status': order.status
+    })
+
+
+@api_view(['POST'])
+def create_reservation(request):
+    """
+    Hold stock for a cart for RESERVATION_TTL seconds.
+    
+    Each item is deducted with a single conditional UPDATE, in product order
+    so concurrent holds on the same products cannot deadlock. The hold is
+    all-or-nothing: if any item is short, nothing is reserved and 409 lists
+    the missing stock.
+    """
+    store_id = request.data.get('store_id')
+    order_items_data = request.data.get('items', [])
+    
+    if not store_id or not order_items_data:
+        return Response(
+            {'error': 'store_id and items are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    store = get_object_or_404(Store, id=store_id)
+    
+    try:
+        product_quantities = parse_order_items(order_items_data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        with compensate_on_error(), transaction.atomic(), stock_change_source('reservation'):
+            insufficient_stock = []
+            for product_id, quantity in sorted(product_quantities.items()):
+                if adjust_stock(store.id, product_id, -quantity) is None:
+                    insufficient_stock.append({'product_id': product_id, 'requested': quantity})
+            if insufficient_stock:
+                # Roll back the items that were already held
+                raise InsufficientStock(insufficient_stock)
+            
+            reservation = Reservation.objects.create(
+                store=store,
+                expires_at=timezone.now() + timedelta(seconds=settings.RESERVATION_TTL)
+            )
+            ReservationItem.objects.bulk_create([
+                ReservationItem(reservation=reservation, product_id=product_id, quantity=quantity)
+                for product_id, quantity in product_quantities.items()
+            ])
+    except InsufficientStock as e:
+        return Response({
+            'status': 'REJECTED',
+            'message': 'Reservation rejected due to insufficient stock',
+            'insufficient_stock': e.insufficient_stock
+        }, status=status.HTTP_409_CONFLICT)
+    
+    return pin_to_primary(Response({
+        'reservation': ReservationSerializer(reservation).data,
+        'status': reservation.status,
+        'message': 'Stock reserved'
+    }, status=status.HTTP_201_CREATED))
+
+
+def reservation_conflict(reservation_id):
+    reservation = get_object_or_404(Reservation, id=reservation_id)
+    if reservation.status == Reservation.ACTIVE:
+        error = 'Reservation has expired'
+    else:
+        error = f'Reservation is already {reservation.status.lower()}'
+    return Response({
+        'reservation': ReservationSerializer(reservation).data,
+        'error': error
+    }, status=status.HTTP_409_CONFLICT)
+
+
+@api_view(['POST'])
+def confirm_reservation(request, reservation_id):
+    """
+    Turn an active reservation into a confirmed order.
+    The stock was deducted when the hold was placed, so no inventory row is
+    touched here.
+    """
+    with transaction.atomic():
+        # Claim the hold; fails if it was released, confirmed or has expired
+        claimed = Reservation.objects.filter(
+            id=reservation_id,
+            status=Reservation.ACTIVE,
+            expires_at__gt=timezone.now()
+        ).update(status=Reservation.CONFIRMED)
+        if not claimed:
+            return reservation_conflict(reservation_id)
+        
+        reservation = Reservation.objects.select_related('store').get(id=reservation_id)
+        order = Order.objects.create(store=reservation.store, status=Order.CONFIRMED)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=item.product_id, quantity_requested=item.quantity)
+            for item in reservation.items.all()
+        ])
+        reservation.order = order
+        reservation.save(update_fields=['order'])
+        
+        queue_order_confirmation(order, reservation.store)
+    
+    return pin_to_primary(Response({
+        'order': OrderSerializer(order).data,
+        'status': 'CONFIRMED',
+        'message': 'Reservation converted to order'
+    }, status=status.HTTP_201_CREATED))
+
+
+@api_view(['POST'])
+def release_reservation(request, reservation_id):
+    """
+    Cancel an active reservation and return its stock.
+    """
+    with compensate_on_error(), transaction.atomic():
+        released = Reservation.objects.filter(
+            id=reservation_id,
+            status=Reservation.ACTIVE
+        ).update(status=Reservation.RELEASED)
+        if not released:
+            return reservation_conflict(reservation_id)
+        
+        reservation = Reservation.objects.get(id=reservation_id)
+        with stock_change_source('reservation_released'):
+            for item in sorted(reservation.items.all(), key=lambda item: item.product_id):
+                adjust_stock(reservation.store_id, item.product_id, item.quantity)
+    
+    return pin_to_primary(Response({
+        'reservation': ReservationSerializer(reservation).data,
+        'status': reservation.status,
+        'message': 'Reservation released'
+    }, status=status.HTTP_200_OK))
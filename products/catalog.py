@@ -0,0 +1,101 @@
+"""
+Catalog version and HTTP caching for product endpoints.
+
+The catalog version changes whenever a Product or Category is written. It is
+a millisecond timestamp, so it doubles as Last-Modified and still moves
+forward if the cache entry holding it is evicted.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    current = cache.get(CATALOG_VERSION_KEY) or 0
+    version = max(int(time.time() * 1000), current + 1)
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def catalog_etag(request, version):
+    params = hashlib.md5(request.GET.urlencode().encode('utf-8')).hexdigest()[:12]
+    return quote_etag(f'catalog-{version}-{params}')
+
+
+def _conditional_response(request):
+    version = get_catalog_version()
+    etag = catalog_etag(request, version)
+    last_modified = version // 1000
+    return get_conditional_response(request, etag=etag, last_modified=last_modified), etag, last_modified
+
+
+def _patch_catalog_headers(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.CATALOG_CACHE_MAX_AGE,
+            s_maxage=settings.CATALOG_CACHE_S_MAXAGE,
+        )
+    return response
+
+
+def catalog_http_cache(stock_dependent=None):
+    """
+    Add conditional GET support and Cache-Control headers to a catalog view,
+    sync or async.
+
+    Responses that only depend on catalog data get an ETag and Last-Modified
+    from the catalog version and a short public lifetime for shared caches.
+    Requests for which stock_dependent(request) is true depend on live stock
+    levels, so they are marked private with a very short lifetime instead.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if stock_dependent is not None and stock_dependent(request):
+                    response = await view(request, *args, **kwargs)
+                    patch_cache_control(response, private=True, max_age=settings.STOCK_CACHE_MAX_AGE)
+                    return response
+
+                # The catalog version is read from the sync cache
+                response, etag, last_modified = await sync_to_async(_conditional_response)(request)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _patch_catalog_headers(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if stock_dependent is not None and stock_dependent(request):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(
+                    response, private=True, max_age=settings.STOCK_CACHE_MAX_AGE
+                )
+                return response
+            
+            response, etag, last_modified = _conditional_response(request)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _patch_catalog_headers(response, etag, last_modified)
+        return wrapper
+    return decorator
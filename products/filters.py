@@ -0,0 +1,54 @@
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Category
+
+
+def category_tokens(params):
+    """
+    Collect category values from query parameters.
+    Accepts repeated ?category= parameters and comma-separated lists.
+    """
+    if hasattr(params, 'getlist'):
+        values = params.getlist('category')
+    else:
+        values = [params.get('category') or '']
+    tokens = []
+    for value in values:
+        tokens.extend(token.strip() for token in value.split(',') if token.strip())
+    return tokens
+
+
+def resolve_category_ids(tokens):
+    """
+    Resolve category ids and slugs to a list of category ids.
+    Names are accepted too, since they slugify to the stored slug.
+    """
+    ids = {int(token) for token in tokens if token.isdigit()}
+    slugs = {slugify(token) for token in tokens if not token.isdigit()}
+    if slugs:
+        ids.update(
+            Category.objects.filter(slug__in=slugs).values_list('id', flat=True)
+        )
+    return sorted(ids)
+
+
+def apply_category_filter(queryset, params, prefix=''):
+    """
+    Filter a queryset by the requested categories.
+
+    Matches exact ids or slugs against the category foreign key, which is served
+    by the (category, ...) composite indexes. Substring matching on the category
+    name is only used when category_match=fuzzy is passed explicitly.
+    """
+    tokens = category_tokens(params)
+    if not tokens:
+        return queryset
+
+    if params.get('category_match') == 'fuzzy':
+        condition = Q()
+        for token in tokens:
+            condition |= Q(**{f'{prefix}category__name__icontains': token})
+        return queryset.filter(condition)
+
+    return queryset.filter(**{f'{prefix}category_id__in': resolve_category_ids(tokens)})
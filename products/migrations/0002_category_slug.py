@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def populate_category_slugs(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    used = set()
+    for category in Category.objects.order_by('id'):
+        base = slugify(category.name)[:110] or 'category'
+        slug = base
+        suffix = 2
+        while slug in used:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        used.add(slug)
+        category.slug = slug
+        category.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=120, null=True),
+        ),
+        migrations.RunPython(populate_category_slugs, migrations.RunPython.noop),
+    ]
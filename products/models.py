@@ -1,17 +1,31 @@
 from django.db import models
+from django.utils.text import slugify
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=120, unique=True, blank=True)
     
     class Meta:
         verbose_name_plural = 'Categories'
-        indexes = [
-            models.Index(fields=['name']),
-        ]
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = self.build_unique_slug(self.name)
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def build_unique_slug(cls, name):
+        base = slugify(name)[:110] or 'category'
+        slug = base
+        suffix = 2
+        while cls.objects.filter(slug=slug).exists():
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        return slug
 
 
 class Product(models.Model):
@@ -24,6 +38,9 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['title']),
             models.Index(fields=['price']),
+            # Category filter combined with the price and title sorts
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['category', 'title'], name='product_category_title_idx'),
         ]
     
     def __str__(self):
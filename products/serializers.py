@@ -1,16 +1,18 @@
 from rest_framework import serializers
+from project.serializers import SparseFieldsetsMixin
 from .models import Category, Product
 
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'slug']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     
     class Meta:
         model = Product
-        fields = ['id', 'title', 'description', 'price', 'category', 'category_name']
\ No newline at end of file
+        fields = ['id', 'title', 'description', 'price', 'category', 'category_name']
+        expandable_fields = {'category': (CategorySerializer, {})}
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .catalog import bump_catalog_version
+from .models import Category, Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_catalog_version_on_write(sender, instance, **kwargs):
+    """
+    Move the catalog version once the write is committed, so cached catalog
+    responses and their ETags are not revalidated against uncommitted data.
+    """
+    transaction.on_commit(bump_catalog_version)
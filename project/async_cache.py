@@ -0,0 +1,57 @@
+"""
+Async access to the default cache for async views.
+
+With django-redis the values are read and written through a redis.asyncio
+client on the running event loop, using django-redis' own key format and
+serializer so sync views and signals see the same entries. Other cache
+backends fall back to Django's async cache API.
+"""
+import asyncio
+import weakref
+
+from django.core.cache import cache
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - redis is a hard dependency in production
+    redis_asyncio = None
+
+# redis.asyncio connections are bound to the loop that created them
+_clients = weakref.WeakKeyDictionary()
+
+
+def _uses_django_redis():
+    return redis_asyncio is not None and type(cache).__module__.startswith('django_redis')
+
+
+def _get_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        server = cache._server
+        if isinstance(server, (list, tuple)):
+            server = server[0]
+        else:
+            server = server.split(',')[0]
+        client = redis_asyncio.from_url(server)
+        _clients[loop] = client
+    return client
+
+
+async def aget(key, default=None):
+    if not _uses_django_redis():
+        return await cache.aget(key, default)
+    value = await _get_client().get(cache.client.make_key(key))
+    if value is None:
+        return default
+    return cache.client.decode(value)
+
+
+async def aset(key, value, timeout):
+    if not _uses_django_redis():
+        return await cache.aset(key, value, timeout)
+    await _get_client().set(
+        cache.client.make_key(key),
+        cache.client.encode(value),
+        ex=cache.get_backend_timeout(timeout),
+    )
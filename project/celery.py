@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_ready
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
@@ -15,4 +16,18 @@ app.autodiscover_tasks()
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
+
+
+@worker_ready.connect
+def schedule_cache_warmup(sender, **kwargs):
+    """
+    Warm caches once per deploy when WARM_CACHES_ON_WORKER_START is set.
+    Workers starting together schedule a single warm-up between them.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    if settings.WARM_CACHES_ON_WORKER_START and cache.add('cache_warmup_scheduled', 1, 300):
+        from project.tasks import warm_caches
+        warm_caches.delay()
@@ -0,0 +1,92 @@
+"""
+Primary/replica database routing.
+
+Reads only go to a replica inside views marked with @read_from_replica (or
+code running under replica_reads()). Everything else, and any read made
+inside an atomic block, goes to the primary. After a client writes (e.g.
+places an order) a short-lived cookie pins its reads to the primary, so it
+reads its own writes while the replicas catch up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY_PIN_COOKIE = 'primary_pin'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def is_pinned_to_primary(request):
+    return PRIMARY_PIN_COOKIE in request.COOKIES
+
+
+def pin_to_primary(response):
+    """
+    Keep the client's reads on the primary long enough for replicas to catch up.
+    """
+    response.set_cookie(
+        PRIMARY_PIN_COOKIE,
+        '1',
+        max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+def read_from_replica(view):
+    """
+    Send the reads of a read-only view to a replica unless the client is pinned.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with replica_reads(not is_pinned_to_primary(request)):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(not is_pinned_to_primary(request)):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        replicas = get_replicas()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its own writes and locks
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db not in get_replicas()
@@ -0,0 +1,157 @@
+"""
+Sparse fieldsets for list endpoints.
+
+Serializers using SparseFieldsetsMixin accept `fields`, `exclude` and
+`expand`, usually parsed from the query string with sparse_fieldset_params():
+
+    ?fields=id,title,price                  only these fields
+    ?exclude=description                    everything but these
+    ?fields=id,order_items.product.title    dotted paths reach nested serializers
+    ?expand=category                        nest a related object instead of its id
+
+Expandable relations are declared per serializer in Meta.expandable_fields.
+Unknown names are ignored. sparse_queryset() then restricts a queryset to
+the columns and joins the selected fields actually read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+
+def sparse_fieldset_params(params):
+    """
+    Read fields, exclude and expand from query parameters as lists of paths.
+    """
+    return {
+        name: [path.strip() for path in params[name].split(',') if path.strip()]
+        for name in ('fields', 'exclude', 'expand')
+        if params.get(name)
+    }
+
+
+def _split_paths(paths):
+    """
+    Split dotted paths into {top-level name: [remaining paths]}.
+    """
+    split = {}
+    for path in paths or ():
+        name, _, rest = path.partition('.')
+        split.setdefault(name, [])
+        if rest:
+            split[name].append(rest)
+    return split
+
+
+class SparseFieldsetsMixin:
+    def __init__(self, *args, fields=None, exclude=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = fields
+        self.sparse_exclude = exclude
+        self.sparse_expand = expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        include = _split_paths(self.sparse_fields)
+        exclude = _split_paths(self.sparse_exclude)
+        expand = _split_paths(self.sparse_expand)
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expand:
+            if name in expandable:
+                serializer_class, options = expandable[name]
+                if isinstance(serializer_class, str):
+                    serializer_class = import_string(serializer_class)
+                fields[name] = serializer_class(read_only=True, **options)
+
+        if include:
+            fields = {name: field for name, field in fields.items() if name in include}
+        for name, nested in exclude.items():
+            if not nested:
+                fields.pop(name, None)
+
+        # Hand dotted paths down to nested serializers before their fields are built
+        for name, field in fields.items():
+            target = getattr(field, 'child', field)
+            if isinstance(target, SparseFieldsetsMixin):
+                target.sparse_fields = include.get(name) or target.sparse_fields
+                target.sparse_exclude = exclude.get(name) or target.sparse_exclude
+                target.sparse_expand = expand.get(name) or target.sparse_expand
+
+        return fields
+
+
+def _add_source(model, attrs, prefix, only, related):
+    """
+    Record the columns and forward joins needed to read a chain of attributes.
+    Returns the last model field and its lookup path, or None if the chain is
+    not made of model fields.
+    """
+    model_field = path = None
+    for position, attr in enumerate(attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        path = prefix + attr
+        last = position == len(attrs) - 1
+        if not model_field.concrete:
+            # Reverse relations are fetched by prefetch_related, not by columns
+            return (model_field, path) if last else None
+        only.append(path)
+        if not last:
+            if not model_field.is_relation:
+                return None
+            related.append(path)
+            model, prefix = model_field.related_model, path + '__'
+    return model_field, path
+
+
+def _collect(serializer, model, prefix, only, related):
+    only.append(prefix + model._meta.pk.name)
+    method_sources = getattr(serializer.Meta, 'sparse_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            # Method fields declare what they read in Meta.sparse_sources
+            if name not in method_sources:
+                return False
+            sources = [source.split('.') for source in method_sources[name]]
+        elif field.source == '*':
+            return False
+        else:
+            sources = [field.source_attrs]
+
+        for attrs in sources:
+            reached = _add_source(model, attrs, prefix, only, related)
+            if reached is None:
+                return False
+            if isinstance(field, serializers.BaseSerializer) and not hasattr(field, 'child'):
+                # A nested object on a forward relation is joined into the same query
+                model_field, path = reached
+                if not (model_field.concrete and model_field.is_relation):
+                    return False
+                related.append(path)
+                if not _collect(field, model_field.related_model, path + '__', only, related):
+                    return False
+    return True
+
+
+def sparse_queryset(queryset, serializer, extra=()):
+    """
+    Restrict a queryset to the columns and select_related joins the
+    serializer's selected fields read, plus the lookups in `extra`.
+    Returns the queryset unchanged when a field's source cannot be traced.
+    """
+    serializer = getattr(serializer, 'child', serializer)
+    only, related = [], []
+    if not _collect(serializer, queryset.model, '', only, related):
+        return queryset
+    for lookup in extra:
+        if _add_source(queryset.model, lookup.split('__'), '', only, related) is None:
+            return queryset
+    queryset = queryset.select_related(None)
+    if related:
+        # select_related() without arguments would follow every foreign key
+        queryset = queryset.select_related(*dict.fromkeys(related))
+    return queryset.only(*dict.fromkeys(only))
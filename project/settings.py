@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from celery.schedules import crontab
+from kombu import Queue
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,12 +24,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-f-)$r_od14+3+badc!82rb8swz@63)f2^fi=!aj*q50p5)%v@k'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'django-insecure-f-)$r_od14+3+badc!82rb8swz@63)f2^fi=!aj*q50p5)%v@k'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '1').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 
 # Application definition
@@ -81,14 +88,35 @@ WSGI_APPLICATION = 'project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'aforro_db',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'db',
-        'PORT': '5432',
+        'NAME': os.environ.get('POSTGRES_DB', 'aforro_db'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('POSTGRES_HOST', 'db'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Keep connections open across requests so connection setup is not
+        # paid per request; health checks drop connections the server closed.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_HOSTS=db-replica-1,db-replica-2.
+# Read-only views are routed to them by project.db_router.
+# Under test every replica mirrors the test database instead of getting its own.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['project.db_router.PrimaryReplicaRouter']
+
+# Seconds a client's reads stay on the primary after it places an order
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -126,11 +154,15 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
 # Redis Configuration
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379')
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': 'redis://redis:6379/1',
+        'LOCATION': f'{REDIS_URL}/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
@@ -138,13 +170,167 @@ CACHES = {
 }
 
 # Celery Configuration
-CELERY_BROKER_URL = 'redis://redis:6379/0'
-CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', f'{REDIS_URL}/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', f'{REDIS_URL}/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Queues: latency-sensitive order work is isolated from long-running jobs
+# so a nightly batch can never delay an order confirmation.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = (
+    Queue('orders', routing_key='orders'),
+    Queue('default', routing_key='default'),
+    Queue('maintenance', routing_key='maintenance'),
+)
+CELERY_TASK_ROUTES = {
+    'project.tasks.send_order_confirmation_email': {'queue': 'orders'},
+    'project.tasks.send_order_confirmation_batch': {'queue': 'orders'},
+    'project.tasks.relay_outbox': {'queue': 'orders'},
+    'project.tasks.generate_daily_inventory_summary': {'queue': 'maintenance'},
+    'project.tasks.preprocess_products_for_search': {'queue': 'maintenance'},
+    'project.tasks.warm_caches': {'queue': 'maintenance'},
+    'project.tasks.release_expired_reservations': {'queue': 'orders'},
+    'project.tasks.reconcile_hot_stock': {'queue': 'orders'},
+    'project.tasks.detect_hot_stock_drift': {'queue': 'maintenance'},
+    'project.tasks.drain_store_orders': {'queue': 'orders'},
+    'project.tasks.drain_pending_orders': {'queue': 'orders'},
+    'project.tasks.roll_up_sales': {'queue': 'maintenance'},
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    # Redis emulates priorities with one list per step; 0 is served first
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+    # Must exceed the longest task time limit, or acks_late tasks are redelivered
+    'visibility_timeout': 7200,
+}
+
+# Workers reserve one task at a time by default; the orders worker raises
+# this on its command line since its tasks are short.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+
+CELERY_BEAT_SCHEDULE = {
+    'relay-outbox': {
+        'task': 'project.tasks.relay_outbox',
+        'schedule': 10.0,
+    },
+    'release-expired-reservations': {
+        'task': 'project.tasks.release_expired_reservations',
+        'schedule': 30.0,
+    },
+    'reconcile-hot-stock': {
+        'task': 'project.tasks.reconcile_hot_stock',
+        'schedule': 5.0,
+    },
+    'drain-pending-orders': {
+        'task': 'project.tasks.drain_pending_orders',
+        'schedule': 10.0,
+    },
+    'roll-up-sales': {
+        'task': 'project.tasks.roll_up_sales',
+        'schedule': 60.0,
+    },
+    'detect-hot-stock-drift': {
+        'task': 'project.tasks.detect_hot_stock_drift',
+        'schedule': 300.0,
+    },
+    'generate-daily-inventory-summary': {
+        'task': 'project.tasks.generate_daily_inventory_summary',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'preprocess-products-for-search': {
+        'task': 'project.tasks.preprocess_products_for_search',
+        'schedule': crontab(hour=3, minute=0),
+    },
+}
+
+# HTTP caching: catalog-only responses may be cached by browsers for
+# CATALOG_CACHE_MAX_AGE and by shared caches/CDNs for CATALOG_CACHE_S_MAXAGE
+# seconds; responses that include stock levels are private and short-lived.
+CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE', 30))
+CATALOG_CACHE_S_MAXAGE = int(os.environ.get('CATALOG_CACHE_S_MAXAGE', 60))
+STOCK_CACHE_MAX_AGE = int(os.environ.get('STOCK_CACHE_MAX_AGE', 5))
+
+# Seconds the stock change feed holds back new entries so concurrent
+# transactions can commit before consumers advance past their sequence numbers.
+# Changes committed later than this after being written are missed by the
+# feed, so keep it above the longest transaction that writes inventory.
+STOCK_CHANGE_FEED_LAG = int(os.environ.get('STOCK_CHANGE_FEED_LAG', 2))
+
+# Cart reservations hold stock for RESERVATION_TTL seconds; expired holds
+# are returned to stock by a sweep running every 30 seconds
+RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL', 600))
+RESERVATION_SWEEP_BATCH_SIZE = 500
+
+# Orders rejected for lack of stock are logged to OrderRejection in batches
+# of up to REJECTION_LOG_BATCH_SIZE, at most REJECTION_LOG_FLUSH_INTERVAL
+# seconds apart while rejections keep arriving
+REJECTION_LOG_BATCH_SIZE = 100
+REJECTION_LOG_FLUSH_INTERVAL = 5
+
+# Queued order intake (orders.intake): orders are accepted as PENDING with a
+# 202 and settled per store, ORDER_INTAKE_BATCH_SIZE per transaction. Clients
+# poll /orders/<id>/, waiting up to ORDER_POLL_MAX_WAIT seconds with ?wait=.
+QUEUED_ORDER_INTAKE = os.environ.get('QUEUED_ORDER_INTAKE', '0').lower() in ('1', 'true', 'yes')
+ORDER_INTAKE_BATCH_SIZE = int(os.environ.get('ORDER_INTAKE_BATCH_SIZE', 200))
+ORDER_POLL_MAX_WAIT = 20
+ORDER_POLL_INTERVAL = 0.5
+
+# Hourly and daily sales rollups (orders.rollups) are brought up to date every
+# minute, SALES_ROLLUP_BATCH_SIZE confirmed orders per transaction
+SALES_ROLLUP_BATCH_SIZE = 1000
+
+# Where the live stock of products flagged hot is kept (stores.hot_stock);
+# stores.hot_stock.InMemoryHotStock works without Redis in a single process
+HOT_STOCK_BACKEND = os.environ.get('HOT_STOCK_BACKEND', 'stores.hot_stock.RedisHotStock')
+
+# Keyword search backend (search.backends); empty picks PostgreSQL full-text
+# search on PostgreSQL, the FTS5 table on SQLite and icontains elsewhere. The BM25 backend
+# (search.backends.bm25.BM25SearchBackend) maps SEARCH_INDEX_PATH if set,
+# see manage.py build_search_index. It and the FTS5 backend keep the best
+# SEARCH_BM25_MAX_RESULTS matches of a query; results, pagination and facets
+# then count only those, and the response reports the cap as
+# pagination.max_results.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', '')
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', '')
+SEARCH_BM25_MAX_RESULTS = 1000
+
+# Keyword-less searches are served from an in-process NumPy snapshot of the
+# catalog (search.snapshot); its stock column is reloaded at most every
+# CATALOG_SNAPSHOT_STOCK_INTERVAL seconds
+CATALOG_SNAPSHOT = os.environ.get('CATALOG_SNAPSHOT', '1').lower() in ('1', 'true', 'yes')
+CATALOG_SNAPSHOT_STOCK_INTERVAL = 2
+
+# Cache warm-up (manage.py warm_caches): extra search queries to precompute,
+# and whether each Celery worker schedules a warm-up when it starts
+WARMUP_SEARCH_QUERIES = [
+    query for query in os.environ.get('WARMUP_SEARCH_QUERIES', '').split(',') if query
+]
+WARMUP_CONCURRENCY = int(os.environ.get('WARMUP_CONCURRENCY', 4))
+WARM_CACHES_ON_WORKER_START = os.environ.get('WARM_CACHES_ON_WORKER_START', '0').lower() in ('1', 'true', 'yes')
+
+# Email
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '0').lower() in ('1', 'true', 'yes')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'orders@aforro.local')
+
+# Order confirmation batching: confirmations are collected for up to
+# BATCH_WINDOW seconds and sent BATCH_SIZE at a time over one mail connection.
+ORDER_CONFIRMATION_BATCHING = os.environ.get('ORDER_CONFIRMATION_BATCHING', '0').lower() in ('1', 'true', 'yes')
+ORDER_CONFIRMATION_BATCH_SIZE = int(os.environ.get('ORDER_CONFIRMATION_BATCH_SIZE', 100))
+ORDER_CONFIRMATION_BATCH_WINDOW = int(os.environ.get('ORDER_CONFIRMATION_BATCH_WINDOW', 5))
+ORDER_CONFIRMATION_MAX_ATTEMPTS = 5
+ORDER_CONFIRMATION_RETRY_BACKOFF = 30  # seconds, doubled per attempt
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -157,8 +343,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'project.throttling.AnonRateThrottle',
+        'project.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -1,53 +1,82 @@
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.template.loader import get_template
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
 
 
-@shared_task
-def send_order_confirmation_email(order_id, store_name, customer_email):
+def claim_outbox_message(message_id):
     """
-    Send order confirmation email asynchronously.
-    
-    This task demonstrates Celery integration and can be extended
-    to include actual email sending logic with proper templates.
+    Mark an outbox message as processed, returning False if it already was.
+    Makes redelivered messages a no-op so handlers run once per message.
     """
-    subject = f'Order Confirmation - #{order_id}'
-    message = f"""
-    Thank you for your order!
+    from orders.models import OutboxMessage
     
-    Order Details:
-    Order ID: {order_id}
-    Store: {store_name}
-    
-    Your order has been confirmed and is being processed.
+    return OutboxMessage.objects.filter(
+        id=message_id, processed_at__isnull=True
+    ).update(processed_at=timezone.now()) == 1
+
+
+def retry_outbox_message(message_id):
+    """
+    Hand a message whose handler failed back to the relay, available again
+    after an exponential backoff. After ORDER_CONFIRMATION_MAX_ATTEMPTS it
+    stays dispatched but unprocessed for inspection instead.
+    """
+    from orders.models import OutboxMessage
     
-    This is a sample confirmation email sent asynchronously via Celery.
+    attempts = OutboxMessage.objects.filter(id=message_id).values_list('attempts', flat=True).first()
+    if attempts is None:
+        return
+    if attempts >= settings.ORDER_CONFIRMATION_MAX_ATTEMPTS:
+        # Leave it dispatched and unprocessed so it is not picked up again
+        OutboxMessage.objects.filter(id=message_id).update(processed_at=None)
+        return
+    backoff = settings.ORDER_CONFIRMATION_RETRY_BACKOFF * 2 ** (max(attempts, 1) - 1)
+    OutboxMessage.objects.filter(id=message_id).update(
+        processed_at=None,
+        dispatched_at=None,
+        available_at=timezone.now() + timedelta(seconds=backoff)
+    )
+
+
+@shared_task(acks_late=True, priority=0, time_limit=30, soft_time_limit=20)
+def send_order_confirmation_email(order_id, store_name, customer_email, message_id=None):
     """
+    Send order confirmation email asynchronously.
     
-    # In a real application, you would use proper email templates
-    # and handle email sending with appropriate error handling
+    The email is rendered from the order confirmation template, the same
+    one the batched task uses. When published from the outbox, message_id
+    makes redeliveries a no-op and a failed send hands the message back to
+    the relay with backoff.
+    """
+    if message_id is not None and not claim_outbox_message(message_id):
+        return {
+            'status': 'duplicate',
+            'order_id': order_id,
+            'message_id': message_id
+        }
     
     try:
-        # This would send the actual email in production
-        # send_mail(
-        #     subject=subject,
-        #     message=message,
-        #     from_email=settings.DEFAULT_FROM_EMAIL,
-        #     recipient_list=[customer_email],
-        #     fail_silently=False,
-        # )
-        
-        # For demonstration, we'll just log that the task ran
-        print(f"Email task executed for order {order_id}")
-        print(f"Subject: {subject}")
-        print(f"To: {customer_email}")
-        
+        build_order_confirmation_email(order_id, store_name, customer_email).send(fail_silently=False)
         return {
             'status': 'success',
             'order_id': order_id,
             'email_sent_to': customer_email
         }
     except Exception as e:
+        logger.warning('Order confirmation for order %s failed: %s', order_id, e)
+        if message_id is not None:
+            retry_outbox_message(message_id)
         return {
             'status': 'failed',
             'order_id': order_id,
@@ -55,7 +84,288 @@ def send_order_confirmation_email(order_id, store_name, customer_email):
         }
 
 
-@shared_task
+# Outbox topics and the tasks that handle them
+OUTBOX_HANDLERS = {
+    'order.confirmed': send_order_confirmation_email,
+}
+
+
+@shared_task(priority=0, time_limit=60, soft_time_limit=50)
+def relay_outbox(batch_size=100):
+    """
+    Publish pending outbox messages to Celery in batches.
+    
+    With ORDER_CONFIRMATION_BATCHING enabled, order confirmations are grouped
+    into send_order_confirmation_batch tasks of up to
+    ORDER_CONFIRMATION_BATCH_SIZE messages instead of one task each.
+    Messages are locked with SKIP LOCKED so several relays can run at once,
+    published over a single broker connection, and marked dispatched in bulk.
+    A crash between publishing and committing can publish a message again;
+    handlers claim the message id, so the repeat does nothing.
+    """
+    from orders.models import OutboxMessage
+    from project.celery import app
+    
+    dispatched = 0
+    while True:
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+                    dispatched_at__isnull=True,
+                    available_at__lte=timezone.now()
+                ).order_by('available_at', 'id')[:batch_size]
+            )
+            if not messages:
+                break
+            
+            batching = settings.ORDER_CONFIRMATION_BATCHING
+            confirmation_ids = []
+            with app.producer_or_acquire() as producer:
+                for message in messages:
+                    if batching and message.topic == OutboxMessage.ORDER_CONFIRMED:
+                        confirmation_ids.append(message.id)
+                        continue
+                    OUTBOX_HANDLERS[message.topic].apply_async(
+                        kwargs={**message.payload, 'message_id': message.id},
+                        producer=producer
+                    )
+                
+                chunk_size = settings.ORDER_CONFIRMATION_BATCH_SIZE
+                for start in range(0, len(confirmation_ids), chunk_size):
+                    send_order_confirmation_batch.apply_async(
+                        kwargs={'message_ids': confirmation_ids[start:start + chunk_size]},
+                        producer=producer
+                    )
+            
+            OutboxMessage.objects.filter(
+                id__in=[message.id for message in messages]
+            ).update(dispatched_at=timezone.now(), attempts=F('attempts') + 1)
+            dispatched += len(messages)
+        
+        if len(messages) < batch_size:
+            break
+    
+    return {
+        'status': 'completed',
+        'dispatched': dispatched
+    }
+
+
+def schedule_outbox_relay():
+    """
+    Trigger relay_outbox after a commit that wrote outbox messages.
+    
+    In batching mode at most one relay is scheduled per
+    ORDER_CONFIRMATION_BATCH_WINDOW, so confirmations written during the
+    window are sent together.
+    """
+    if not settings.ORDER_CONFIRMATION_BATCHING:
+        relay_outbox.delay()
+        return
+    
+    window = settings.ORDER_CONFIRMATION_BATCH_WINDOW
+    if cache.add('outbox_relay_scheduled', True, window):
+        relay_outbox.apply_async(countdown=window)
+
+
+@shared_task(priority=2, time_limit=300, soft_time_limit=240)
+def release_expired_reservations(batch_size=None):
+    """
+    Return the stock of expired reservations.
+    
+    Expired holds are claimed in batches with SKIP LOCKED, marked EXPIRED,
+    and their quantities summed per store and product so each inventory row
+    is updated once per batch. A reservation being confirmed at the same
+    moment is either claimed here first or has left the ACTIVE state.
+    """
+    from orders.models import Reservation, ReservationItem
+    from stores.hot_stock import compensate_on_error
+    from stores.stock import adjust_stock, stock_change_source
+    
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH_SIZE
+    expired = 0
+    while True:
+        with compensate_on_error(), transaction.atomic():
+            reservation_ids = list(
+                Reservation.objects.select_for_update(skip_locked=True).filter(
+                    status=Reservation.ACTIVE,
+                    expires_at__lte=timezone.now()
+                ).order_by('expires_at').values_list('id', flat=True)[:batch_size]
+            )
+            if not reservation_ids:
+                break
+            
+            Reservation.objects.filter(id__in=reservation_ids).update(status=Reservation.EXPIRED)
+            totals = ReservationItem.objects.filter(
+                reservation_id__in=reservation_ids
+            ).values('reservation__store_id', 'product_id').annotate(
+                quantity=Sum('quantity')
+            ).order_by('reservation__store_id', 'product_id')
+            with stock_change_source('reservation_expired'):
+                for row in totals:
+                    adjust_stock(row['reservation__store_id'], row['product_id'], row['quantity'])
+            expired += len(reservation_ids)
+        
+        if len(reservation_ids) < batch_size:
+            break
+    
+    return {
+        'status': 'completed',
+        'expired': expired
+    }
+
+
+@shared_task(priority=1, time_limit=300, soft_time_limit=240)
+def drain_store_orders(store_id, batch_size=None):
+    """
+    Settle a store's queued orders, many per transaction.
+    """
+    from orders.intake import drain_store
+    
+    return {
+        'status': 'completed',
+        'store_id': store_id,
+        'settled': drain_store(store_id, batch_size)
+    }
+
+
+@shared_task(priority=2, time_limit=60, soft_time_limit=50)
+def drain_pending_orders():
+    """
+    Schedule drains for stores whose queued orders have waited too long,
+    e.g. because their drain task was lost.
+    """
+    from orders.intake import schedule_store_drain, stale_pending_stores
+    
+    store_ids = stale_pending_stores()
+    for store_id in store_ids:
+        schedule_store_drain(store_id)
+    return {
+        'status': 'completed',
+        'stores': store_ids
+    }
+
+
+@shared_task(priority=3, time_limit=300, soft_time_limit=240)
+def roll_up_sales(batch_size=None):
+    """
+    Fold orders settled since the last run into the hourly and daily
+    sales rollups.
+    """
+    from orders.rollups import roll_up_sales as roll_up
+    
+    return {
+        'status': 'completed',
+        'orders_rolled_up': roll_up(batch_size)
+    }
+
+
+@shared_task(priority=1, time_limit=60, soft_time_limit=50)
+def reconcile_hot_stock():
+    """
+    Write stock changes of hot products from the hot stock store to the
+    database in one batch.
+    """
+    from stores.hot_stock import reconcile_hot_stock as reconcile
+    
+    return {
+        'status': 'completed',
+        'pairs_reconciled': reconcile()
+    }
+
+
+@shared_task(priority=9, time_limit=300, soft_time_limit=240)
+def detect_hot_stock_drift():
+    """
+    Report hot products whose hot stock quantity disagrees with the
+    database plus the unreconciled changes.
+    """
+    from stores.hot_stock import detect_drift
+    
+    drift = detect_drift()
+    for entry in drift:
+        logger.warning(
+            'Hot stock drift for store %(store_id)s product %(product_id)s: '
+            'hot %(hot_quantity)s, expected %(expected_quantity)s', entry
+        )
+    return {
+        'status': 'completed',
+        'drift': drift
+    }
+
+
+@lru_cache(maxsize=None)
+def _confirmation_template():
+    return get_template('orders/email/order_confirmation.txt')
+
+
+def build_order_confirmation_email(order_id, store_name, customer_email, connection=None):
+    return EmailMessage(
+        subject=f'Order Confirmation - #{order_id}',
+        body=_confirmation_template().render({
+            'order_id': order_id,
+            'store_name': store_name,
+        }),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[customer_email],
+        connection=connection,
+    )
+
+
+@shared_task(acks_late=True, priority=1, rate_limit='60/m', time_limit=300, soft_time_limit=240)
+def send_order_confirmation_batch(message_ids):
+    """
+    Send a batch of order confirmations over one mail connection.
+    
+    Each message is locked while it is sent and marked processed in the
+    same transaction once the send succeeds, so redeliveries skip it and a
+    worker dying partway leaves the unsent rest for the redelivered batch.
+    A message that fails to send is released back to the outbox with
+    exponential backoff and retried on its own, without failing the batch.
+    After ORDER_CONFIRMATION_MAX_ATTEMPTS it stays dispatched but
+    unprocessed for inspection.
+    """
+    from orders.models import OutboxMessage
+    
+    sent = []
+    failed = []
+    skipped = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for message_id in message_ids:
+            try:
+                with transaction.atomic():
+                    message = OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+                        id=message_id, processed_at__isnull=True
+                    ).first()
+                    if message is None:
+                        # Already sent, or being sent by another delivery
+                        skipped += 1
+                        continue
+                    build_order_confirmation_email(
+                        connection=connection, **message.payload
+                    ).send(fail_silently=False)
+                    OutboxMessage.objects.filter(id=message_id).update(processed_at=timezone.now())
+                sent.append(message_id)
+            except Exception as e:
+                logger.warning('Order confirmation %s failed: %s', message_id, e)
+                failed.append(message_id)
+    finally:
+        connection.close()
+    
+    for message_id in failed:
+        retry_outbox_message(message_id)
+    
+    return {
+        'status': 'completed',
+        'sent': len(sent),
+        'failed': len(failed),
+        'skipped': skipped
+    }
+
+
+@shared_task(acks_late=True, priority=9, rate_limit='1/m', time_limit=1800, soft_time_limit=1700)
 def generate_daily_inventory_summary():
     """
     Generate daily inventory summary report.
@@ -100,7 +410,7 @@ def generate_daily_inventory_summary():
     }
 
 
-@shared_task
+@shared_task(acks_late=True, priority=9, rate_limit='1/m', time_limit=3600, soft_time_limit=3300)
 def preprocess_products_for_search():
     """
     Preprocess products for improved search performance.
@@ -134,4 +444,19 @@ def preprocess_products_for_search():
         'status': 'completed',
         'processed_products': processed_count,
         'task': 'search_preprocessing'
-    }
\ No newline at end of file
+    }
+
+
+@shared_task(acks_late=True, priority=3, time_limit=900, soft_time_limit=840)
+def warm_caches():
+    """
+    Pre-populate inventory, facet and autocomplete caches after a deploy.
+    """
+    from project.warmup import warm_caches as run_warmup
+    
+    report = run_warmup(concurrency=settings.WARMUP_CONCURRENCY)
+    logger.info(
+        'Cache warm-up finished in %.1fs, %d entries warmed',
+        report['duration_seconds'], report['warmed']
+    )
+    return report
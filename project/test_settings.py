@@ -0,0 +1,10 @@
+"""
+Settings for the test suite: python manage.py test tests --settings=project.test_settings
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# Second connection to the test database, so the router tests can send
+# reads through a real replica alias; nothing is routed to it unless it is
+# listed in DATABASE_REPLICAS
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
@@ -0,0 +1,154 @@
+"""
+Sliding window rate throttles.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client and
+rewrites it on every request. These throttles keep two counters per client,
+one for the current fixed window and one for the previous window, and
+estimate the sliding window count as
+
+    previous * (time left in the current window / window) + current
+
+With django-redis the check and increment run in one Lua script, so every
+request costs a single round trip and is atomic across workers. Other cache
+backends use plain cache operations, which are good enough for development.
+"""
+import math
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework import exceptions, throttling
+from rest_framework.settings import api_settings
+
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local weight = tonumber(ARGV[3])
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if previous * weight + current >= limit then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], window * 2)
+end
+return {1, current, previous}
+"""
+
+_scripts = {}
+
+
+def _redis_script():
+    """
+    Return the registered Lua script when the default cache is django-redis.
+    """
+    if not type(cache).__module__.startswith('django_redis'):
+        return None
+    from django_redis import get_redis_connection
+    
+    client = get_redis_connection('default')
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(SLIDING_WINDOW_SCRIPT)
+    return script
+
+
+class SlidingWindowThrottleMixin:
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        
+        self.now = self.timer()
+        window_index, elapsed = divmod(self.now, self.duration)
+        weight = (self.duration - elapsed) / self.duration
+        current_key = f'{self.key}:{int(window_index)}'
+        previous_key = f'{self.key}:{int(window_index) - 1}'
+        
+        script = _redis_script()
+        if script is not None:
+            allowed, current, previous = script(
+                keys=[cache.make_key(current_key), cache.make_key(previous_key)],
+                args=[self.num_requests, self.duration, weight],
+            )
+        else:
+            allowed, current, previous = self._hit_cache(current_key, previous_key, weight)
+        
+        self.counts = (int(current), int(previous), elapsed)
+        if not allowed:
+            return self.throttle_failure()
+        return True
+    
+    def _hit_cache(self, current_key, previous_key, weight):
+        counts = self.cache.get_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+        if previous * weight + current >= self.num_requests:
+            return 0, current, previous
+        if self.cache.add(current_key, 1, self.duration * 2):
+            return 1, 1, previous
+        return 1, self.cache.incr(current_key), previous
+    
+    def wait(self):
+        """
+        Seconds until the estimated count drops below the limit.
+        """
+        current, previous, elapsed = self.counts
+        remaining = self.duration - elapsed
+        if current >= self.num_requests or not previous:
+            return remaining
+        # previous * (remaining - t) / duration + current < limit, so the
+        # first whole second strictly past the point where they are equal
+        needed = remaining - (self.num_requests - current) * self.duration / previous
+        return max(0, math.floor(needed) + 1)
+
+
+class AnonRateThrottle(SlidingWindowThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(SlidingWindowThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+def check_throttles(request, throttle_classes=None):
+    """
+    Throttle a request served outside DRF the way APIView.check_throttles
+    does, with DEFAULT_THROTTLE_CLASSES unless throttle_classes is given.
+    Every throttle counts the request; raises Throttled if any refuses it.
+    """
+    if throttle_classes is None:
+        throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait())
+    if waits:
+        raise exceptions.Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+
+def throttle_async(throttle_classes=None):
+    """
+    Apply check_throttles to an async Django view, so it is rate limited
+    like its DRF twin. Refused requests get DRF's 429 body and Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                # The throttles use the sync cache and request.user
+                await sync_to_async(check_throttles)(request, throttle_classes)
+            except exceptions.Throttled as e:
+                response = JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+                if e.wait is not None:
+                    response['Retry-After'] = str(math.ceil(e.wait))
+                return response
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
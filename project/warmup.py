@@ -0,0 +1,146 @@
+"""
+Cache warm-up after a deploy.
+
+Fills the caches the read endpoints depend on, so the first requests after a
+release are served from Redis instead of all missing at once:
+
+- the first inventory page of every store
+- facet counts for the unfiltered catalog, the largest categories and the
+  queries in WARMUP_SEARCH_QUERIES
+- autocomplete suggestions for the most common three-letter title prefixes
+
+Entries that are already cached for the current version are left alone, so
+running it twice is cheap.
+"""
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count
+from django.db.models.functions import Length, Lower, Substr
+from django.http import QueryDict
+
+from products.models import Category, Product
+from search.facets import facet_cache_keys, get_facets
+from search.views import autocomplete_cache_key, autocomplete_suggestions, filter_products
+from stores.models import Store
+from stores.listing import cache_inventory_page, inventory_page_cache_key
+from stores.stock import get_inventory_version
+
+logger = logging.getLogger(__name__)
+
+
+def warm_store_inventory(store_id):
+    version = get_inventory_version(store_id)
+    if cache.get(inventory_page_cache_key(store_id, version)) is not None:
+        return False
+    cache_inventory_page(store_id, version)
+    return True
+
+
+def warm_search(query_string):
+    params = QueryDict(query_string)
+    keys = facet_cache_keys(params)
+    if len(cache.get_many(keys)) == len(keys):
+        return False
+    products = filter_products(params)
+    get_facets(products, params)
+    return True
+
+
+def warm_autocomplete(prefix):
+    if cache.get(autocomplete_cache_key(prefix)) is not None:
+        return False
+    autocomplete_suggestions(prefix)
+    return True
+
+
+def popular_searches(limit=20):
+    """
+    Facet query strings for the unfiltered catalog, the largest categories
+    and the configured popular queries.
+    """
+    searches = ['']
+    searches += [
+        urlencode({'category': slug})
+        for slug in Category.objects.annotate(
+            product_count=Count('products')
+        ).order_by('-product_count').values_list('slug', flat=True)[:limit]
+    ]
+    searches += [urlencode({'q': query}) for query in settings.WARMUP_SEARCH_QUERIES]
+    return searches
+
+
+def popular_prefixes(limit=50):
+    """
+    The most common three-letter title prefixes, lowercased.
+    """
+    return list(
+        Product.objects.alias(
+            title_length=Length('title')
+        ).filter(title_length__gte=3).annotate(
+            prefix=Lower(Substr('title', 1, 3))
+        ).values('prefix').annotate(
+            product_count=Count('id')
+        ).order_by('-product_count', 'prefix').values_list('prefix', flat=True)[:limit]
+    )
+
+
+def warmup_jobs(store_ids=None, search_limit=20, prefix_limit=50):
+    if store_ids is None:
+        store_ids = list(Store.objects.order_by('id').values_list('id', flat=True))
+    return (
+        [('inventory', warm_store_inventory, store_id) for store_id in store_ids] +
+        [('search', warm_search, query_string) for query_string in popular_searches(search_limit)] +
+        [('autocomplete', warm_autocomplete, prefix) for prefix in popular_prefixes(prefix_limit)]
+    )
+
+
+def _run_jobs(jobs):
+    results = []
+    for kind, warm, arg in jobs:
+        try:
+            results.append((kind, 'warmed' if warm(arg) else 'skipped'))
+        except Exception:
+            logger.exception('Warming %s cache for %r failed', kind, arg)
+            results.append((kind, 'failed'))
+    return results
+
+
+def _run_chunk(jobs):
+    # Runs in a pool thread: one database connection per thread, closed at the end
+    try:
+        return _run_jobs(jobs)
+    finally:
+        connections.close_all()
+
+
+def warm_caches(concurrency=4, **job_options):
+    """
+    Warm all caches with at most `concurrency` jobs in flight.
+    Returns the duration and per-cache counts of warmed, skipped and failed entries.
+    """
+    started = time.monotonic()
+    jobs = warmup_jobs(**job_options)
+
+    if concurrency <= 1:
+        results = _run_jobs(jobs)
+    else:
+        # Interleave the job list so every thread gets a mix of cheap and costly jobs
+        chunks = [jobs[i::concurrency] for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = [result for chunk in executor.map(_run_chunk, chunks) for result in chunk]
+
+    counts = {}
+    for (kind, outcome), count in Counter(results).items():
+        counts.setdefault(kind, {'warmed': 0, 'skipped': 0, 'failed': 0})[outcome] = count
+    return {
+        'duration_seconds': round(time.monotonic() - started, 3),
+        'warmed': sum(kind['warmed'] for kind in counts.values()),
+        'caches': counts,
+    }
@@ -0,0 +1,131 @@
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+from products.catalog import catalog_http_cache
+from products.filters import category_tokens
+from products.serializers import ProductSerializer
+from stores.models import Inventory
+from project.db_router import read_from_replica
+from project.serializers import sparse_fieldset_params, sparse_queryset
+from project.throttling import throttle_async
+from .facets import get_facets
+from .backends import get_search_backend
+from .snapshot import snapshot_search
+from .views import (
+    AutocompleteRateThrottle, autocomplete_suggestions, filter_products, is_stock_dependent_search,
+    products_in_order, sort_products
+)
+
+
+@read_from_replica
+@require_GET
+@throttle_async()
+@catalog_http_cache(stock_dependent=is_stock_dependent_search)
+async def search_products_async(request):
+    """
+    Async version of search_products for ASGI deployments.
+    Same parameters and response shape, with queries run through the async ORM.
+    """
+    query = request.GET.get('q', '').strip()
+    store_id = request.GET.get('store_id')
+    include_facets = request.GET.get('facets', '').lower() in ('1', 'true', 'yes')
+    page = int(request.GET.get('page', 1))
+    page_size = int(request.GET.get('page_size', 20))
+
+    backend = get_search_backend()
+
+    sparse = sparse_fieldset_params(request.GET)
+    snapshot_page = await sync_to_async(snapshot_search)(request.GET, page, page_size)
+    if snapshot_page is not None:
+        page_products = await sync_to_async(products_in_order)(snapshot_page['product_ids'], sparse)
+        total_results = snapshot_page['total_results']
+        total_pages = snapshot_page['total_pages']
+        page = snapshot_page['page']
+    else:
+        # Building the queryset is lazy; category slugs are resolved in a thread
+        products = await sync_to_async(filter_products)(request.GET, backend)
+        products = sparse_queryset(
+            sort_products(products, request.GET, backend).select_related('category'),
+            ProductSerializer(**sparse)
+        )
+
+        # Same paging rules as django.core.paginator.Paginator
+        total_results = await products.acount()
+        total_pages = max(1, math.ceil(total_results / page_size))
+        if page < 1 or page > total_pages:
+            page = 1
+        offset = (page - 1) * page_size
+        page_products = [
+            product async for product in products[offset:offset + page_size]
+        ]
+
+    product_data = ProductSerializer(page_products, many=True, **sparse).data
+    if store_id:
+        quantities = {
+            product_id: quantity
+            async for product_id, quantity in Inventory.objects.filter(
+                store_id=store_id,
+                product_id__in=[product.id for product in page_products]
+            ).values_list('product_id', 'quantity')
+        }
+        for product, product_item in zip(page_products, product_data):
+            quantity = quantities.get(product.id, 0)
+            product_item['inventory_quantity'] = quantity
+            product_item['in_stock'] = quantity > 0
+
+    response_data = {
+        'results': product_data,
+        'pagination': {
+            'current_page': page,
+            'total_pages': total_pages,
+            'total_results': total_results,
+            'page_size': page_size,
+            'has_next': page < total_pages,
+            'has_previous': page > 1,
+        },
+        'filters_applied': {
+            'query': query,
+            'category': category_tokens(request.GET) or None,
+            'category_match': request.GET.get('category_match', 'exact'),
+            'min_price': request.GET.get('min_price'),
+            'max_price': request.GET.get('max_price'),
+            'store_id': store_id,
+            'in_stock': request.GET.get('in_stock'),
+            'sort_by': request.GET.get('sort_by', 'relevance'),
+        }
+    }
+    if query and backend.max_results is not None:
+        # Only the backend's best max_results keyword matches are counted
+        response_data['pagination']['max_results'] = backend.max_results
+    if include_facets:
+        response_data['facets'] = await sync_to_async(get_facets)(products, request.GET)
+
+    return JsonResponse(response_data, encoder=JSONEncoder)
+
+
+@read_from_replica
+@require_GET
+@throttle_async([AutocompleteRateThrottle])
+@catalog_http_cache()
+async def autocomplete_products_async(request):
+    """
+    Async version of autocomplete_products for ASGI deployments.
+    Shares the autocomplete rate limit with the sync endpoint.
+    """
+    query = request.GET.get('q', '')
+    if len(query) < 3:
+        return JsonResponse({
+            'error': 'Query must be at least 3 characters long'
+        }, status=400)
+
+    # Shares the per-catalog-version suggestion cache with the sync endpoint
+    suggestions = await sync_to_async(autocomplete_suggestions)(query)
+
+    return JsonResponse({
+        'query': query,
+        'suggestions': suggestions,
+        'total_results': len(suggestions)
+    })
@@ -0,0 +1,42 @@
+"""
+Pluggable keyword search for products.
+
+SEARCH_BACKEND names the backend class to use. Left empty, PostgreSQL
+deployments use PostgresSearchBackend, SQLite ones SQLiteFTSSearchBackend
+once the FTS5 table is migrated, and others IContainsSearchBackend.
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .base import SearchBackend
+
+_backends = {}
+_sqlite_fts = None
+
+
+def sqlite_fts_available():
+    # Looked up once per process rather than on every search
+    global _sqlite_fts
+    if _sqlite_fts is None:
+        from .sqlite import TABLE
+        _sqlite_fts = TABLE in connection.introspection.table_names()
+    return _sqlite_fts
+
+
+def default_backend_path():
+    if connection.vendor == 'postgresql':
+        return 'search.backends.postgres.PostgresSearchBackend'
+    if connection.vendor == 'sqlite' and sqlite_fts_available():
+        return 'search.backends.sqlite.SQLiteFTSSearchBackend'
+    return 'search.backends.icontains.IContainsSearchBackend'
+
+
+def get_search_backend():
+    path = settings.SEARCH_BACKEND or default_backend_path()
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+__all__ = ['SearchBackend', 'get_search_backend']
@@ -0,0 +1,38 @@
+from django.db.models import Case, IntegerField, When
+
+
+class SearchBackend:
+    """
+    Keyword search over products.
+    """
+    # Whether search() can order its matches by relevance
+    ranks = False
+    # Most matches search() keeps for a query, best first, or None for all
+    max_results = None
+
+    def search(self, queryset, query, rank=False):
+        """
+        Filter a product queryset to the products matching query, ordered by
+        relevance when rank is true and the backend ranks.
+        """
+        raise NotImplementedError
+
+    def product_changed(self, product_id):
+        """
+        Called after a product write commits, for backends keeping their own index.
+        """
+
+    def category_changed(self, category_id):
+        """
+        Called after a category write commits.
+        """
+
+
+def order_by_position(queryset, product_ids):
+    """
+    Order a product queryset by each product's position in product_ids.
+    """
+    return queryset.annotate(search_position=Case(
+        *[When(id=product_id, then=position) for position, product_id in enumerate(product_ids)],
+        output_field=IntegerField()
+    )).order_by('search_position')
@@ -0,0 +1,445 @@
+"""
+In-process BM25 search backend.
+
+Products are indexed in memory as an inverted index with one postings list
+per (field, term): parallel array('i') of document numbers and term
+frequencies. Matches are scored with BM25F over the title, category name and
+description, weighted 1.0 / 0.4 / 0.2 like the A / B / C weights of the
+PostgreSQL search. A product matches when every query term appears in one
+of its fields. Terms are lowercased words; there is no stemming.
+
+Each process keeps its own index. Product and category writes are added to
+a change feed in the cache (a sequence number plus one entry per change),
+and each process applies the entries it has not seen before its next
+search. If entries went missing it rebuilds the index from the database.
+
+`manage.py build_search_index` writes the index to SEARCH_INDEX_PATH.
+Processes then memory-map that file at start instead of building their
+own, so postings are shared and paged in on demand; a postings list is
+copied into private memory the first time a change appends to it.
+"""
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from products.models import Product
+from .base import SearchBackend, order_by_position
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {'title': 1.0, 'category': 0.4, 'description': 0.2}
+FIELDS = tuple(FIELD_WEIGHTS)
+K1 = 1.2
+B = 0.75
+
+SEQUENCE_KEY = 'search_index_seq'
+CHANGE_TIMEOUT = 3600
+# More unseen changes than this and a rebuild is cheaper than catching up
+MAX_CATCH_UP = 1000
+# A change whose entry is not in the cache yet is waited for this long
+# before the index is rebuilt instead
+MISSING_CHANGE_GRACE = 5
+
+MAGIC = b'BM25IDX1'
+HEADER = struct.Struct('<8sQ')
+
+_word = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return _word.findall(text.lower()) if text else []
+
+
+def change_key(sequence):
+    return f'search_index_change_{sequence}'
+
+
+def current_sequence():
+    sequence = cache.get(SEQUENCE_KEY)
+    if sequence is None:
+        # Start from a timestamp so a lost counter never moves backwards
+        cache.add(SEQUENCE_KEY, int(time.time() * 1000), None)
+        sequence = cache.get(SEQUENCE_KEY)
+    return sequence
+
+
+def record_change(change):
+    current_sequence()
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Evicted just now; the new counter forces a rebuild anyway
+        current_sequence()
+        return
+    cache.set(change_key(sequence), change, CHANGE_TIMEOUT)
+
+
+def _align(offset):
+    return offset + (-offset % 8)
+
+
+class IndexState:
+    """
+    The document arrays and postings of an index, numbered consistently.
+
+    Adding and removing products changes a state in place, only ever
+    appending documents and postings or clearing alive flags. Compaction
+    renumbers the documents, so it builds a new state and the index swaps
+    it in with one assignment.
+    """
+    __slots__ = ('doc_ids', 'alive', 'lengths', 'postings', 'doc_numbers')
+
+    def __init__(self, doc_ids=None, alive=None, lengths=None, postings=None):
+        self.doc_ids = array('q') if doc_ids is None else doc_ids
+        self.alive = bytearray(b'\x01' * len(self.doc_ids)) if alive is None else alive
+        self.lengths = {field: array('i') for field in FIELDS} if lengths is None else lengths
+        # field -> term -> (document numbers, term frequencies)
+        self.postings = {field: {} for field in FIELDS} if postings is None else postings
+        self.doc_numbers = {
+            product_id: doc for doc, product_id in enumerate(self.doc_ids) if self.alive[doc]
+        }
+
+
+class BM25Index:
+    def __init__(self, sequence=0):
+        # Change feed position the index includes
+        self.sequence = sequence
+        self.state = IndexState()
+        self.total_lengths = dict.fromkeys(FIELDS, 0)
+        self._mapped = None
+
+    # The parts of the current state. Searches take self.state once instead,
+    # so a compaction swapping it cannot mix the old and new numbering.
+    @property
+    def doc_ids(self):
+        return self.state.doc_ids
+
+    @property
+    def alive(self):
+        return self.state.alive
+
+    @property
+    def lengths(self):
+        return self.state.lengths
+
+    @property
+    def postings(self):
+        return self.state.postings
+
+    @property
+    def doc_numbers(self):
+        return self.state.doc_numbers
+
+    @classmethod
+    def build(cls, sequence):
+        index = cls(sequence)
+        rows = Product.objects.order_by('id').values_list(
+            'id', 'title', 'category__name', 'description'
+        )
+        for row in rows.iterator(chunk_size=2000):
+            index.add(*row)
+        return index
+
+    def __len__(self):
+        return len(self.doc_numbers)
+
+    def add(self, product_id, title, category, description):
+        """
+        Index a product, replacing its previous version.
+        """
+        self.remove(product_id)
+        doc = len(self.doc_ids)
+        self.doc_ids.append(product_id)
+        self.alive.append(1)
+        self.doc_numbers[product_id] = doc
+        for field, text in zip(FIELDS, (title, category, description)):
+            tokens = tokenize(text)
+            self.lengths[field].append(len(tokens))
+            self.total_lengths[field] += len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, count in counts.items():
+                docs, freqs = self._writable_postings(field, term)
+                docs.append(doc)
+                freqs.append(count)
+
+    def remove(self, product_id):
+        doc = self.doc_numbers.pop(product_id, None)
+        if doc is None:
+            return
+        # Postings keep the dead document until the next compaction
+        self.alive[doc] = 0
+        for field in FIELDS:
+            self.total_lengths[field] -= self.lengths[field][doc]
+        if len(self.doc_ids) - len(self.doc_numbers) > max(len(self.doc_numbers), 1000):
+            self.compact()
+
+    def _writable_postings(self, field, term):
+        entry = self.postings[field].get(term)
+        if entry is None:
+            entry = (array('i'), array('i'))
+        elif isinstance(entry[0], array):
+            return entry
+        else:
+            # Mapped from the index file, which is read-only
+            entry = (array('i', entry[0]), array('i', entry[1]))
+        self.postings[field][term] = entry
+        return entry
+
+    def compact(self):
+        """
+        Renumber the live documents and drop the dead ones from the postings.
+        """
+        renumber = {}
+        doc_ids = array('q')
+        lengths = {field: array('i') for field in FIELDS}
+        for doc, product_id in enumerate(self.doc_ids):
+            if self.alive[doc]:
+                renumber[doc] = len(doc_ids)
+                doc_ids.append(product_id)
+                for field in FIELDS:
+                    lengths[field].append(self.lengths[field][doc])
+
+        postings = {field: {} for field in FIELDS}
+        for field in FIELDS:
+            for term, (docs, freqs) in self.postings[field].items():
+                kept = [(renumber[doc], freq) for doc, freq in zip(docs, freqs) if doc in renumber]
+                if kept:
+                    postings[field][term] = (
+                        array('i', (doc for doc, _ in kept)), array('i', (freq for _, freq in kept))
+                    )
+
+        # One assignment, so searches see either the old state or the new one
+        self.state = IndexState(doc_ids, lengths=lengths, postings=postings)
+        self._mapped = None
+
+    def search(self, query, limit):
+        """
+        Best matches for query as [(product_id, score)], highest first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        # One consistent state even if a compaction swaps in a new one
+        state = self.state
+        doc_ids, alive, lengths, postings = state.doc_ids, state.alive, state.lengths, state.postings
+        count = len(state.doc_numbers)
+        if not terms or not count:
+            return []
+        average = {field: self.total_lengths[field] / count or 1 for field in FIELDS}
+
+        scores = None
+        for term in terms:
+            # BM25F: length-normalised, weighted frequencies summed over fields
+            weighted = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                entry = postings[field].get(term)
+                if entry is None:
+                    continue
+                field_lengths = lengths[field]
+                for doc, freq in zip(*entry):
+                    if alive[doc]:
+                        norm = 1 - B + B * field_lengths[doc] / average[field]
+                        weighted[doc] = weighted.get(doc, 0.0) + weight * freq / norm
+            if not weighted:
+                return []
+
+            matches = len(weighted)
+            idf = math.log(1 + (count - matches + 0.5) / (matches + 0.5))
+            if scores is None:
+                scores = {}
+            else:
+                weighted = {doc: tf for doc, tf in weighted.items() if doc in scores}
+            for doc, tf in weighted.items():
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / (tf + K1)
+            scores = {doc: scores[doc] for doc in weighted}
+            if not scores:
+                return []
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(doc_ids[doc], score) for doc, score in best]
+
+    def save(self, path):
+        """
+        Write the index to path atomically, in the format load() maps.
+        """
+        if len(self.doc_ids) != len(self):
+            self.compact()
+
+        sections = []
+        offset = 0
+
+        def add_section(data):
+            nonlocal offset
+            start = offset
+            raw = data.tobytes() if isinstance(data, array) else bytes(data)
+            sections.append(raw + b'\0' * (-len(raw) % 8))
+            offset += len(sections[-1])
+            return start
+
+        header = {
+            'sequence': self.sequence,
+            'documents': len(self.doc_ids),
+            'doc_ids': add_section(self.doc_ids),
+            'lengths': {field: add_section(self.lengths[field]) for field in FIELDS},
+            'postings': {},
+        }
+        for field in FIELDS:
+            header['postings'][field] = {
+                term: [add_section(array('i', docs) + array('i', freqs)), len(docs)]
+                for term, (docs, freqs) in self.postings[field].items()
+            }
+
+        encoded = json.dumps(header, separators=(',', ':')).encode()
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as f:
+            f.write(HEADER.pack(MAGIC, len(encoded)))
+            f.write(encoded)
+            f.write(b'\0' * (_align(HEADER.size + len(encoded)) - HEADER.size - len(encoded)))
+            for section in sections:
+                f.write(section)
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map an index written by save(). Postings stay in the file.
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a search index')
+        header = json.loads(mapped[HEADER.size:HEADER.size + header_size])
+        view = memoryview(mapped)[_align(HEADER.size + header_size):]
+
+        def section(offset, count, typecode):
+            size = array(typecode).itemsize
+            return view[offset:offset + count * size].cast(typecode)
+
+        count = header['documents']
+        index = cls(header['sequence'])
+        lengths = {}
+        postings = {}
+        for field in FIELDS:
+            lengths[field] = array('i', section(header['lengths'][field], count, 'i'))
+            index.total_lengths[field] = sum(lengths[field])
+            postings[field] = {
+                term: (section(offset, size, 'i'), section(offset + size * 4, size, 'i'))
+                for term, (offset, size) in header['postings'][field].items()
+            }
+        index.state = IndexState(
+            array('q', section(header['doc_ids'], count, 'q')), lengths=lengths, postings=postings
+        )
+        index._mapped = mapped
+        return index
+
+
+class BM25SearchBackend(SearchBackend):
+    ranks = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.missing_since = None
+
+    def product_changed(self, product_id):
+        record_change(('product', product_id))
+
+    def category_changed(self, category_id):
+        record_change(('category', category_id))
+
+    @property
+    def max_results(self):
+        return settings.SEARCH_BM25_MAX_RESULTS
+
+    def current_index(self):
+        """
+        The index, opened or caught up with the change feed first if needed.
+        """
+        sequence = current_sequence()
+        index = self.index
+        if index is not None and index.sequence == sequence:
+            return index
+        # Only opening and catching up are serialised; searches run alongside
+        # them on one IndexState each, see IndexState
+        with self.lock:
+            if self.index is None:
+                self.index = self._open(sequence)
+            if self.index.sequence != sequence:
+                self._catch_up(sequence)
+            return self.index
+
+    def matches(self, query):
+        return self.current_index().search(query, self.max_results)
+
+    def search(self, queryset, query, rank=False):
+        product_ids = [product_id for product_id, _ in self.matches(query)]
+        queryset = queryset.filter(id__in=product_ids)
+        if rank and product_ids:
+            queryset = order_by_position(queryset, product_ids)
+        return queryset
+
+    def _open(self, sequence):
+        path = settings.SEARCH_INDEX_PATH
+        if path and os.path.exists(path):
+            try:
+                index = BM25Index.load(path)
+            except (OSError, ValueError):
+                logger.exception('Could not load the search index from %s', path)
+            else:
+                if 0 <= sequence - index.sequence <= MAX_CATCH_UP:
+                    return index
+        return BM25Index.build(sequence)
+
+    def _catch_up(self, sequence):
+        index = self.index
+        pending = sequence - index.sequence
+        if not 0 < pending <= MAX_CATCH_UP:
+            # Counter reset, or too far behind
+            self.index = BM25Index.build(sequence)
+            return
+
+        sequences = range(index.sequence + 1, sequence + 1)
+        found = cache.get_many([change_key(position) for position in sequences])
+        changes = []
+        for position in sequences:
+            change = found.get(change_key(position))
+            if change is None:
+                break
+            changes.append(change)
+
+        if len(changes) < pending:
+            # The entry may not have been written yet, or it was evicted
+            if self.missing_since is None:
+                self.missing_since = time.monotonic()
+            elif time.monotonic() - self.missing_since > MISSING_CHANGE_GRACE:
+                self.missing_since = None
+                self.index = BM25Index.build(sequence)
+                return
+        else:
+            self.missing_since = None
+
+        product_ids = {object_id for kind, object_id in changes if kind == 'product'}
+        category_ids = {object_id for kind, object_id in changes if kind == 'category'}
+        rows = Product.objects.filter(id__in=product_ids)
+        if category_ids:
+            rows = rows | Product.objects.filter(category_id__in=category_ids)
+        seen = set()
+        for row in rows.values_list('id', 'title', 'category__name', 'description'):
+            index.add(*row)
+            seen.add(row[0])
+        for product_id in product_ids - seen:
+            index.remove(product_id)
+        index.sequence += len(changes)
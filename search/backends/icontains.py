@@ -0,0 +1,17 @@
+from django.db.models import Q
+
+from .base import SearchBackend
+
+
+class IContainsSearchBackend(SearchBackend):
+    """
+    Unranked substring match on title, description and category name.
+    Works on any database but scans every product.
+    """
+
+    def search(self, queryset, query, rank=False):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        )
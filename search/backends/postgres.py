@@ -0,0 +1,24 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+from .base import SearchBackend
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL full-text search.
+    """
+    ranks = True
+
+    def search(self, queryset, query, rank=False):
+        # Weighted search: Title (A) > Category (B) > Description (C)
+        vector = (
+            SearchVector('title', weight='A') +
+            SearchVector('category__name', weight='B') +
+            SearchVector('description', weight='C')
+        )
+        queryset = queryset.annotate(
+            rank=SearchRank(vector, SearchQuery(query))
+        ).filter(rank__gte=0.1)  # Only reasonably relevant results
+        if rank:
+            queryset = queryset.order_by('-rank')
+        return queryset
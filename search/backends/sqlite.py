@@ -0,0 +1,62 @@
+"""
+SQLite FTS5 search.
+
+The search_product_fts table (search migration 0001) holds each product's
+title, category name and description under the product id, and triggers on
+the product and category tables keep it in step with every write. Queries
+match every word of the search as a prefix, so partial words still find
+products, and rank by FTS5's bm25() with the same column weights as the
+other backends. Like the BM25 backend, only the best
+SEARCH_BM25_MAX_RESULTS matches are kept, whatever the sort order.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .base import SearchBackend, order_by_position
+
+TABLE = 'search_product_fts'
+# Title, category, description, in the table's column order
+COLUMN_WEIGHTS = (1.0, 0.4, 0.2)
+
+_word = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """
+    FTS5 query requiring each word of query as a prefix, or '' if it has none.
+    """
+    # Quoting each word keeps FTS5 operators and syntax in the input inert
+    return ' '.join(f'"{word}"*' for word in _word.findall(query.lower()))
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    ranks = True
+
+    @property
+    def max_results(self):
+        return settings.SEARCH_BM25_MAX_RESULTS
+
+    def search(self, queryset, query, rank=False):
+        match = match_expression(query)
+        if not match:
+            return queryset.none()
+        # The same best matches whether or not they are ordered by rank, so
+        # counts do not depend on the sort
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        best = (
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'ORDER BY bm25({TABLE}, {weights}), rowid LIMIT %s'
+        )
+        params = [match, self.max_results]
+        if not rank:
+            return queryset.filter(id__in=RawSQL(best, params))
+
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(best, params)
+            product_ids = [row[0] for row in cursor.fetchall()]
+        if not product_ids:
+            return queryset.none()
+        return order_by_position(queryset.filter(id__in=product_ids), product_ids)
@@ -0,0 +1,141 @@
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+
+from products.catalog import get_catalog_version
+from products.filters import category_tokens
+from products.models import Product
+from stores.models import Inventory
+from stores.stock import get_stock_presence_version
+
+
+# Price bands shown next to search results, as (label, lower, upper).
+# Bounds are half-open: lower <= price < upper, None means unbounded.
+PRICE_BANDS = [
+    ('0-50', None, 50),
+    ('50-100', 50, 100),
+    ('100-250', 100, 250),
+    ('250-500', 250, 500),
+    ('500+', 500, None),
+]
+
+FACET_CACHE_TIMEOUT = 300
+
+
+def _normalize_price(value):
+    if value in (None, ''):
+        return None
+    try:
+        return str(Decimal(value).normalize())
+    except (InvalidOperation, ValueError):
+        return str(value)
+
+
+def _cache_key(prefix, normalized):
+    digest = hashlib.md5(
+        json.dumps(normalized, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return f'{prefix}_{digest}'
+
+
+def facet_cache_keys(params):
+    """
+    Cache keys of a search's category and price band counts and of its
+    stock counts, built from the filters that affect them. Sorting and
+    pagination are ignored so every page of a search shares the entries.
+
+    The catalog version retires both when products or categories change.
+    The stock counts, and the other counts too when the search filters on
+    stock, are also keyed on the stock presence version, which only moves
+    when a row runs out or comes back into stock; ordinary orders leave
+    the entries in place.
+    """
+    in_stock = bool(params.get('in_stock'))
+    normalized = {
+        'catalog_version': get_catalog_version(),
+        'q': params.get('q', '').strip().lower(),
+        'category': sorted(token.lower() for token in category_tokens(params)),
+        'category_match': params.get('category_match') or 'exact',
+        'min_price': _normalize_price(params.get('min_price')),
+        'max_price': _normalize_price(params.get('max_price')),
+        'store_id': params.get('store_id') or None,
+        'in_stock': in_stock,
+    }
+    stock_normalized = {**normalized, 'stock_presence_version': get_stock_presence_version()}
+    return (
+        _cache_key('search_facets', stock_normalized if in_stock else normalized),
+        _cache_key('search_stock_facets', stock_normalized),
+    )
+
+
+def compute_facets(products, store_id=None):
+    """
+    Compute category, price band and stock facet counts for a filtered queryset.
+    Runs two grouped aggregate queries over the same set of matching products.
+    """
+    # Re-select the matches by primary key so joins and ranking in the
+    # search queryset do not inflate the grouped counts.
+    base = Product.objects.filter(pk__in=products.order_by().values('pk'))
+
+    categories = base.values('category_id', 'category__name').annotate(
+        count=Count('id')
+    ).order_by('-count', 'category__name')
+
+    stock = Inventory.objects.filter(product=OuterRef('pk'), quantity__gt=0)
+    if store_id:
+        stock = stock.filter(store_id=store_id)
+
+    aggregates = {'total': Count('id'), 'in_stock': Count('id', filter=Q(has_stock=True))}
+    for label, lower, upper in PRICE_BANDS:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(price__gte=lower)
+        if upper is not None:
+            condition &= Q(price__lt=upper)
+        aggregates[f'band_{label}'] = Count('id', filter=condition)
+
+    totals = base.annotate(has_stock=Exists(stock)).aggregate(**aggregates)
+
+    return {
+        'categories': [
+            {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'count': row['count'],
+            }
+            for row in categories
+        ],
+        'price_bands': [
+            {
+                'label': label,
+                'min': lower,
+                'max': upper,
+                'count': totals[f'band_{label}'],
+            }
+            for label, lower, upper in PRICE_BANDS
+        ],
+        'stock': {
+            'in_stock': totals['in_stock'],
+            'out_of_stock': totals['total'] - totals['in_stock'],
+        },
+    }
+
+
+def get_facets(products, params):
+    """
+    Return facet counts for a search, served from cache when possible.
+    """
+    counts_key, stock_key = facet_cache_keys(params)
+    cached = cache.get_many([counts_key, stock_key])
+    if counts_key in cached and stock_key in cached:
+        return {**cached[counts_key], 'stock': cached[stock_key]}
+
+    facets = compute_facets(products, store_id=params.get('store_id'))
+    cache.set_many({
+        counts_key: {'categories': facets['categories'], 'price_bands': facets['price_bands']},
+        stock_key: facets['stock'],
+    }, FACET_CACHE_TIMEOUT)
+    return facets
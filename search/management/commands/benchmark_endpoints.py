@@ -0,0 +1,90 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+# (sync path, async path) pairs for the read-heavy endpoints
+ENDPOINTS = [
+    ('/api/search/products/?q=phone', '/api/async/search/products/?q=phone'),
+    ('/api/search/products/?sort_by=price', '/api/async/search/products/?sort_by=price'),
+    ('/stores/{store_id}/inventory/', '/api/async/stores/{store_id}/inventory/'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput of the sync (WSGI) and async (ASGI) read endpoints under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wsgi-url',
+            default='http://localhost:8000',
+            help='Base URL of the WSGI server (default: http://localhost:8000)'
+        )
+        parser.add_argument(
+            '--asgi-url',
+            default='http://localhost:8001',
+            help='Base URL of the ASGI server (default: http://localhost:8001)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Requests per endpoint and server (default: 500)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Concurrent in-flight requests (default: 50)'
+        )
+        parser.add_argument(
+            '--store-id',
+            type=int,
+            default=1,
+            help='Store used for the inventory endpoint (default: 1)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'endpoint':<45} {'server':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}"
+        )
+        for sync_path, async_path in ENDPOINTS:
+            for label, base_url, path in (
+                ('wsgi', options['wsgi_url'], sync_path),
+                ('asgi', options['asgi_url'], async_path),
+            ):
+                url = base_url.rstrip('/') + path.format(store_id=options['store_id'])
+                rate, p50, p95, errors = self.run_load(
+                    url, options['requests'], options['concurrency']
+                )
+                self.stdout.write(
+                    f'{path.format(store_id=options["store_id"]):<45} {label:<6} '
+                    f'{rate:>9.1f} {p50:>9.1f} {p95:>9.1f} {errors:>7}'
+                )
+
+    def run_load(self, url, total, concurrency):
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(duration * 1000 for duration, ok in results if ok)
+        errors = sum(1 for _, ok in results if not ok)
+        if not latencies:
+            return 0.0, 0.0, 0.0, errors
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return len(latencies) / elapsed, statistics.median(latencies), p95, errors
@@ -0,0 +1,64 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework import throttling
+from rest_framework.test import APIRequestFactory
+
+from project import throttling as sliding
+
+
+class Command(BaseCommand):
+    help = "Compare the per-request cost of DRF's history throttle and the sliding window throttle"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5000,
+            help='Throttle checks per implementation (default: 5000)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=20,
+            help='Distinct client IPs the checks are spread over (default: 20)'
+        )
+        parser.add_argument(
+            '--rate',
+            default='1000/min',
+            help='Rate applied to both throttles (default: 1000/min)'
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        requests = [
+            factory.get('/api/search/suggest/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}')
+            for i in range(options['clients'])
+        ]
+        for request in requests:
+            request.user = None
+
+        self.stdout.write(f"{'throttle':<20} {'us/request':>11} {'allowed':>9} {'denied':>8}")
+        for label, base in (
+            ('drf history', throttling.AnonRateThrottle),
+            ('sliding window', sliding.AnonRateThrottle),
+        ):
+            throttle_class = type('BenchmarkThrottle', (base,), {
+                'rate': options['rate'],
+                'scope': f'benchmark_{label.replace(" ", "_")}',
+            })
+            cache.delete_many([
+                throttle_class.cache_format % {'scope': throttle_class.scope, 'ident': r.META['REMOTE_ADDR']}
+                for r in requests
+            ])
+            allowed = 0
+            started = time.perf_counter()
+            for i in range(options['requests']):
+                if throttle_class().allow_request(requests[i % len(requests)], None):
+                    allowed += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label:<20} {elapsed / options["requests"] * 1e6:>11.1f} '
+                f'{allowed:>9} {options["requests"] - allowed:>8}'
+            )
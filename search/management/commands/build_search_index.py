@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from search.backends.bm25 import BM25Index, current_sequence
+
+
+class Command(BaseCommand):
+    help = 'Build the BM25 search index and write it to a file that search processes map at start'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.SEARCH_INDEX_PATH,
+            help='Index file to write (default: SEARCH_INDEX_PATH)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError('Pass --path or set SEARCH_INDEX_PATH')
+
+        # Changes from here on are caught up by the processes that load the file
+        index = BM25Index.build(current_sequence())
+        index.save(path)
+        terms = sum(len(postings) for postings in index.postings.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index)} products ({terms} field terms) into {path}'
+        ))
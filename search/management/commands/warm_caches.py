@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project.warmup import warm_caches
+
+
+class Command(BaseCommand):
+    help = 'Pre-populate store inventory, search facet and autocomplete caches, e.g. after a deploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.WARMUP_CONCURRENCY,
+            help=f'Warm-up jobs run in parallel (default: {settings.WARMUP_CONCURRENCY})'
+        )
+        parser.add_argument(
+            '--store-id',
+            type=int,
+            action='append',
+            dest='store_ids',
+            help='Only warm these stores (repeatable, default: all stores)'
+        )
+        parser.add_argument(
+            '--searches',
+            type=int,
+            default=20,
+            help='Largest categories to precompute search facets for (default: 20)'
+        )
+        parser.add_argument(
+            '--prefixes',
+            type=int,
+            default=50,
+            help='Most common title prefixes to precompute autocomplete for (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        report = warm_caches(
+            concurrency=options['concurrency'],
+            store_ids=options['store_ids'],
+            search_limit=options['searches'],
+            prefix_limit=options['prefixes'],
+        )
+        for kind, counts in sorted(report['caches'].items()):
+            self.stdout.write(
+                f"{kind:<14} warmed {counts['warmed']:>5}  "
+                f"already cached {counts['skipped']:>5}  failed {counts['failed']:>3}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {report['warmed']} cache entries in {report['duration_seconds']:.2f}s"
+        ))
@@ -0,0 +1,98 @@
+from django.db import migrations, OperationalError
+
+# FTS5 index over the searchable product text, kept in sync by triggers so
+# every write path (save, bulk_create, update, raw SQL) reaches it. The rowid
+# is the product id. SQLite only; other databases skip these operations.
+CREATE_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE search_product_fts USING fts5(
+        title, category, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER search_product_fts_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO search_product_fts (rowid, title, category, description)
+        VALUES (
+            new.id, new.title,
+            (SELECT name FROM products_category WHERE id = new.category_id),
+            coalesce(new.description, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER search_product_fts_update AFTER UPDATE ON products_product BEGIN
+        DELETE FROM search_product_fts WHERE rowid = old.id;
+        INSERT INTO search_product_fts (rowid, title, category, description)
+        VALUES (
+            new.id, new.title,
+            (SELECT name FROM products_category WHERE id = new.category_id),
+            coalesce(new.description, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER search_product_fts_delete AFTER DELETE ON products_product BEGIN
+        DELETE FROM search_product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER search_product_fts_category AFTER UPDATE OF name ON products_category BEGIN
+        UPDATE search_product_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM products_product WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO search_product_fts (rowid, title, category, description)
+    SELECT product.id, product.title, category.name, coalesce(product.description, '')
+    FROM products_product product
+    JOIN products_category category ON category.id = product.category_id
+    """,
+]
+
+DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS search_product_fts_category',
+    'DROP TRIGGER IF EXISTS search_product_fts_delete',
+    'DROP TRIGGER IF EXISTS search_product_fts_update',
+    'DROP TRIGGER IF EXISTS search_product_fts_insert',
+    'DROP TABLE IF EXISTS search_product_fts',
+]
+
+
+def fts5_available(cursor):
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE temp.search_fts5_probe USING fts5(body)')
+    except OperationalError:
+        return False
+    cursor.execute('DROP TABLE temp.search_fts5_probe')
+    return True
+
+
+def create_product_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not fts5_available(cursor):
+            # SQLite built without FTS5: searches keep using icontains
+            return
+        for statement in CREATE_STATEMENTS:
+            cursor.execute(statement)
+
+
+def drop_product_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_STATEMENTS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_remove_category_name_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_fts, drop_product_fts),
+    ]
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Category, Product
+from .backends import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    """
+    Let the search backend update its index once the write is committed.
+    """
+    product_id = instance.pk
+    backend = get_search_backend()
+    transaction.on_commit(lambda: backend.product_changed(product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reindex_category(sender, instance, **kwargs):
+    # Category names are indexed with each of their products
+    category_id = instance.pk
+    backend = get_search_backend()
+    transaction.on_commit(lambda: backend.category_changed(category_id))
@@ -0,0 +1,187 @@
+"""
+In-process catalog snapshot for searches without a keyword.
+
+Most searches only filter by category, price and stock and sort by price,
+id or title. The snapshot keeps the catalog in memory as NumPy columns: id,
+price, category id, total stock over all stores, and each product's position
+in the catalog ordered by title by the database, so title sorts follow the
+database collation like the SQL path does. Such a search is then a few
+vectorized operations, and only the products on the requested page are
+loaded from the database.
+
+The snapshot is rebuilt when the catalog version moves (Product and Category
+writes). When the stock version moves (any stock change), only the stock
+column is reloaded, at most every CATALOG_SNAPSHOT_STOCK_INTERVAL seconds,
+so busy order traffic does not turn every search into a reload.
+
+NumPy is optional. Without it, or with CATALOG_SNAPSHOT disabled, every
+search takes the SQL path.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Sum
+
+from products.catalog import get_catalog_version
+from products.filters import category_tokens, resolve_category_ids
+from products.models import Product
+from project.db_router import replica_reads
+from stores.models import Inventory
+from stores.stock import get_stock_version
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _stock_totals(ids):
+    totals = dict(
+        Inventory.objects.values('product_id').annotate(
+            total=Sum('quantity')
+        ).values_list('product_id', 'total').order_by()
+    )
+    return np.fromiter((totals.get(product_id, 0) for product_id in ids), dtype=np.int64, count=len(ids))
+
+
+class CatalogSnapshot:
+    def __init__(self, catalog_version, stock_version, ids, prices, category_ids, stock, title_ranks):
+        self.catalog_version = catalog_version
+        self.stock_version = stock_version
+        self.stock_loaded_at = time.monotonic()
+        self.ids = ids
+        self.prices = prices
+        self.category_ids = category_ids
+        self.stock = stock
+        # Position of each product in the database's (title, id) order, so
+        # ordering by rank is ordering by title
+        self.title_ranks = title_ranks
+
+    @classmethod
+    def build(cls, catalog_version, stock_version):
+        # Ranked in the database so titles compare under its collation, not
+        # by code point
+        rows = list(Product.objects.order_by('title', 'id').values_list('id', 'price', 'category_id'))
+        rank = {row[0]: position for position, row in enumerate(rows)}
+        rows.sort()
+        count = len(rows)
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        return cls(
+            catalog_version,
+            stock_version,
+            ids=ids,
+            prices=np.fromiter((row[1] for row in rows), dtype=np.float64, count=count),
+            category_ids=np.fromiter((row[2] for row in rows), dtype=np.int64, count=count),
+            stock=_stock_totals(ids),
+            title_ranks=np.fromiter((rank[row[0]] for row in rows), dtype=np.int32, count=count),
+        )
+
+    def refresh_stock(self, stock_version):
+        self.stock = _stock_totals(self.ids)
+        self.stock_version = stock_version
+        self.stock_loaded_at = time.monotonic()
+
+    def search(self, category_ids=None, min_price=None, max_price=None, in_stock=False, sort_by='relevance'):
+        """
+        Ids of the matching products in the requested order, as an array.
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if category_ids is not None:
+            mask &= np.isin(self.category_ids, category_ids)
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        if in_stock:
+            mask &= self.stock > 0
+
+        # Rows are in id order, so positions are too
+        positions = np.flatnonzero(mask)
+        if sort_by == 'price':
+            # Ties are broken by id so pages stay stable
+            positions = positions[np.lexsort((self.ids[positions], self.prices[positions]))]
+        elif sort_by == 'newest':
+            positions = positions[::-1]
+        else:
+            positions = positions[np.lexsort((self.ids[positions], self.title_ranks[positions]))]
+        return self.ids[positions]
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """
+    This process's snapshot, rebuilt or restocked if the versions moved.
+    """
+    global _snapshot
+
+    catalog_version = get_catalog_version()
+    stock_version = get_stock_version()
+    snapshot = _snapshot
+    stock_due = snapshot is not None and snapshot.stock_version != stock_version and (
+        time.monotonic() - snapshot.stock_loaded_at >= settings.CATALOG_SNAPSHOT_STOCK_INTERVAL
+    )
+    if snapshot is None or snapshot.catalog_version != catalog_version or stock_due:
+        with _lock, replica_reads(False):
+            # Load from the primary so the data is at least as new as the versions
+            snapshot = _snapshot
+            if snapshot is None or snapshot.catalog_version != catalog_version:
+                snapshot = _snapshot = CatalogSnapshot.build(catalog_version, stock_version)
+            elif snapshot.stock_version != stock_version:
+                snapshot.refresh_stock(stock_version)
+    return snapshot
+
+
+def _price(value):
+    if not value:
+        return None
+    price = float(value)
+    if math.isnan(price):
+        raise ValueError(value)
+    return price
+
+
+def snapshot_search(params, page, page_size):
+    """
+    Serve a search from the snapshot when it can: no keyword, no facets, no
+    fuzzy category match and no per-store stock filter. Returns None when
+    the search has to take the SQL path, otherwise the page of product ids
+    with the same paging rules as django.core.paginator.Paginator.
+    """
+    if np is None or not settings.CATALOG_SNAPSHOT or page_size < 1:
+        return None
+    if params.get('q', '').strip() or params.get('facets', '').lower() in ('1', 'true', 'yes'):
+        return None
+    if params.get('category_match') == 'fuzzy' or (params.get('store_id') and params.get('in_stock')):
+        return None
+    try:
+        min_price = _price(params.get('min_price'))
+        max_price = _price(params.get('max_price'))
+    except ValueError:
+        # Left to the SQL path, which reports it as before
+        return None
+
+    tokens = category_tokens(params)
+    product_ids = get_snapshot().search(
+        category_ids=resolve_category_ids(tokens) if tokens else None,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=bool(params.get('in_stock')),
+        sort_by=params.get('sort_by', 'relevance'),
+    )
+
+    total_results = len(product_ids)
+    total_pages = max(1, math.ceil(total_results / page_size))
+    if page < 1 or page > total_pages:
+        page = 1
+    offset = (page - 1) * page_size
+    return {
+        'product_ids': product_ids[offset:offset + page_size].tolist(),
+        'total_results': total_results,
+        'total_pages': total_pages,
+        'page': page,
+    }
@@ -1,7 +1,9 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('api/search/products/', views.search_products, name='search_products'),
     path('api/search/suggest/', views.autocomplete_products, name='autocomplete_products'),
+    path('api/async/search/products/', async_views.search_products_async, name='search_products_async'),
+    path('api/async/search/suggest/', async_views.autocomplete_products_async, name='autocomplete_products_async'),
 ]
\ No newline at end of file
@@ -1,72 +1,43 @@
+import hashlib
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
+from django.core.cache import cache
 from django.core.paginator import Paginator
 from products.models import Product
+from products.catalog import catalog_http_cache, get_catalog_version
+from products.filters import apply_category_filter, category_tokens
 from products.serializers import ProductSerializer
 from stores.models import Inventory
+from project.db_router import read_from_replica
+from project.serializers import sparse_fieldset_params, sparse_queryset
+from .backends import get_search_backend
+from .facets import get_facets
+from .snapshot import snapshot_search
 
 
-@api_view(['GET'])
-def search_products(request):
+def filter_products(params, backend=None):
     """
-    Search products with filtering, sorting, and pagination.
-    Uses PostgreSQL Full-Text Search if available, otherwise falls back to icontains.
+    Apply keyword search and filters from the query parameters to the product queryset.
+    Shared by the result listing and the facet counts so both see the same matches.
     """
-    from django.db import connection
-    
-    # Get query parameters
-    query = request.GET.get('q', '')
-    category = request.GET.get('category')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    store_id = request.GET.get('store_id')
-    in_stock = request.GET.get('in_stock')
-    sort_by = request.GET.get('sort_by', 'relevance')
-    page = int(request.GET.get('page', 1))
-    page_size = int(request.GET.get('page_size', 20))
-    
+    backend = backend or get_search_backend()
+    query = params.get('q', '').strip()
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    store_id = params.get('store_id')
+    in_stock = params.get('in_stock')
+    sort_by = params.get('sort_by', 'relevance')
+
     # Start with all products
     products = Product.objects.all()
-    
-    # Check if using PostgreSQL
-    is_postgres = connection.vendor == 'postgresql'
-    
-    # Apply keyword search
+
+    # Apply keyword search, ranked if the backend can and relevance is requested
     if query:
-        if is_postgres:
-            # Advanced PostgreSQL Full-Text Search
-            # Create a search vector combining title, description, and category name
-            from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-            
-            # Weighted search: Title (A) > Category (B) > Description (C)
-            vector = (
-                SearchVector('title', weight='A') +
-                SearchVector('category__name', weight='B') +
-                SearchVector('description', weight='C')
-            )
-            search_query = SearchQuery(query)
-            
-            # Filter and annotate with rank
-            products = products.annotate(
-                rank=SearchRank(vector, search_query)
-            ).filter(rank__gte=0.1)  # Only reasonably relevant results
-            
-            # If sorting by relevance, use the rank
-            if sort_by == 'relevance':
-                products = products.order_by('-rank')
-        else:
-            # Fallback for SQLite/Other DBs
-            products = products.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+        products = backend.search(products, query, rank=sort_by == 'relevance')
     
-    # Apply category filter
-    if category:
-        products = products.filter(category__name__icontains=category)
+    # Apply category filter (exact ids/slugs, fuzzy name match on request)
+    products = apply_category_filter(products, params)
     
     # Apply price range filters
     if min_price:
@@ -85,37 +56,116 @@ def search_products(request):
             products = products.filter(
                 inventories__quantity__gt=0
             ).distinct()
-    
-    # Apply sorting (if not already sorted by relevance in Postgres block)
+
+    return products
+
+
+def sort_products(products, params, backend=None):
+    """
+    Apply the requested sort order to a filtered product queryset.
+    """
+    backend = backend or get_search_backend()
+    query = params.get('q', '').strip()
+    sort_by = params.get('sort_by', 'relevance')
+
+    # Apply sorting (if not already sorted by relevance by the search backend)
     if sort_by == 'price':
         products = products.order_by('price')
     elif sort_by == 'newest':
         products = products.order_by('-id')
-    elif sort_by == 'relevance' and not (query and is_postgres):
-        # Default fallback for relevance if no query or not postgres
+    elif sort_by == 'relevance' and not (query and backend.ranks):
+        # Default fallback for relevance if no query or no ranking
         products = products.order_by('title')
     elif sort_by not in ['price', 'newest', 'relevance']:
          products = products.order_by('title')
+    return products
+
+
+def products_in_order(product_ids, sparse):
+    """
+    Load the given products for serialization, keeping the order of the ids.
+    """
+    products = sparse_queryset(
+        Product.objects.filter(id__in=product_ids).select_related('category'),
+        ProductSerializer(**sparse)
+    )
+    products_by_id = {product.id: product for product in products}
+    return [products_by_id[product_id] for product_id in product_ids if product_id in products_by_id]
+
+
+def is_stock_dependent_search(request):
+    # Stock levels change far more often than the catalog
+    params = request.GET
+    return bool(params.get('store_id') or params.get('in_stock') or params.get('facets'))
+
 
-    # Apply pagination
-    paginator = Paginator(products, page_size)
+@read_from_replica
+@api_view(['GET'])
+@catalog_http_cache(stock_dependent=is_stock_dependent_search)
+def search_products(request):
+    """
+    Search products with filtering, sorting, and pagination.
+    Keyword search goes through the configured search backend (search.backends).
+    Pass facets=true to also get category, price band and stock counts for the matches,
+    and fields, exclude or expand to trim or extend each result.
+    """
+    # Get query parameters
+    query = request.GET.get('q', '').strip()
+    category = category_tokens(request.GET) or None
+    category_match = request.GET.get('category_match', 'exact')
+    min_price = request.GET.get('min_price')
+    max_price = request.GET.get('max_price')
+    store_id = request.GET.get('store_id')
+    in_stock = request.GET.get('in_stock')
+    sort_by = request.GET.get('sort_by', 'relevance')
+    include_facets = request.GET.get('facets', '').lower() in ('1', 'true', 'yes')
+    page = int(request.GET.get('page', 1))
+    page_size = int(request.GET.get('page_size', 20))
+    
+    backend = get_search_backend()
+    sparse = sparse_fieldset_params(request.GET)
+    facets = None
     
-    try:
-        paginated_products = paginator.page(page)
-    except:
-        paginated_products = paginator.page(1)
+    # Keyword-less searches are answered from the in-memory catalog snapshot
+    snapshot_page = snapshot_search(request.GET, page, page_size)
+    if snapshot_page is not None:
+        paginated_products = products_in_order(snapshot_page['product_ids'], sparse)
+        total_pages = snapshot_page['total_pages']
+        total_results = snapshot_page['total_results']
+        has_next = snapshot_page['page'] < total_pages
+        has_previous = snapshot_page['page'] > 1
+    else:
+        products = filter_products(request.GET, backend)
+        facets = get_facets(products, request.GET) if include_facets else None
+        
+        products = sort_products(products, request.GET, backend)
+        
+        # Load only the columns and joins the requested fields need
+        products = sparse_queryset(products, ProductSerializer(**sparse))
+        
+        # Apply pagination
+        paginator = Paginator(products, page_size)
+        
+        try:
+            paginated_products = paginator.page(page)
+        except:
+            paginated_products = paginator.page(1)
+        total_pages = paginator.num_pages
+        total_results = paginator.count
+        has_next = paginated_products.has_next()
+        has_previous = paginated_products.has_previous()
     
     # Serialize products
-    serializer = ProductSerializer(paginated_products, many=True)
+    serializer = ProductSerializer(paginated_products, many=True, **sparse)
     
     # Add inventory information if store_id is provided
     product_data = serializer.data
     if store_id:
-        for product_item in product_data:
+        for product, product_item in zip(paginated_products, product_data):
             try:
                 inventory = Inventory.objects.get(
                     store_id=store_id,
-                    product_id=product_item['id']
+                    product_id=product.id
                 )
                 product_item['inventory_quantity'] = inventory.quantity
                 product_item['in_stock'] = inventory.quantity > 0
@@ -128,15 +178,16 @@ def search_products(request):
         'results': product_data,
         'pagination': {
             'current_page': page,
-            'total_pages': paginator.num_pages,
-            'total_results': paginator.count,
+            'total_pages': total_pages,
+            'total_results': total_results,
             'page_size': page_size,
-            'has_next': paginated_products.has_next(),
-            'has_previous': paginated_products.has_previous(),
+            'has_next': has_next,
+            'has_previous': has_previous,
         },
         'filters_applied': {
             'query': query,
             'category': category,
+            'category_match': category_match,
             'min_price': min_price,
             'max_price': max_price,
             'store_id': store_id,
@@ -144,62 +195,88 @@ def search_products(request):
             'sort_by': sort_by,
         }
     }
+    if query and backend.max_results is not None:
+        # Only the backend's best max_results keyword matches are counted
+        response_data['pagination']['max_results'] = backend.max_results
+    if facets is not None:
+        response_data['facets'] = facets
     
     return Response(response_data, status=status.HTTP_200_OK)
 
 
 from rest_framework.decorators import throttle_classes
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from project.throttling import AnonRateThrottle
 
-class AutocompleteRateThrottle(AnonRateThrottle):
-    scope = 'autocomplete'
+AUTOCOMPLETE_CACHE_TIMEOUT = 300
 
-@api_view(['GET'])
-@throttle_classes([AutocompleteRateThrottle])
-def autocomplete_products(request):
+
+def autocomplete_cache_key(query):
+    # Matching is case-insensitive, so differently cased queries share an entry
+    digest = hashlib.md5(query.lower().encode('utf-8')).hexdigest()
+    return f'autocomplete_{get_catalog_version()}_{digest}'
+
+
+def autocomplete_suggestions(query):
     """
-    Autocomplete API for product titles.
-    Returns up to 10 product titles matching the query.
-    Rate limited to 20 requests/minute.
+    Up to 10 products whose titles match the query, prefix matches first.
+    Cached per catalog version, so product changes retire old suggestions.
     """
-    query = request.GET.get('q', '')
+    cache_key = autocomplete_cache_key(query)
+    suggestions = cache.get(cache_key)
+    if suggestions is not None:
+        return suggestions
     
-    # Minimum 3 characters required
-    if len(query) < 3:
-        return Response({
-            'error': 'Query must be at least 3 characters long'
-        }, status=status.HTTP_400_BAD_REQUEST)
+    products = Product.objects.select_related('category').order_by('title')
     
-    # Get products matching the query
     # First get prefix matches (exact start of title)
-    prefix_matches = Product.objects.filter(
-        title__istartswith=query
-    ).order_by('title')[:5]
+    prefix_matches = list(products.filter(title__istartswith=query)[:5])
     
     # Then get general matches (anywhere in title)
-    general_matches = Product.objects.filter(
+    general_matches = list(products.filter(
         title__icontains=query
     ).exclude(
         id__in=[p.id for p in prefix_matches]
-    ).order_by('title')[:5]
+    )[:5])
     
     # Combine results - prefix matches first, then general matches
-    all_matches = list(prefix_matches) + list(general_matches)
-    
-    # Limit to 10 results total
-    all_matches = all_matches[:10]
-    
-    # Format response
     suggestions = [
         {
             'id': product.id,
             'title': product.title,
             'category': product.category.name,
             'price': str(product.price),
-            'match_type': 'prefix' if product in prefix_matches else 'general'
+            'match_type': match_type
         }
-        for product in all_matches
-    ]
+        for match_type, matches in (('prefix', prefix_matches), ('general', general_matches))
+        for product in matches
+    ][:10]
+    
+    cache.set(cache_key, suggestions, AUTOCOMPLETE_CACHE_TIMEOUT)
+    return suggestions
+
+
+class AutocompleteRateThrottle(AnonRateThrottle):
+    scope = 'autocomplete'
+
+@read_from_replica
+@api_view(['GET'])
+@throttle_classes([AutocompleteRateThrottle])
+@catalog_http_cache()
+def autocomplete_products(request):
+    """
+    Autocomplete API for product titles.
+    Returns up to 10 product titles matching the query.
+    Rate limited to 20 requests/minute.
+    """
+    query = request.GET.get('q', '')
+    
+    # Minimum 3 characters required
+    if len(query) < 3:
+        return Response({
+            'error': 'Query must be at least 3 characters long'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    suggestions = autocomplete_suggestions(query)
     
     return Response({
         'query': query,
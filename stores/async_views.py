@@ -0,0 +1,83 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+from products.catalog import get_catalog_version
+from project import async_cache
+from project.db_router import read_from_replica
+from project.throttling import throttle_async
+from .models import Store
+from .listing import (
+    INVENTORY_CACHE_TIMEOUT, build_inventory_page, inventory_page_cache_key, parse_listing_options
+)
+from .stock import aget_inventory_version
+from .views import inventory_delta, inventory_etag, parse_since_version
+
+
+@read_from_replica
+@require_GET
+@throttle_async()
+async def store_inventory_async(request, store_id):
+    """
+    Async version of store_inventory for ASGI deployments.
+    Same paging, filters, ETag and ?since_version= deltas, sharing the
+    versioned per-page cache entries with the sync view.
+    """
+    try:
+        store = await Store.objects.aget(id=store_id)
+    except Store.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    # Same ETag as the sync view, so either answers the other's If-None-Match
+    etag = await sync_to_async(inventory_etag)(request, store_id)
+    if etag is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = await inventory_response(request, store)
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+    return response
+
+
+async def inventory_response(request, store):
+    store_id = store.id
+    try:
+        since_version = parse_since_version(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    version = await aget_inventory_version(store_id)
+    if since_version is not None:
+        data = await sync_to_async(inventory_delta)(store, version, since_version)
+        return JsonResponse(data, encoder=JSONEncoder)
+
+    try:
+        options = parse_listing_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    catalog_version = await sync_to_async(get_catalog_version)()
+    cache_key = inventory_page_cache_key(store_id, version, options, catalog_version)
+    page = await async_cache.aget(cache_key)
+    from_cache = page is not None
+
+    if not from_cache:
+        # Category slugs are resolved while building the queryset, so run it in a thread
+        page = await sync_to_async(build_inventory_page)(store_id, options)
+        await async_cache.aset(cache_key, page, INVENTORY_CACHE_TIMEOUT)
+
+    return JsonResponse({
+        'store_id': store_id,
+        'store_name': store.name,
+        'version': version,
+        'inventory': page['inventory'],
+        'pagination': {
+            'limit': options['limit'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+        },
+        'from_cache': from_cache
+    }, encoder=JSONEncoder)
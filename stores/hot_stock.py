@@ -0,0 +1,448 @@
+"""
+Redis-authoritative stock for hot products.
+
+Inventory rows flagged is_hot keep their live quantity in Redis, where
+orders check and decrement it atomically instead of queueing on the row
+lock. Every change is also added to a pending-delta hash, which the
+reconcile_hot_stock task drains into the database in batches, so the
+Inventory row trails Redis by a few seconds. detect_hot_stock_drift
+compares Redis with the database plus the pending deltas.
+
+Inventory.save() on a hot row sends its quantity change here as a delta
+instead of writing the column, so restocks and admin corrections reach the
+live quantity. Queryset updates bypass this and show up as drift.
+
+The backend is chosen with HOT_STOCK_BACKEND. RedisHotStock runs the
+checks as Lua scripts on the django-redis connection; InMemoryHotStock is
+an in-process stand-in for tests and single-process development.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Inventory
+from .stock import record_stock_change, stock_change_source
+
+logger = logging.getLogger(__name__)
+
+# Changes made inside compensate_on_error(), undone if the block fails
+_journal = ContextVar('hot_stock_journal', default=None)
+
+
+def _field(store_id, product_id):
+    return f'{store_id}:{product_id}'
+
+
+class HotStockBackend:
+    """
+    Interface of the hot stock stores.
+
+    Quantities are keyed by (store_id, product_id). Every successful change
+    is added to the pending delta of its pair until the reconciler
+    acknowledges having written it to the database.
+    """
+
+    def load(self, store_id, product_id, db_quantity):
+        """
+        Start tracking a pair from its database quantity plus any pending
+        delta. Does nothing if the pair is already tracked.
+        """
+        raise NotImplementedError
+
+    def get(self, store_id, product_id):
+        """
+        Current quantity, or None if the pair is not tracked.
+        """
+        raise NotImplementedError
+
+    def decrement(self, store_id, items):
+        """
+        Take {product_id: quantity} from a store, all or nothing.
+        Returns {product_id: available} for the items that are short (empty
+        on success) or raises KeyError with the untracked product ids.
+        """
+        raise NotImplementedError
+
+    def increment(self, store_id, items):
+        raise NotImplementedError
+
+    def pending(self):
+        """
+        Unreconciled deltas as {(store_id, product_id): delta}.
+        """
+        raise NotImplementedError
+
+    def acknowledge(self, deltas):
+        """
+        Subtract deltas that have been written to the database.
+        """
+        raise NotImplementedError
+
+    def forget(self, store_id, product_id):
+        raise NotImplementedError
+
+
+class InMemoryHotStock(HotStockBackend):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.quantities = {}
+        self.deltas = {}
+
+    def load(self, store_id, product_id, db_quantity):
+        with self.lock:
+            pair = (store_id, product_id)
+            self.quantities.setdefault(pair, db_quantity + self.deltas.get(pair, 0))
+
+    def get(self, store_id, product_id):
+        return self.quantities.get((store_id, product_id))
+
+    def decrement(self, store_id, items):
+        with self.lock:
+            missing = [product_id for product_id in items if (store_id, product_id) not in self.quantities]
+            if missing:
+                raise KeyError(missing)
+            shortages = {
+                product_id: self.quantities[(store_id, product_id)]
+                for product_id, quantity in items.items()
+                if self.quantities[(store_id, product_id)] < quantity
+            }
+            if not shortages:
+                self._apply(store_id, {product_id: -quantity for product_id, quantity in items.items()})
+            return shortages
+
+    def increment(self, store_id, items):
+        with self.lock:
+            missing = [product_id for product_id in items if (store_id, product_id) not in self.quantities]
+            if missing:
+                raise KeyError(missing)
+            self._apply(store_id, items)
+
+    def _apply(self, store_id, deltas):
+        for product_id, delta in deltas.items():
+            pair = (store_id, product_id)
+            self.quantities[pair] += delta
+            self.deltas[pair] = self.deltas.get(pair, 0) + delta
+
+    def pending(self):
+        return {pair: delta for pair, delta in self.deltas.items() if delta}
+
+    def acknowledge(self, deltas):
+        with self.lock:
+            for pair, delta in deltas.items():
+                self.deltas[pair] = self.deltas.get(pair, 0) - delta
+
+    def forget(self, store_id, product_id):
+        with self.lock:
+            self.quantities.pop((store_id, product_id), None)
+
+
+# KEYS: pending hash, then one stock key per item
+# ARGV: signed delta per item, then the pending hash field per item
+# Returns {1} on success, {0, index, available, ...} for short items,
+# or {-1, index, ...} for items that are not tracked.
+ADJUST_SCRIPT = """
+local count = #KEYS - 1
+local missing = {-1}
+local short = {0}
+for i = 1, count do
+    local value = redis.call('GET', KEYS[i + 1])
+    if not value then
+        table.insert(missing, i)
+    elseif tonumber(value) + tonumber(ARGV[i]) < 0 then
+        table.insert(short, i)
+        table.insert(short, tonumber(value))
+    end
+end
+if #missing > 1 then
+    return missing
+end
+if #short > 1 then
+    return short
+end
+for i = 1, count do
+    redis.call('INCRBY', KEYS[i + 1], ARGV[i])
+    redis.call('HINCRBY', KEYS[1], ARGV[count + i], ARGV[i])
+end
+return {1}
+"""
+
+# KEYS: stock key, pending hash. ARGV: database quantity, pending field
+LOAD_SCRIPT = """
+local pending = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+return redis.call('SET', KEYS[1], tonumber(ARGV[1]) + pending, 'NX')
+"""
+
+# KEYS: pending hash. ARGV: field, delta pairs
+ACKNOWLEDGE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1])) == 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return 1
+"""
+
+
+class RedisHotStock(HotStockBackend):
+    prefix = 'hot_stock'
+
+    def __init__(self, client=None):
+        if client is None:
+            try:
+                from django_redis import get_redis_connection
+            except ImportError:
+                raise ImproperlyConfigured('RedisHotStock requires django-redis')
+            client = get_redis_connection('default')
+        self.client = client
+        self.pending_key = f'{self.prefix}:pending'
+        self.adjust_script = client.register_script(ADJUST_SCRIPT)
+        self.load_script = client.register_script(LOAD_SCRIPT)
+        self.acknowledge_script = client.register_script(ACKNOWLEDGE_SCRIPT)
+
+    def key(self, store_id, product_id):
+        return f'{self.prefix}:{store_id}:{product_id}'
+
+    def load(self, store_id, product_id, db_quantity):
+        self.load_script(
+            keys=[self.key(store_id, product_id), self.pending_key],
+            args=[db_quantity, _field(store_id, product_id)]
+        )
+
+    def get(self, store_id, product_id):
+        value = self.client.get(self.key(store_id, product_id))
+        return int(value) if value is not None else None
+
+    def _adjust(self, store_id, deltas):
+        product_ids = list(deltas)
+        result = self.adjust_script(
+            keys=[self.pending_key] + [self.key(store_id, product_id) for product_id in product_ids],
+            args=[deltas[product_id] for product_id in product_ids] +
+                 [_field(store_id, product_id) for product_id in product_ids]
+        )
+        if result[0] == -1:
+            raise KeyError([product_ids[index - 1] for index in result[1:]])
+        return {
+            product_ids[result[i] - 1]: int(result[i + 1])
+            for i in range(1, len(result), 2)
+        }
+
+    def decrement(self, store_id, items):
+        return self._adjust(store_id, {product_id: -quantity for product_id, quantity in items.items()})
+
+    def increment(self, store_id, items):
+        self._adjust(store_id, items)
+
+    def pending(self):
+        deltas = {}
+        for field, delta in self.client.hgetall(self.pending_key).items():
+            store_id, product_id = field.decode().split(':')
+            if int(delta):
+                deltas[(int(store_id), int(product_id))] = int(delta)
+        return deltas
+
+    def acknowledge(self, deltas):
+        args = []
+        for (store_id, product_id), delta in deltas.items():
+            args += [_field(store_id, product_id), delta]
+        if args:
+            self.acknowledge_script(keys=[self.pending_key], args=args)
+
+    def forget(self, store_id, product_id):
+        self.client.delete(self.key(store_id, product_id))
+
+
+_backends = {}
+
+
+def get_hot_stock():
+    path = settings.HOT_STOCK_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def _load_missing(store_id, product_ids):
+    backend = get_hot_stock()
+    for product_id, quantity in Inventory.objects.filter(
+        store_id=store_id, product_id__in=product_ids
+    ).values_list('product_id', 'quantity'):
+        backend.load(store_id, product_id, quantity)
+
+
+def _adjust(store_id, items, decrement):
+    backend = get_hot_stock()
+    operation = backend.decrement if decrement else backend.increment
+    try:
+        result = operation(store_id, items)
+    except KeyError as e:
+        # Not tracked yet (first use after flagging, or Redis was flushed)
+        _load_missing(store_id, e.args[0])
+        result = operation(store_id, items)
+    if not result:
+        journal = _journal.get()
+        if journal is not None:
+            journal.append((store_id, items, decrement))
+    return result
+
+
+def decrement_hot_stock(store_id, items):
+    """
+    Take {product_id: quantity} from hot stock, all or nothing.
+    Returns {product_id: available} for short items; empty on success.
+    """
+    return _adjust(store_id, items, decrement=True)
+
+
+def increment_hot_stock(store_id, items):
+    _adjust(store_id, items, decrement=False)
+
+
+@contextmanager
+def compensate_on_error():
+    """
+    Undo the hot stock changes made in the block if it raises, e.g. when
+    the database transaction they belong to rolls back.
+    """
+    journal = []
+    token = _journal.set(journal)
+    try:
+        yield
+    except BaseException:
+        backend = get_hot_stock() if journal else None
+        for store_id, items, decrement in reversed(journal):
+            if decrement:
+                backend.increment(store_id, items)
+            elif backend.decrement(store_id, items):
+                # The returned stock was taken again in the meantime
+                logger.warning('Could not undo hot stock increment %s in store %s', items, store_id)
+        raise
+    finally:
+        _journal.reset(token)
+
+
+def send_to_hot_stock(inventory):
+    """
+    Apply the quantity change saved on a hot inventory row, relative to
+    the quantity it was loaded with, to the hot stock store, and put the
+    loaded quantity back on the instance. Restocks and corrections thus
+    reach the live quantity and are written to the database by the
+    reconciler. Raises ValueError if the change takes more than the hot
+    stock holds or the loaded quantity is unknown.
+    """
+    if 'quantity' in inventory.get_deferred_fields():
+        return
+    previous = getattr(inventory, '_loaded_quantity', None)
+    if previous is None:
+        raise ValueError('Hot stock can only be changed on inventory rows loaded from the database')
+    delta = inventory.quantity - previous
+    store_id, product_id = inventory.store_id, inventory.product_id
+    if delta > 0:
+        increment_hot_stock(store_id, {product_id: delta})
+    elif delta < 0:
+        shortages = decrement_hot_stock(store_id, {product_id: -delta})
+        if shortages:
+            raise ValueError(
+                f'Cannot take {-delta} of product {product_id} from store {store_id}: '
+                f'{shortages[product_id]} left in hot stock'
+            )
+    inventory.quantity = previous
+
+
+def mark_hot(store_id, product_id):
+    """
+    Move a pair's stock to the hot stock store.
+    """
+    with transaction.atomic():
+        inventory = Inventory.objects.select_for_update().get(store_id=store_id, product_id=product_id)
+        inventory.is_hot = True
+        inventory.save(update_fields=['is_hot'])
+        quantity = inventory.quantity
+    get_hot_stock().load(store_id, product_id, quantity)
+
+
+def unmark_hot(store_id, product_id):
+    """
+    Hand a pair's stock back to the database.
+    The flag is cleared, the pending delta written and the pair forgotten
+    under the row lock, so an order waiting on the row reads the quantity
+    with every delta in it.
+    """
+    backend = get_hot_stock()
+    with transaction.atomic(), stock_change_source('hot_stock'):
+        inventory = Inventory.objects.select_for_update().get(store_id=store_id, product_id=product_id)
+        pair = (store_id, product_id)
+        delta = backend.pending().get(pair, 0)
+        quantity = max(inventory.quantity + delta, 0)
+        Inventory.objects.filter(id=inventory.id).update(is_hot=False, quantity=quantity)
+        if quantity != inventory.quantity:
+            record_stock_change(store_id, product_id, quantity, quantity - inventory.quantity)
+        backend.forget(store_id, product_id)
+        transaction.on_commit(lambda: backend.acknowledge({pair: delta}))
+
+
+def reconcile_hot_stock():
+    """
+    Write the pending hot stock deltas to the database in one transaction.
+    Deltas are acknowledged after the commit; a crash in between writes
+    them again on the next run, which drift detection would report.
+    """
+    backend = get_hot_stock()
+    deltas = backend.pending()
+    if not deltas:
+        return 0
+    
+    with transaction.atomic(), stock_change_source('hot_stock'):
+        for (store_id, product_id), delta in sorted(deltas.items()):
+            stock = Inventory.objects.filter(store_id=store_id, product_id=product_id)
+            row = stock.select_for_update().values_list('quantity', 'is_hot').first()
+            if row is None:
+                logger.error('Hot stock for store %s product %s has no inventory row', store_id, product_id)
+                continue
+            current, is_hot = row
+            if not is_hot:
+                # Unmarked since the deltas were read; unmark_hot wrote them
+                del deltas[(store_id, product_id)]
+                continue
+            quantity = current + delta
+            if quantity < 0:
+                # The database and the hot stock store disagree; stop at zero
+                # and log what was actually written
+                logger.error(
+                    'Hot stock delta %s for store %s product %s would take the row from %s to %s; '
+                    'writing 0 instead', delta, store_id, product_id, current, quantity
+                )
+                quantity = 0
+            stock.update(quantity=quantity)
+            record_stock_change(store_id, product_id, quantity, quantity - current)
+        transaction.on_commit(lambda: backend.acknowledge(deltas))
+    return len(deltas)
+
+
+def detect_drift():
+    """
+    Compare each hot pair in the hot stock store with its database
+    quantity plus its pending delta. A reconcile running at the same time
+    can show up as a one-off difference; drift that persists is real.
+    """
+    backend = get_hot_stock()
+    pending = backend.pending()
+    drift = []
+    for store_id, product_id, quantity in Inventory.objects.filter(
+        is_hot=True
+    ).values_list('store_id', 'product_id', 'quantity'):
+        expected = quantity + pending.get((store_id, product_id), 0)
+        actual = backend.get(store_id, product_id)
+        if actual != expected:
+            drift.append({
+                'store_id': store_id,
+                'product_id': product_id,
+                'hot_quantity': actual,
+                'expected_quantity': expected,
+            })
+    return drift
@@ -0,0 +1,146 @@
+"""
+Paginated, filtered store inventory listings.
+
+Pages are ordered by (product title, inventory id) and addressed with an
+opaque keyset cursor, so fetching page N costs the same as fetching page 1.
+Each page is cached on its own under the store's inventory version and
+the catalog version.
+"""
+import base64
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from products.catalog import get_catalog_version
+from products.filters import apply_category_filter, category_tokens
+from project.serializers import sparse_fieldset_params, sparse_queryset
+from .models import Inventory
+from .serializers import InventorySerializer
+from .stock import inventory_cache_key
+
+INVENTORY_CACHE_TIMEOUT = 300
+INVENTORY_PAGE_SIZE = 100
+MAX_INVENTORY_PAGE_SIZE = 500
+
+
+def encode_cursor(title, inventory_id):
+    raw = json.dumps([title, inventory_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        title, inventory_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(title, str) or not isinstance(inventory_id, int):
+        raise ValueError('Invalid cursor')
+    return title, inventory_id
+
+
+def _decimal(value, name):
+    try:
+        return str(Decimal(value).normalize())
+    except InvalidOperation:
+        raise ValueError(f'{name} must be a number')
+
+
+def parse_listing_options(params):
+    """
+    Validate the listing query parameters into a normalized dict.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    try:
+        limit = int(params.get('limit', INVENTORY_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_INVENTORY_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_INVENTORY_PAGE_SIZE}')
+    
+    low_stock = params.get('low_stock') or None
+    if low_stock is not None:
+        try:
+            low_stock = int(low_stock)
+        except ValueError:
+            raise ValueError('low_stock must be an integer')
+    
+    cursor = params.get('cursor')
+    return {
+        'cursor': list(decode_cursor(cursor)) if cursor else None,
+        'limit': limit,
+        'category': sorted(token.lower() for token in category_tokens(params)),
+        'category_match': params.get('category_match') or 'exact',
+        'in_stock': params.get('in_stock', '').lower() in ('1', 'true', 'yes'),
+        'low_stock': low_stock,
+        'min_price': _decimal(params['min_price'], 'min_price') if params.get('min_price') else None,
+        'max_price': _decimal(params['max_price'], 'max_price') if params.get('max_price') else None,
+        'sparse': sparse_fieldset_params(params),
+    }
+
+
+DEFAULT_LISTING_OPTIONS = parse_listing_options({})
+
+
+def inventory_page_cache_key(store_id, version, options=DEFAULT_LISTING_OPTIONS, catalog_version=None):
+    # Pages show product titles and prices, so catalog writes retire them too
+    if catalog_version is None:
+        catalog_version = get_catalog_version()
+    key = f'{inventory_cache_key(store_id, version)}_c{catalog_version}'
+    if options == DEFAULT_LISTING_OPTIONS:
+        # The first unfiltered page keeps the plain versioned key
+        return key
+    digest = hashlib.md5(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'{key}_{digest}'
+
+
+def build_inventory_page(store_id, options):
+    """
+    Serialize one page of a store's inventory.
+    Fetches one row past the page to tell whether another page follows.
+    """
+    # Only the columns and joins of the requested fields, plus the cursor's title
+    items = sparse_queryset(
+        Inventory.objects.filter(store_id=store_id),
+        InventorySerializer(**options['sparse']),
+        extra=('product__title',)
+    )
+    
+    if options['category']:
+        items = apply_category_filter(items, {
+            'category': ','.join(options['category']),
+            'category_match': options['category_match'],
+        }, prefix='product__')
+    if options['in_stock']:
+        items = items.filter(quantity__gt=0)
+    if options['low_stock'] is not None:
+        items = items.filter(quantity__lte=options['low_stock'])
+    if options['min_price'] is not None:
+        items = items.filter(product__price__gte=options['min_price'])
+    if options['max_price'] is not None:
+        items = items.filter(product__price__lte=options['max_price'])
+    
+    if options['cursor']:
+        title, inventory_id = options['cursor']
+        items = items.filter(
+            Q(product__title__gt=title) |
+            Q(product__title=title, id__gt=inventory_id)
+        )
+    
+    rows = list(items.order_by('product__title', 'id')[:options['limit'] + 1])
+    has_more = len(rows) > options['limit']
+    rows = rows[:options['limit']]
+    
+    return {
+        'inventory': InventorySerializer(rows, many=True, **options['sparse']).data,
+        'next_cursor': encode_cursor(rows[-1].product.title, rows[-1].id) if has_more else None,
+        'has_more': has_more,
+    }
+
+
+def cache_inventory_page(store_id, version, options=DEFAULT_LISTING_OPTIONS):
+    page = build_inventory_page(store_id, options)
+    cache.set(inventory_page_cache_key(store_id, version, options), page, INVENTORY_CACHE_TIMEOUT)
+    return page
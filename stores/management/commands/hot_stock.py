@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stores.hot_stock import detect_drift, mark_hot, unmark_hot
+from stores.models import Inventory
+
+
+class Command(BaseCommand):
+    help = 'Flag products as hot so their stock is kept in Redis, or check hot stock for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['mark', 'unmark', 'drift'])
+        parser.add_argument('--store-id', type=int, help='Store of the inventory row')
+        parser.add_argument('--product-id', type=int, help='Product of the inventory row')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'drift':
+            drift = detect_drift()
+            for entry in drift:
+                self.stdout.write(
+                    f"store {entry['store_id']} product {entry['product_id']}: "
+                    f"hot {entry['hot_quantity']}, expected {entry['expected_quantity']}"
+                )
+            self.stdout.write(self.style.SUCCESS(f'{len(drift)} hot products drifted'))
+            return
+
+        store_id, product_id = options['store_id'], options['product_id']
+        if store_id is None or product_id is None:
+            raise CommandError('--store-id and --product-id are required')
+        try:
+            if options['action'] == 'mark':
+                mark_hot(store_id, product_id)
+            else:
+                unmark_hot(store_id, product_id)
+        except Inventory.DoesNotExist:
+            raise CommandError(f'Store {store_id} does not stock product {product_id}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Product {product_id} in store {store_id} {options['action']}ed as hot"
+        ))
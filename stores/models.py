@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 
 
 class Store(models.Model):
@@ -18,15 +19,80 @@ class Inventory(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='inventories')
     product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='inventories')
     quantity = models.PositiveIntegerField(default=0)
+    # Live quantity is held in the hot stock store (stores.hot_stock) and
+    # written back here by the reconciler
+    is_hot = models.BooleanField(default=False)
     
     class Meta:
+        # The unique (store, product) index also serves per-store listings
+        # and the store/product lookups in create_order.
         unique_together = ['store', 'product']
         indexes = [
-            models.Index(fields=['store', 'product']),
+            # Stock lookups for a product across stores, covering the store id
+            models.Index(
+                fields=['product', 'quantity'],
+                include=['store'],
+                name='inventory_product_qty_idx',
+            ),
+            # In-stock filters for a single store only touch rows with stock
+            models.Index(
+                fields=['store', 'product'],
+                condition=Q(quantity__gt=0),
+                name='inventory_store_in_stock_idx',
+            ),
         ]
     
     def __str__(self):
         return f'{self.store.name} - {self.product.title} ({self.quantity})'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded quantity so saves can log the change as a delta
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self.is_hot and not self._state.adding:
+            # The live quantity is in the hot stock store: the change goes
+            # there and the column is left to the reconciler
+            from .hot_stock import send_to_hot_stock
+            send_to_hot_stock(self)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [field for field in update_fields if field != 'quantity']
+        super().save(*args, **kwargs)
+    
     def is_in_stock(self):
         return self.quantity > 0
+
+
+class StockChange(models.Model):
+    """
+    Append-only log of inventory quantity changes.
+    The auto-increment id is the feed sequence number consumers sync from.
+    """
+    # No FK constraints: the log outlives deleted stores, products and inventory rows
+    store = models.ForeignKey(
+        Store, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    product = models.ForeignKey(
+        'products.Product', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    quantity = models.PositiveIntegerField()
+    delta = models.IntegerField(null=True)
+    source = models.CharField(max_length=30, default='update')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'id'], name='stock_change_store_seq_idx'),
+        ]
+        ordering = ['id']
+    
+    def __str__(self):
+        return f'#{self.id} store {self.store_id} product {self.product_id}: {self.quantity}'
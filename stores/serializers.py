@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Store, Inventory
+from project.serializers import SparseFieldsetsMixin
+from .models import Store, Inventory, StockChange
 
 
 class StoreSerializer(serializers.ModelSerializer):
@@ -8,11 +9,18 @@ class StoreSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'location']
 
 
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     product_title = serializers.CharField(source='product.title', read_only=True)
     product_price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, read_only=True)
     category_name = serializers.CharField(source='product.category.name', read_only=True)
     
     class Meta:
         model = Inventory
-        fields = ['id', 'product', 'product_title', 'product_price', 'category_name', 'quantity']
\ No newline at end of file
+        fields = ['id', 'product', 'product_title', 'product_price', 'category_name', 'quantity']
+        expandable_fields = {'product': ('products.serializers.ProductSerializer', {})}
+
+
+class StockChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockChange
+        fields = ['id', 'store', 'product', 'quantity', 'delta', 'source', 'created_at']
@@ -1,14 +1,40 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
 from .models import Inventory
+from .stock import record_stock_change
 
 
 @receiver(post_save, sender=Inventory)
+def log_inventory_save(sender, instance, created, **kwargs):
+    """
+    Append quantity changes to the stock change feed.
+    The new entry also moves the store's inventory version, which retires
+    its cached listing and ETag.
+    """
+    previous = getattr(instance, '_loaded_quantity', None)
+    if created:
+        delta = instance.quantity
+    elif previous is None:
+        # Saved without being loaded first, so the old quantity is unknown
+        delta = None
+    elif previous == instance.quantity:
+        return
+    else:
+        delta = instance.quantity - previous
+    
+    record_stock_change(instance.store_id, instance.product_id, instance.quantity, delta)
+    instance._loaded_quantity = instance.quantity
+
+
 @receiver(post_delete, sender=Inventory)
-def invalidate_store_inventory_cache(sender, instance, **kwargs):
+def log_inventory_delete(sender, instance, **kwargs):
     """
-    Invalidate the store inventory cache when inventory items are updated or deleted.
+    Record a removed inventory row as a drop to zero in the stock change feed.
     """
-    cache_key = f'inventory_store_{instance.store_id}'
-    cache.delete(cache_key)
+    previous = getattr(instance, '_loaded_quantity', instance.quantity)
+    record_stock_change(
+        instance.store_id,
+        instance.product_id,
+        0,
+        -previous if previous is not None else None
+    )
@@ -0,0 +1,184 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+
+from project.db_router import replica_reads
+from .models import Inventory, StockChange
+
+# Availability entries are dropped on every stock change; the timeout only
+# bounds how long a read racing with a write can leave a stale entry behind.
+AVAILABILITY_CACHE_TIMEOUT = 60
+
+# Moves on every committed stock change in any store; like the catalog
+# version it is a millisecond timestamp, so it still moves forward if evicted
+STOCK_VERSION_KEY = 'stock_version'
+# Moves only when a row goes from out of stock to in stock or back, which
+# is all in-stock counts and filters depend on
+STOCK_PRESENCE_VERSION_KEY = 'stock_presence_version'
+
+_source = ContextVar('stock_change_source', default='update')
+
+
+@contextmanager
+def stock_change_source(source):
+    """
+    Label the stock changes logged inside the block, e.g. 'order' or 'restock'.
+    """
+    token = _source.set(source)
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+
+def record_stock_change(store_id, product_id, quantity, delta, source=None):
+    """
+    Append an entry to the stock change feed.
+
+    Inventory.save() and delete() log through signals. Code that changes
+    quantities with queryset.update() must call this itself.
+    """
+    # An unknown delta may have crossed zero too
+    crossed = delta is None or (quantity > 0) != (quantity - delta > 0)
+    transaction.on_commit(lambda: stock_changed(product_id, crossed))
+    return StockChange.objects.create(
+        store_id=store_id,
+        product_id=product_id,
+        quantity=quantity,
+        delta=delta,
+        source=source or _source.get(),
+    )
+
+
+def stock_changed(product_id, crossed=True):
+    cache.delete(availability_cache_key(product_id))
+    bump_stock_version()
+    if crossed:
+        bump_stock_presence_version()
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    current = cache.get(key) or 0
+    version = max(int(time.time() * 1000), current + 1)
+    cache.set(key, version, None)
+    return version
+
+
+def get_stock_version():
+    return _get_version(STOCK_VERSION_KEY)
+
+
+def bump_stock_version():
+    return _bump_version(STOCK_VERSION_KEY)
+
+
+def get_stock_presence_version():
+    return _get_version(STOCK_PRESENCE_VERSION_KEY)
+
+
+def bump_stock_presence_version():
+    return _bump_version(STOCK_PRESENCE_VERSION_KEY)
+
+
+def adjust_stock(store_id, product_id, delta, source=None):
+    """
+    Add delta to a store's stock of a product with one conditional UPDATE.
+    
+    Returns the new quantity, or None when the product is not stocked or
+    there is not enough of it; nothing is changed in that case. The row
+    stays locked until the surrounding transaction ends, so call it inside
+    one and keep that transaction short.
+    
+    Hot pairs are changed in the hot stock store instead; wrap the
+    transaction in hot_stock.compensate_on_error() so a rollback undoes that.
+    """
+    stock = Inventory.objects.filter(store_id=store_id, product_id=product_id)
+    if not stock.filter(is_hot=False, quantity__gte=max(-delta, 0)).update(quantity=F('quantity') + delta):
+        if stock.filter(is_hot=True).exists():
+            return _adjust_hot_stock(store_id, product_id, delta)
+        return None
+    quantity = stock.values_list('quantity', flat=True).get()
+    record_stock_change(store_id, product_id, quantity, delta, source)
+    return quantity
+
+
+def _adjust_hot_stock(store_id, product_id, delta):
+    from .hot_stock import decrement_hot_stock, get_hot_stock, increment_hot_stock
+    
+    if delta < 0:
+        if decrement_hot_stock(store_id, {product_id: -delta}):
+            return None
+    else:
+        increment_hot_stock(store_id, {product_id: delta})
+    return get_hot_stock().get(store_id, product_id)
+
+
+def get_inventory_version(store_id):
+    """
+    Current inventory version of a store: the sequence number of its latest
+    stock change. Served from the (store, id) index, and only ever moves
+    forward once a write commits.
+    """
+    return StockChange.objects.filter(store_id=store_id).aggregate(
+        version=Max('id')
+    )['version'] or 0
+
+
+async def aget_inventory_version(store_id):
+    result = await StockChange.objects.filter(store_id=store_id).aaggregate(
+        version=Max('id')
+    )
+    return result['version'] or 0
+
+
+def inventory_cache_key(store_id, version):
+    # Keyed by version, so writes never have to invalidate the cached listing
+    return f'inventory_store_{store_id}_v{version}'
+
+
+def availability_cache_key(product_id):
+    return f'availability_product_{product_id}'
+
+
+def get_availability(product_ids):
+    """
+    Quantities per store for each product, as {product_id: {store_id: quantity}}.
+
+    Each product is cached on its own with its quantities in every store, so
+    a lookup costs one cache round trip plus, for the misses, one query on
+    the (product, quantity) inventory index. Misses are read from the
+    primary, so a lagging replica never re-caches quantities the last
+    stock change just invalidated.
+    """
+    keys = {availability_cache_key(product_id): product_id for product_id in product_ids}
+    cached = cache.get_many(keys)
+    availability = {keys[key]: stores for key, stores in cached.items()}
+    
+    missing = [product_id for product_id in product_ids if product_id not in availability]
+    if missing:
+        fetched = {product_id: {} for product_id in missing}
+        with replica_reads(False):
+            rows = list(Inventory.objects.filter(
+                product_id__in=missing
+            ).values_list('product_id', 'store_id', 'quantity'))
+        for product_id, store_id, quantity in rows:
+            fetched[product_id][store_id] = quantity
+        cache.set_many(
+            {availability_cache_key(product_id): stores for product_id, stores in fetched.items()},
+            AVAILABILITY_CACHE_TIMEOUT
+        )
+        availability.update(fetched)
+    
+    return availability
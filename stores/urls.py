@@ -1,7 +1,11 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
+    path('stores/availability/', views.store_availability, name='store_availability'),
+    path('stores/stock-changes/', views.stock_changes, name='stock_changes'),
     path('stores/<int:store_id>/orders/', views.store_orders, name='store_orders'),
+    path('stores/<int:store_id>/sales/', views.store_sales, name='store_sales'),
     path('stores/<int:store_id>/inventory/', views.store_inventory, name='store_inventory'),
+    path('api/async/stores/<int:store_id>/inventory/', async_views.store_inventory_async, name='store_inventory_async'),
 ]
\ No newline at end of file
@@ -1,37 +1,57 @@
+import hashlib
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.db.models import Prefetch
+from django.db.models import Prefetch, Sum
+from django.views.decorators.http import condition
 from django.core.cache import cache
-from .models import Store, Inventory
-from orders.models import Order, OrderItem
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+from .models import Store, Inventory, StockChange
+from orders.models import Order, OrderItem, ProductSalesRollup, SalesRollupState, StoreSalesRollup
+from orders.rollups import parse_sales_params
 from orders.serializers import OrderSerializer
-from .serializers import InventorySerializer
+from .serializers import InventorySerializer, StockChangeSerializer
+from .listing import cache_inventory_page, inventory_page_cache_key, parse_listing_options
+from .stock import get_availability, get_inventory_version
+from products.catalog import get_catalog_version
+from project.db_router import read_from_replica
+from project.serializers import sparse_fieldset_params, sparse_queryset
 
 
+@read_from_replica
 @api_view(['GET'])
 def store_orders(request, store_id):
     """
     List all orders for a specific store.
     Returns orders sorted by newest first with efficient queries.
-    """ 
+    Supports fields, exclude and expand to trim the payload.
+    """
     store = get_object_or_404(Store, id=store_id)
+    sparse = sparse_fieldset_params(request.GET)
+    selected = OrderSerializer(**sparse)
+    fields = selected.fields
+    
+    # Only the columns and joins of the requested fields are loaded
+    orders = sparse_queryset(Order.objects.filter(store=store), selected)
     
     # Efficient query with prefetch related to avoid N+1 issues
-    orders = Order.objects.filter(store=store).prefetch_related(
-        Prefetch(
-            'order_items', 
-            queryset=OrderItem.objects.select_related('product')
+    if 'order_items' in fields:
+        order_items = sparse_queryset(
+            OrderItem.objects.select_related('product'),
+            fields['order_items'],
+            extra=('order',)
+        )
+        orders = orders.prefetch_related(Prefetch('order_items', queryset=order_items))
+    elif 'total_items' in fields:
+        orders = orders.prefetch_related(
+            Prefetch('order_items', queryset=OrderItem.objects.only('id', 'order'))
         )
-    )
-    
-    serializer = OrderSerializer(orders, many=True)
     
-    # Add total items count to each order
+    serializer = OrderSerializer(orders, many=True, **sparse)
     orders_data = serializer.data
-    for order_data in orders_data:
-        order_data['total_items'] = len(order_data.get('order_items', []))
     
     return Response({
         'store_id': store_id,
@@ -40,40 +60,269 @@ def store_orders(request, store_id):
     }, status=status.HTTP_200_OK)
 
 
+def inventory_etag(request, store_id):
+    if not Store.objects.filter(id=store_id).exists():
+        # No ETag, so the view runs and answers 404
+        return None
+    # Listings show product titles and prices too, so catalog writes count
+    etag = f'inventory-{store_id}-{get_inventory_version(store_id)}-{get_catalog_version()}'
+    if request.GET:
+        # Different query parameters select different representations
+        params = hashlib.md5(request.GET.urlencode().encode('utf-8')).hexdigest()[:12]
+        etag = f'{etag}-{params}'
+    return etag
+
+
+@read_from_replica
+@condition(etag_func=inventory_etag)
 @api_view(['GET'])
 def store_inventory(request, store_id):
     """
     List inventory items for a specific store with caching.
-    Returns items sorted alphabetically by product title.
+    Returns items sorted alphabetically by product title, a page at a time:
+    pass next_cursor back as ?cursor= for the next page. Filters: category,
+    in_stock, low_stock (quantity at or below), min_price and max_price.
+    
+    Responses carry an ETag derived from the store's inventory version and
+    the catalog version, so If-None-Match gets a 304 until stock or the
+    products listed change. Pass ?since_version= to get only the items
+    changed after that version.
     """
     store = get_object_or_404(Store, id=store_id)
+    version = get_inventory_version(store_id)
+    
+    try:
+        since_version = parse_since_version(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if since_version is not None:
+        return Response(inventory_delta(store, version, since_version), status=status.HTTP_200_OK)
+    
+    try:
+        options = parse_listing_options(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     # Try to get from cache first
-    cache_key = f'inventory_store_{store_id}'
-    cached_data = cache.get(cache_key)
-    
-    if cached_data:
-        return Response({
-            'store_id': store_id,
-            'store_name': store.name,
-            'inventory': cached_data,
-            'from_cache': True
-        }, status=status.HTTP_200_OK)
-    
-    # Efficient query with select_related to avoid N+1 issues
-    inventory_items = Inventory.objects.filter(store=store).select_related(
-        'product', 
+    page = cache.get(inventory_page_cache_key(store_id, version, options))
+    from_cache = page is not None
+    if not from_cache:
+        # Cache miss: one keyset query with select_related, cached under this version
+        page = cache_inventory_page(store_id, version, options)
+    
+    return Response({
+        'store_id': store_id,
+        'store_name': store.name,
+        'version': version,
+        'inventory': page['inventory'],
+        'pagination': {
+            'limit': options['limit'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+        },
+        'from_cache': from_cache
+    }, status=status.HTTP_200_OK)
+
+
+def parse_since_version(params):
+    """
+    The ?since_version= of an inventory request, or None without one.
+    Raises ValueError if it is not an integer.
+    """
+    since_version = params.get('since_version')
+    if since_version is None:
+        return None
+    try:
+        return int(since_version)
+    except ValueError:
+        raise ValueError('since_version must be an integer')
+
+
+def inventory_delta(store, version, since_version):
+    """
+    Items of a store whose stock changed after since_version, plus the
+    products whose inventory rows were removed.
+    """
+    changed_product_ids = set(
+        StockChange.objects.filter(
+            store_id=store.id, id__gt=since_version, id__lte=version
+        ).values_list('product_id', flat=True)
+    )
+    inventory_items = Inventory.objects.filter(
+        store=store, product_id__in=changed_product_ids
+    ).select_related(
+        'product',
         'product__category'
     ).order_by('product__title')
     
     serializer = InventorySerializer(inventory_items, many=True)
+    removed = changed_product_ids - {item['product'] for item in serializer.data}
     
-    # Cache the result for 5 minutes
-    cache.set(cache_key, serializer.data, 300)
-    
-    return Response({
-        'store_id': store_id,
+    return {
+        'store_id': store.id,
         'store_name': store.name,
+        'version': version,
+        'since_version': since_version,
         'inventory': serializer.data,
+        'removed_product_ids': sorted(removed),
         'from_cache': False
+    }
+
+
+@api_view(['GET'])
+def stock_changes(request):
+    """
+    Incremental feed of inventory quantity changes.
+    Returns changes after ?cursor= in sequence order, optionally for one store.
+    Pass next_cursor back as the cursor to continue from where a sync stopped.
+    
+    Served from the primary: a lagging replica could show a later change
+    before an earlier one and move the cursor past it. A change whose
+    transaction commits more than STOCK_CHANGE_FEED_LAG seconds after it
+    was written can still be skipped, so that lag has to stay above the
+    longest transaction writing inventory.
+    """
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limit = min(int(request.GET.get('limit', 500)), 1000)
+    except ValueError:
+        return Response(
+            {'error': 'cursor and limit must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    store_id = request.GET.get('store_id')
+    
+    # Sequence numbers are assigned on insert but become visible on commit.
+    # Holding back the newest changes briefly lets in-flight transactions
+    # commit, so a consumer does not move its cursor past a change it never saw.
+    settled_before = timezone.now() - timedelta(seconds=settings.STOCK_CHANGE_FEED_LAG)
+    changes = StockChange.objects.filter(id__gt=cursor, created_at__lte=settled_before)
+    if store_id:
+        changes = changes.filter(store_id=store_id)
+    
+    page = list(changes.order_by('id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    
+    return Response({
+        'changes': StockChangeSerializer(page, many=True).data,
+        'next_cursor': page[-1].id if page else cursor,
+        'has_more': has_more
     }, status=status.HTTP_200_OK)
+
+
+MAX_AVAILABILITY_PRODUCTS = 100
+
+
+def parse_id_list(value):
+    return list(dict.fromkeys(int(token) for token in value.split(',') if token.strip()))
+
+
+@read_from_replica
+@api_view(['GET'])
+def store_availability(request):
+    """
+    Quantities of the given products across stores.
+    Takes comma-separated ?product_ids= and optionally ?store_ids=; without
+    store_ids, every store stocking the product is listed.
+    """
+    try:
+        product_ids = parse_id_list(request.GET.get('product_ids', ''))
+        store_ids = parse_id_list(request.GET.get('store_ids', ''))
+    except ValueError:
+        return Response(
+            {'error': 'product_ids and store_ids must be comma-separated integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not product_ids:
+        return Response(
+            {'error': 'product_ids is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(product_ids) > MAX_AVAILABILITY_PRODUCTS:
+        return Response(
+            {'error': f'At most {MAX_AVAILABILITY_PRODUCTS} product_ids per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    availability = get_availability(product_ids)
+    
+    results = []
+    for product_id in product_ids:
+        quantities = availability[product_id]
+        if store_ids:
+            # Requested stores without an inventory row have none in stock
+            quantities = {store_id: quantities.get(store_id, 0) for store_id in store_ids}
+        stores = [
+            {'store_id': store_id, 'quantity': quantity, 'in_stock': quantity > 0}
+            for store_id, quantity in sorted(quantities.items())
+        ]
+        results.append({
+            'product_id': product_id,
+            'total_quantity': sum(store['quantity'] for store in stores),
+            'stores': stores
+        })
+    
+    return Response({
+        'products': results
+    }, status=status.HTTP_200_OK)
+
+
+@read_from_replica
+@api_view(['GET'])
+def store_sales(request, store_id):
+    """
+    Units sold by a store per hour or day, read from the sales rollups.
+    Parameters: period (hour or day, default day), since and until (ISO
+    dates or datetimes, default the last 48 hours or 30 days), product_id
+    for one product's series, and limit for the number of top products.
+    Periods without sales are left out of the series. rolled_up_at is when
+    orders were last added to the rollups.
+    """
+    store = get_object_or_404(Store, id=store_id)
+    try:
+        options = parse_sales_params(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    in_range = {
+        'store': store,
+        'period': options['period'],
+        'period_start__gte': options['since'],
+        'period_start__lte': options['until'],
+    }
+    if options['product_id'] is not None:
+        rollups = ProductSalesRollup.objects.filter(product_id=options['product_id'], **in_range)
+    else:
+        rollups = StoreSalesRollup.objects.filter(**in_range)
+    series = list(rollups.order_by('period_start').values('period_start', 'units', 'orders'))
+    
+    data = {
+        'store_id': store_id,
+        'store_name': store.name,
+        'period': options['period'],
+        'since': options['since'],
+        'until': options['until'],
+        'product_id': options['product_id'],
+        'units': sum(row['units'] for row in series),
+        'orders': sum(row['orders'] for row in series),
+        'series': series,
+    }
+    if options['product_id'] is None:
+        top_products = ProductSalesRollup.objects.filter(**in_range).values(
+            'product_id', 'product__title'
+        ).annotate(
+            total_units=Sum('units'), total_orders=Sum('orders')
+        ).order_by('-total_units', 'product_id')[:options['limit']]
+        data['top_products'] = [
+            {
+                'product_id': row['product_id'],
+                'title': row['product__title'],
+                'units': row['total_units'],
+                'orders': row['total_orders'],
+            }
+            for row in top_products
+        ]
+    data['rolled_up_at'] = SalesRollupState.objects.filter(pk=1).values_list('updated_at', flat=True).first()
+    
+    return Response(data, status=status.HTTP_200_OK)
@@ -1,14 +1,20 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.http import QueryDict
+from django.db import connection
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from products.models import Category, Product
-from stores.models import Store, Inventory
+from stores.models import Store, Inventory, StockChange
 from orders.models import Order
+from search.facets import facet_cache_keys
 
 
 class OrderAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.category = Category.objects.create(name='Electronics')
         self.product1 = Product.objects.create(
@@ -154,6 +160,7 @@ class StoreAPITest(TestCase):
 
 class SearchAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.category = Category.objects.create(name='Electronics')
         self.product1 = Product.objects.create(
@@ -221,6 +228,7 @@ class SearchAPITest(TestCase):
 
 class SearchEnhancementsTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.category = Category.objects.create(name='Electronics')
         self.store = Store.objects.create(name='Phone Store', location='Test Loc')
@@ -264,4 +272,348 @@ class SearchEnhancementsTest(TestCase):
         self.assertEqual(len(results), 2)
         # P1 (Title match) should be first
         self.assertEqual(results[0]['id'], p1.id)
-        self.assertEqual(results[1]['id'], p2.id)
\ No newline at end of file
+        self.assertEqual(results[1]['id'], p2.id)
+
+
+class SearchFacetsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.electronics = Category.objects.create(name='Electronics')
+        self.books = Category.objects.create(name='Books')
+        self.phone = Product.objects.create(
+            title='Phone', description='Smart phone', price=599.99, category=self.electronics
+        )
+        self.cable = Product.objects.create(
+            title='Phone Cable', description='USB cable', price=9.99, category=self.electronics
+        )
+        self.book = Product.objects.create(
+            title='Phone Repair Guide', description='A book', price=75, category=self.books
+        )
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        Inventory.objects.create(store=self.store, product=self.phone, quantity=3)
+        Inventory.objects.create(store=self.store, product=self.cable, quantity=0)
+
+    def test_search_facet_counts(self):
+        """Test facet counts are computed over the filtered results"""
+        url = reverse('search_products')
+        response = self.client.get(url, {'q': 'phone', 'facets': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        facets = response.data['facets']
+        categories = {row['name']: row['count'] for row in facets['categories']}
+        self.assertEqual(categories, {'Electronics': 2, 'Books': 1})
+        bands = {row['label']: row['count'] for row in facets['price_bands']}
+        self.assertEqual(bands['0-50'], 1)
+        self.assertEqual(bands['50-100'], 1)
+        self.assertEqual(bands['500+'], 1)
+        self.assertEqual(facets['stock'], {'in_stock': 1, 'out_of_stock': 2})
+
+    def test_search_facets_cached(self):
+        """Test facets are cached per normalized query and omitted by default"""
+        url = reverse('search_products')
+        response = self.client.get(url)
+        self.assertNotIn('facets', response.data)
+
+        first = self.client.get(url, {'q': 'Phone', 'facets': 'true', 'page': 1})
+
+        # A cached facet lookup adds no queries on top of the plain search
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(url, {'q': 'phone', 'sort_by': 'price'})
+        with self.assertNumQueries(len(plain)):
+            second = self.client.get(url, {'q': ' phone ', 'facets': 'true', 'sort_by': 'price'})
+        self.assertEqual(first.data['facets'], second.data['facets'])
+
+    def test_search_facets_follow_stock(self):
+        """Test cached stock counts are retired only when a product runs out or comes back"""
+        url = reverse('search_products')
+        params = QueryDict('q=phone&facets=true')
+        response = self.client.get(url, params)
+        self.assertEqual(response.data['facets']['stock'], {'in_stock': 1, 'out_of_stock': 2})
+        counts_key, stock_key = facet_cache_keys(params)
+
+        phone = Inventory.objects.get(product=self.phone)
+        with self.captureOnCommitCallbacks(execute=True):
+            phone.quantity = 2
+            phone.save()
+        self.assertEqual(facet_cache_keys(params), (counts_key, stock_key))
+
+        cable = Inventory.objects.get(product=self.cable)
+        with self.captureOnCommitCallbacks(execute=True):
+            cable.quantity = 4
+            cable.save()
+        self.assertEqual(facet_cache_keys(params)[0], counts_key)
+        self.assertNotEqual(facet_cache_keys(params)[1], stock_key)
+        response = self.client.get(url, params)
+        self.assertEqual(response.data['facets']['stock'], {'in_stock': 2, 'out_of_stock': 1})
+
+
+class SearchCategoryFilterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.electronics = Category.objects.create(name='Electronics')
+        self.home = Category.objects.create(name='Home & Garden')
+        self.books = Category.objects.create(name='Books')
+        self.phone = Product.objects.create(title='Phone', price=599.99, category=self.electronics)
+        self.lamp = Product.objects.create(title='Lamp', price=49.99, category=self.home)
+        self.novel = Product.objects.create(title='Novel', price=12.50, category=self.books)
+
+    def _titles(self, params):
+        response = self.client.get(reverse('search_products'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item['title'] for item in response.data['results'])
+
+    def test_filter_by_category_id_and_slug(self):
+        """Test exact category filtering by id and by slug"""
+        self.assertEqual(self._titles({'category': self.electronics.id}), ['Phone'])
+        self.assertEqual(self._titles({'category': 'home-garden'}), ['Lamp'])
+
+    def test_filter_by_multiple_categories(self):
+        """Test multi-select category filtering with lists and repeated params"""
+        self.assertEqual(
+            self._titles({'category': f'{self.electronics.id},books'}),
+            ['Novel', 'Phone']
+        )
+        self.assertEqual(
+            self._titles({'category': ['electronics', 'home-garden']}),
+            ['Lamp', 'Phone']
+        )
+
+    def test_fuzzy_category_match_is_opt_in(self):
+        """Test partial category names only match with category_match=fuzzy"""
+        self.assertEqual(self._titles({'category': 'Electro'}), [])
+        self.assertEqual(
+            self._titles({'category': 'Electro', 'category_match': 'fuzzy'}),
+            ['Phone']
+        )
+
+
+@override_settings(STOCK_CHANGE_FEED_LAG=0)
+class StockChangeFeedTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(title='Phone', price=10, category=self.category)
+        self.other_product = Product.objects.create(title='Cable', price=2, category=self.category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.other_store = Store.objects.create(name='Other Store', location='456 Other Street')
+        self.inventory = Inventory.objects.create(store=self.store, product=self.product, quantity=10)
+
+    def test_inventory_writes_are_logged(self):
+        """Test saves, orders and deletes append sequenced changes with deltas"""
+        inventory = Inventory.objects.get(id=self.inventory.id)
+        inventory.save()  # Unchanged quantity is not logged
+        inventory.quantity = 25
+        inventory.save()
+
+        self.client.post(reverse('create_order'), {
+            'store_id': self.store.id,
+            'items': [{'product_id': self.product.id, 'quantity_requested': 5}]
+        }, format='json')
+        Inventory.objects.get(id=self.inventory.id).delete()
+
+        changes = list(StockChange.objects.values_list('quantity', 'delta', 'source'))
+        self.assertEqual(changes, [
+            (10, 10, 'update'),
+            (25, 15, 'update'),
+            (20, -5, 'order'),
+            (0, -20, 'update'),
+        ])
+
+    def test_changes_since_cursor(self):
+        """Test consumers page through changes with a cursor and store filter"""
+        Inventory.objects.create(store=self.other_store, product=self.product, quantity=3)
+        Inventory.objects.create(store=self.store, product=self.other_product, quantity=7)
+        url = reverse('stock_changes')
+
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(url, {'cursor': response.data['next_cursor']})
+        self.assertEqual([c['quantity'] for c in response.data['changes']], [7])
+        self.assertFalse(response.data['has_more'])
+
+        cursor = response.data['next_cursor']
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(response.data['changes'], [])
+        self.assertEqual(response.data['next_cursor'], cursor)
+
+        response = self.client.get(url, {'store_id': self.other_store.id})
+        self.assertEqual([c['store'] for c in response.data['changes']], [self.other_store.id])
+
+
+class StoreAvailabilityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(title='Phone', price=10, category=self.category)
+        self.other_product = Product.objects.create(title='Cable', price=2, category=self.category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.other_store = Store.objects.create(name='Other Store', location='456 Other Street')
+        self.inventory = Inventory.objects.create(store=self.store, product=self.product, quantity=10)
+        Inventory.objects.create(store=self.other_store, product=self.product, quantity=0)
+        self.url = reverse('store_availability')
+
+    def test_quantities_across_stores(self):
+        """Test per-store quantities for several products in one request"""
+        response = self.client.get(self.url, {
+            'product_ids': f'{self.product.id},{self.other_product.id}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        phone, cable = response.data['products']
+        self.assertEqual(phone['total_quantity'], 10)
+        self.assertEqual(
+            [(s['store_id'], s['quantity'], s['in_stock']) for s in phone['stores']],
+            [(self.store.id, 10, True), (self.other_store.id, 0, False)]
+        )
+        self.assertEqual(cable['stores'], [])
+
+    def test_store_filter(self):
+        """Test that requested stores are listed even without an inventory row"""
+        response = self.client.get(self.url, {
+            'product_ids': str(self.other_product.id),
+            'store_ids': str(self.store.id)
+        })
+        self.assertEqual(
+            response.data['products'][0]['stores'],
+            [{'store_id': self.store.id, 'quantity': 0, 'in_stock': False}]
+        )
+
+    def test_cached_per_product_and_invalidated(self):
+        """Test that repeat lookups skip the database until stock changes"""
+        params = {'product_ids': str(self.product.id)}
+        self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, params)
+        self.assertFalse(any('stores_inventory' in q['sql'] for q in queries.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventory.quantity = 4
+            self.inventory.save()
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.data['products'][0]['total_quantity'], 4)
+
+    def test_invalid_product_ids(self):
+        """Test validation of the product id list"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'product_ids': '1,abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StoreInventoryPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.electronics = Category.objects.create(name='Electronics')
+        self.books = Category.objects.create(name='Books')
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        for title, price, quantity, category in [
+            ('Cable', 5, 40, self.electronics),
+            ('Charger', 20, 3, self.electronics),
+            ('Novel', 15, 0, self.books),
+            ('Phone', 500, 8, self.electronics),
+            ('Tablet', 300, 2, self.electronics),
+        ]:
+            product = Product.objects.create(title=title, price=price, category=category)
+            Inventory.objects.create(store=self.store, product=product, quantity=quantity)
+        self.url = reverse('store_inventory', kwargs={'store_id': self.store.id})
+
+    def titles(self, response):
+        return [item['product_title'] for item in response.data['inventory']]
+
+    def test_cursor_pages_through_inventory(self):
+        """Test that following next_cursor visits every item once, in title order"""
+        titles = []
+        params = {'limit': 2}
+        while True:
+            response = self.client.get(self.url, params)
+            titles += self.titles(response)
+            if not response.data['pagination']['has_more']:
+                break
+            params['cursor'] = response.data['pagination']['next_cursor']
+        self.assertEqual(titles, ['Cable', 'Charger', 'Novel', 'Phone', 'Tablet'])
+        self.assertIsNone(response.data['pagination']['next_cursor'])
+
+    def test_filters(self):
+        """Test category, stock and price filters"""
+        response = self.client.get(self.url, {'category': 'books'})
+        self.assertEqual(self.titles(response), ['Novel'])
+        response = self.client.get(self.url, {'in_stock': 'true', 'low_stock': 5})
+        self.assertEqual(self.titles(response), ['Charger', 'Tablet'])
+        response = self.client.get(self.url, {'min_price': 10, 'max_price': 300})
+        self.assertEqual(self.titles(response), ['Charger', 'Novel', 'Tablet'])
+
+    def test_pages_cached_separately(self):
+        """Test that each page and filter combination has its own cache entry"""
+        first = self.client.get(self.url, {'limit': 2})
+        self.assertFalse(first.data['from_cache'])
+        self.assertTrue(self.client.get(self.url, {'limit': 2}).data['from_cache'])
+
+        second = self.client.get(self.url, {'limit': 2, 'cursor': first.data['pagination']['next_cursor']})
+        self.assertFalse(second.data['from_cache'])
+        self.assertEqual(self.titles(second), ['Novel', 'Phone'])
+
+    def test_invalid_parameters(self):
+        """Test that malformed cursors and limits are rejected"""
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': 0}, {'low_stock': 'few'}, {'min_price': 'x'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class SparseFieldsetsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            title='Smartphone',
+            description='A very long description ' * 20,
+            price=599.99,
+            category=self.category
+        )
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        Inventory.objects.create(store=self.store, product=self.product, quantity=10)
+        order = Order.objects.create(store=self.store, status=Order.CONFIRMED)
+        order.order_items.create(product=self.product, quantity_requested=2)
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, ' '.join(q['sql'] for q in queries.captured_queries)
+
+    def test_search_fields(self):
+        """Test that search returns and loads only the requested fields"""
+        response, sql = self.get(reverse('search_products'), {'fields': 'id,title'})
+        self.assertEqual(response.data['results'], [{'id': self.product.id, 'title': 'Smartphone'}])
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('products_category', sql)
+
+    def test_search_expand_and_exclude(self):
+        """Test that expand nests the category and exclude drops fields"""
+        response, _ = self.get(reverse('search_products'), {
+            'expand': 'category', 'exclude': 'description,category_name'
+        })
+        result = response.data['results'][0]
+        self.assertNotIn('description', result)
+        self.assertNotIn('category_name', result)
+        self.assertEqual(result['category']['slug'], 'electronics')
+
+    def test_store_orders_nested_fields(self):
+        """Test that dotted paths trim the products nested in order items"""
+        url = reverse('store_orders', kwargs={'store_id': self.store.id})
+        response, sql = self.get(url, {'fields': 'id,total_items,order_items.product.title'})
+        order = response.data['orders'][0]
+        self.assertEqual(order['total_items'], 1)
+        self.assertEqual(order['order_items'], [{'product': {'title': 'Smartphone'}}])
+        self.assertNotIn('"description"', sql)
+
+    def test_inventory_exclude_skips_join(self):
+        """Test that excluding the category name drops the category join"""
+        url = reverse('store_inventory', kwargs={'store_id': self.store.id})
+        response, sql = self.get(url, {'exclude': 'category_name'})
+        self.assertNotIn('category_name', response.data['inventory'][0])
+        self.assertNotIn('products_category', sql)
@@ -0,0 +1,125 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from products.models import Category, Product
+from project.throttling import AnonRateThrottle
+from stores.listing import inventory_page_cache_key
+from stores.models import Store, Inventory
+
+
+class AsyncEndpointTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics')
+        self.product1 = Product.objects.create(
+            title='iPhone 15 Pro',
+            description='Latest Apple smartphone',
+            price=999.99,
+            category=self.category
+        )
+        self.product2 = Product.objects.create(
+            title='Samsung Galaxy S24',
+            description='Latest Samsung smartphone',
+            price=899.99,
+            category=self.category
+        )
+        self.store = Store.objects.create(name='Phone Store', location='456 Phone Avenue')
+        Inventory.objects.create(store=self.store, product=self.product1, quantity=15)
+        Inventory.objects.create(store=self.store, product=self.product2, quantity=0)
+
+    async def test_async_search(self):
+        """Test async search with filters, store stock and facets"""
+        params = {'category': 'electronics', 'sort_by': 'price', 'store_id': self.store.id, 'facets': 'true'}
+        response = await self.async_client.get(reverse('search_products_async'), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [item['title'] for item in data['results']],
+            ['Samsung Galaxy S24', 'iPhone 15 Pro']
+        )
+        self.assertFalse(data['results'][0]['in_stock'])
+        self.assertEqual(data['results'][1]['inventory_quantity'], 15)
+        self.assertEqual(data['pagination']['total_results'], 2)
+        self.assertEqual(data['facets']['stock'], {'in_stock': 1, 'out_of_stock': 1})
+
+    async def test_async_autocomplete(self):
+        """Test async autocomplete suggestions and minimum query length"""
+        url = reverse('autocomplete_products_async')
+        response = await self.async_client.get(url, {'q': 'pro'})
+        self.assertEqual(response.status_code, 200)
+        suggestions = response.json()['suggestions']
+        self.assertEqual(suggestions[0]['title'], 'iPhone 15 Pro')
+        self.assertEqual(suggestions[0]['match_type'], 'general')
+
+        response = await self.async_client.get(url, {'q': 'ip'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_inventory_shares_cache(self):
+        """Test async inventory listing uses the same cache entry as the sync view"""
+        url = reverse('store_inventory_async', kwargs={'store_id': self.store.id})
+        first = await self.async_client.get(url)
+        self.assertFalse(first.json()['from_cache'])
+        self.assertEqual(len(first.json()['inventory']), 2)
+
+        # Same versioned key the sync view reads
+        version = first.json()['version']
+        cache_key = await sync_to_async(inventory_page_cache_key)(self.store.id, version)
+        self.assertIsNotNone(await cache.aget(cache_key))
+        second = await self.async_client.get(url)
+        self.assertTrue(second.json()['from_cache'])
+
+        missing = await self.async_client.get(
+            reverse('store_inventory_async', kwargs={'store_id': self.store.id + 100})
+        )
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_async_inventory_conditional_get(self):
+        """Test async inventory answers If-None-Match and since_version like the sync view"""
+        url = reverse('store_inventory_async', kwargs={'store_id': self.store.id})
+        sync_url = reverse('store_inventory', kwargs={'store_id': self.store.id})
+        first = await self.async_client.get(url)
+        etag = first['ETag']
+        self.assertEqual((await sync_to_async(self.client.get)(sync_url))['ETag'], etag)
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        version = first.json()['version']
+        await Inventory.objects.filter(product=self.product2).adelete()
+        response = await self.async_client.get(url, {'since_version': version})
+        self.assertEqual(response.json()['removed_product_ids'], [self.product2.id])
+        self.assertNotEqual(response['ETag'], etag)
+        response = await self.async_client.get(url, {'since_version': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_search_http_caching(self):
+        """Test async search and autocomplete carry the catalog ETag and Cache-Control of the sync views"""
+        url = reverse('search_products_async')
+        response = await self.async_client.get(url, {'q': 'phone'})
+        self.assertIn('public', response['Cache-Control'])
+        sync_response = await sync_to_async(self.client.get)(reverse('search_products'), {'q': 'phone'})
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+        response = await self.async_client.get(url, {'q': 'phone'}, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(url, {'q': 'phone', 'in_stock': 'true'})
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+        response = await self.async_client.get(reverse('autocomplete_products_async'), {'q': 'pro'})
+        self.assertIn('ETag', response)
+
+    async def test_async_endpoints_are_throttled(self):
+        """Test async endpoints count against the same rate limits as the sync ones"""
+        inventory_url = reverse('store_inventory_async', kwargs={'store_id': self.store.id})
+        with mock.patch.object(AnonRateThrottle, 'rate', '2/min', create=True):
+            self.assertEqual((await self.async_client.get(reverse('search_products_async'))).status_code, 200)
+            self.assertEqual((await self.async_client.get(inventory_url)).status_code, 200)
+
+            response = await self.async_client.get(reverse('search_products_async'))
+            self.assertEqual(response.status_code, 429)
+            self.assertGreater(int(response['Retry-After']), 0)
+            response = await self.async_client.get(reverse('search_products'))
+            self.assertEqual(response.status_code, 429)
@@ -67,4 +67,117 @@ class CacheTest(TestCase):
         updated_quantity = response2.data['inventory'][0]['quantity']
         
         self.assertNotEqual(initial_quantity, updated_quantity)
-        self.assertEqual(updated_quantity, 50)
\ No newline at end of file
+        self.assertEqual(updated_quantity, 50)
+
+
+class InventoryVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(title='Phone', price=199.99, category=self.category)
+        self.cable = Product.objects.create(title='Cable', price=9.99, category=self.category)
+        self.store = Store.objects.create(name='Test Store', location='123 Test Street')
+        self.phone_inventory = Inventory.objects.create(store=self.store, product=self.phone, quantity=5)
+        self.cable_inventory = Inventory.objects.create(store=self.store, product=self.cable, quantity=9)
+        self.url = reverse('store_inventory', kwargs={'store_id': self.store.id})
+
+    def test_not_modified_until_inventory_changes(self):
+        """Test If-None-Match gets a 304 without running the listing query"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(2):
+            # Only the store and version lookups run
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.phone_inventory.quantity = 4
+        self.phone_inventory.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_product_edit_changes_etag(self):
+        """Test that product edits shown in the listing retire the ETag and the cached page"""
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.title = 'Smartphone'
+            self.phone.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Smartphone', [item['product_title'] for item in response.data['inventory']])
+
+    def test_missing_store_gets_not_found(self):
+        """Test that a matching If-None-Match for a missing store still gets a 404"""
+        etag = self.client.get(self.url)['ETag']
+        missing = reverse('store_inventory', kwargs={'store_id': self.store.id + 1})
+        response = self.client.get(missing, HTTP_IF_NONE_MATCH=etag.replace(str(self.store.id), str(self.store.id + 1), 1))
+        self.assertEqual(response.status_code, 404)
+
+    def test_since_version_returns_changed_items(self):
+        """Test since_version returns only changed and removed items"""
+        version = self.client.get(self.url).data['version']
+
+        self.phone_inventory.quantity = 1
+        self.phone_inventory.save()
+        self.cable_inventory.delete()
+
+        response = self.client.get(self.url, {'since_version': version})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data['version'], version)
+        self.assertEqual(
+            [(item['product'], item['quantity']) for item in response.data['inventory']],
+            [(self.phone.id, 1)]
+        )
+        self.assertEqual(response.data['removed_product_ids'], [self.cable.id])
+
+        response = self.client.get(self.url, {'since_version': response.data['version']})
+        self.assertEqual(response.data['inventory'], [])
+
+
+class CatalogHttpCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(title='Phone', price=199.99, category=self.category)
+        self.url = reverse('search_products')
+
+    def test_catalog_search_is_conditional_and_public(self):
+        """Test catalog-only searches carry validators and shared-cache headers"""
+        response = self.client.get(self.url, {'q': 'phone'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.url, {'q': 'phone'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_write_changes_etag(self):
+        """Test product writes move the catalog version after commit"""
+        etag = self.client.get(self.url, {'q': 'phone'})['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 149.99
+            self.product.save()
+
+        response = self.client.get(self.url, {'q': 'phone'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_stock_dependent_search_is_private(self):
+        """Test responses that include stock levels are private and unvalidated"""
+        response = self.client.get(self.url, {'in_stock': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+    def test_autocomplete_is_conditional(self):
+        """Test autocomplete suggestions can be revalidated"""
+        url = reverse('autocomplete_products')
+        response = self.client.get(url, {'q': 'pho'})
+        self.assertIn('public', response['Cache-Control'])
+        response = self.client.get(url, {'q': 'pho'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,119 @@
+import unittest
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import Category, Product
+from stores.models import Store, Inventory
+from project.db_router import (
+    PRIMARY_PIN_COOKIE, PrimaryReplicaRouter, read_from_replica, replica_reads
+)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'])
+class PrimaryReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+
+    def test_reads_inside_atomic_block_use_primary(self):
+        with replica_reads():
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_read_only_view_uses_replica_unless_pinned(self):
+        seen = []
+
+        @read_from_replica
+        def view(request):
+            # Simulate a request served outside the test transaction
+            atomic = connections['default'].in_atomic_block
+            connections['default'].in_atomic_block = False
+            try:
+                seen.append(self.router.db_for_read(Product))
+            finally:
+                connections['default'].in_atomic_block = atomic
+
+        factory = RequestFactory()
+        view(factory.get('/'))
+        self.assertIn(seen[-1], ['replica_0', 'replica_1'])
+
+        pinned = factory.get('/')
+        pinned.COOKIES[PRIMARY_PIN_COOKIE] = '1'
+        view(pinned)
+        self.assertEqual(seen[-1], 'default')
+
+    def test_migrations_only_run_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'products'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'products'))
+
+
+class ReadYourWritesTest(TestCase):
+    def test_create_order_pins_client_to_primary(self):
+        category = Category.objects.create(name='Electronics')
+        product = Product.objects.create(title='Phone', price=10, category=category)
+        store = Store.objects.create(name='Store', location='Street')
+        Inventory.objects.create(store=store, product=product, quantity=5)
+
+        response = APIClient().post(reverse('create_order'), {
+            'store_id': store.id,
+            'items': [{'product_id': product.id, 'quantity_requested': 1}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+
+HAS_REPLICA_ALIAS = 'replica' in settings.DATABASES
+
+
+@unittest.skipUnless(HAS_REPLICA_ALIAS, 'needs the replica alias of project.test_settings')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaAliasTest(TransactionTestCase):
+    # The replica alias mirrors the test database over its own connection;
+    # outside a test transaction the router really sends reads to it
+    databases = {'default', 'replica'} if HAS_REPLICA_ALIAS else {'default'}
+
+    def setUp(self):
+        self.store = Store.objects.create(name='Store', location='Street')
+
+    def queries(self, **cookies):
+        client = APIClient()
+        for name, value in cookies.items():
+            client.cookies[name] = value
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = client.get(reverse('store_orders', args=[self.store.id]))
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        """Test that read-only views query the replica connection and not the primary"""
+        primary, replica = self.queries()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_pinned_reads_go_to_primary(self):
+        """Test that a client pinned after a write reads from the primary"""
+        primary, replica = self.queries(**{PRIMARY_PIN_COOKIE: '1'})
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_availability_misses_read_from_primary(self):
+        """Test that availability cache misses are filled from the primary, not a replica"""
+        category = Category.objects.create(name='Electronics')
+        product = Product.objects.create(title='Phone', price=10, category=category)
+        Inventory.objects.create(store=self.store, product=product, quantity=5)
+        cache.clear()
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = APIClient().get(reverse('store_availability'), {'product_ids': product.id})
+        self.assertEqual(response.data['products'][0]['total_quantity'], 5)
+        self.assertEqual(len(replica), 0)
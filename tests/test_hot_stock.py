@@ -0,0 +1,207 @@
+import os
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from products.models import Category, Product
+from stores import hot_stock
+from stores.models import Store, Inventory, StockChange
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def redis_client():
+    """
+    A real Redis when REDIS_URL is set, else fakeredis (with lupa for Lua).
+    """
+    if os.environ.get('REDIS_URL'):
+        import redis
+        return redis.Redis.from_url(os.environ['REDIS_URL'])
+    return fakeredis.FakeRedis()
+
+
+@override_settings(HOT_STOCK_BACKEND='stores.hot_stock.InMemoryHotStock')
+class HotStockTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        hot_stock._backends.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Electronics')
+        self.console = Product.objects.create(title='Console', price=500, category=category)
+        self.cable = Product.objects.create(title='Cable', price=5, category=category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.console_stock = Inventory.objects.create(store=self.store, product=self.console, quantity=3)
+        self.cable_stock = Inventory.objects.create(store=self.store, product=self.cable, quantity=10)
+        hot_stock.mark_hot(self.store.id, self.console.id)
+        self.backend = hot_stock.get_hot_stock()
+
+    def order(self, consoles, cables=1):
+        return self.client.post(reverse('create_order'), {
+            'store_id': self.store.id,
+            'items': [
+                {'product_id': self.console.id, 'quantity_requested': consoles},
+                {'product_id': self.cable.id, 'quantity_requested': cables},
+            ]
+        }, format='json')
+
+    def test_orders_decrement_hot_stock(self):
+        """Test that hot items are taken from the hot stock store, others from the database"""
+        response = self.order(consoles=2)
+        self.assertEqual(response.data['status'], Order.CONFIRMED)
+        self.assertEqual(self.backend.get(self.store.id, self.console.id), 1)
+        self.console_stock.refresh_from_db()
+        self.cable_stock.refresh_from_db()
+        self.assertEqual(self.console_stock.quantity, 3)  # Not reconciled yet
+        self.assertEqual(self.cable_stock.quantity, 9)
+
+        response = self.order(consoles=2)
+        self.assertEqual(response.data['status'], Order.REJECTED)
+        self.assertEqual(response.data['insufficient_stock'][0]['available'], 1)
+        self.assertEqual(self.backend.get(self.store.id, self.console.id), 1)
+
+    def test_reconcile_writes_pending_deltas(self):
+        """Test that the reconciler applies pending deltas to the database in a batch"""
+        self.order(consoles=1)
+        self.order(consoles=1)
+        self.assertEqual(hot_stock.detect_drift(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(hot_stock.reconcile_hot_stock(), 1)
+        self.console_stock.refresh_from_db()
+        self.assertEqual(self.console_stock.quantity, 1)
+        self.assertEqual(self.backend.pending(), {})
+        change = StockChange.objects.filter(source='hot_stock').get()
+        self.assertEqual((change.quantity, change.delta), (1, -2))
+        self.assertEqual(hot_stock.detect_drift(), [])
+
+    def test_rollback_returns_hot_stock(self):
+        """Test that a failed transaction gives back the stock taken from the hot store"""
+        with self.assertRaises(RuntimeError):
+            with hot_stock.compensate_on_error():
+                hot_stock.decrement_hot_stock(self.store.id, {self.console.id: 2})
+                raise RuntimeError
+        self.assertEqual(self.backend.get(self.store.id, self.console.id), 3)
+        self.assertEqual(self.backend.pending(), {})
+
+    def test_reservations_use_hot_stock(self):
+        """Test that reservations on hot products go through the hot store too"""
+        response = self.client.post(reverse('create_reservation'), {
+            'store_id': self.store.id,
+            'items': [{'product_id': self.console.id, 'quantity_requested': 3}]
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.backend.get(self.store.id, self.console.id), 0)
+
+    def test_unmark_folds_pending_deltas(self):
+        """Test that unmarking writes the pending delta once, even with a reconcile behind it"""
+        self.order(consoles=2)
+        stale = self.backend.pending()
+        with self.captureOnCommitCallbacks(execute=True):
+            hot_stock.unmark_hot(self.store.id, self.console.id)
+        self.console_stock.refresh_from_db()
+        self.assertEqual((self.console_stock.quantity, self.console_stock.is_hot), (1, False))
+        self.assertIsNone(self.backend.get(self.store.id, self.console.id))
+        self.assertEqual(self.backend.pending(), {})
+
+        # A reconcile that read the deltas before the unmark leaves the row alone
+        with mock.patch.object(self.backend, 'pending', return_value=stale):
+            with self.captureOnCommitCallbacks(execute=True):
+                hot_stock.reconcile_hot_stock()
+        self.console_stock.refresh_from_db()
+        self.assertEqual(self.console_stock.quantity, 1)
+        self.assertEqual(self.backend.pending(), {})
+
+    def test_drift_detection(self):
+        """Test that a database change behind the hot store's back is reported"""
+        Inventory.objects.filter(id=self.console_stock.id).update(quantity=7)
+        self.assertEqual(hot_stock.detect_drift(), [{
+            'store_id': self.store.id,
+            'product_id': self.console.id,
+            'hot_quantity': 3,
+            'expected_quantity': 7,
+        }])
+
+    def test_saves_go_through_hot_stock(self):
+        """Test that restocks and corrections saved on a hot row change the hot stock, not the column"""
+        self.order(consoles=2)
+        inventory = Inventory.objects.get(id=self.console_stock.id)
+        inventory.quantity = 0
+        with self.assertRaises(ValueError):
+            inventory.save()  # Takes 3 while the hot stock only has 1 left
+        self.assertEqual(self.backend.get(self.store.id, self.console.id), 1)
+
+        inventory.quantity = 13
+        inventory.save()
+        self.assertEqual(self.backend.get(self.store.id, self.console.id), 11)
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hot_stock.reconcile_hot_stock()
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity, 11)
+        self.assertEqual(hot_stock.detect_drift(), [])
+
+    def test_reconcile_reports_negative_results(self):
+        """Test that a delta taking the row below zero is logged and fed as the change actually written"""
+        self.order(consoles=2)
+        Inventory.objects.filter(id=self.console_stock.id).update(quantity=1)
+        with self.assertLogs('stores.hot_stock', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                hot_stock.reconcile_hot_stock()
+        self.console_stock.refresh_from_db()
+        self.assertEqual(self.console_stock.quantity, 0)
+        change = StockChange.objects.filter(source='hot_stock').get()
+        self.assertEqual((change.quantity, change.delta), (0, -1))
+
+
+class PrefixedRedisHotStock(hot_stock.RedisHotStock):
+    prefix = 'hot_stock_test'
+
+
+@unittest.skipUnless(os.environ.get('REDIS_URL') or fakeredis, 'needs REDIS_URL or fakeredis[lua]')
+class RedisHotStockTest(SimpleTestCase):
+    def setUp(self):
+        self.client = redis_client()
+        self.backend = PrefixedRedisHotStock(self.client)
+        self.addCleanup(lambda: [self.client.delete(key) for key in self.client.scan_iter('hot_stock_test:*')])
+
+    def test_load_and_adjust(self):
+        """Test that the Lua scripts load once, take all or nothing and report short items by product"""
+        self.backend.load(1, 10, 5)
+        self.backend.load(1, 11, 2)
+        self.backend.load(1, 10, 50)  # Already tracked
+        self.assertEqual(self.backend.get(1, 10), 5)
+        self.assertIsNone(self.backend.get(1, 12))
+
+        self.assertEqual(self.backend.decrement(1, {10: 4, 11: 3}), {11: 2})
+        self.assertEqual(self.backend.decrement(1, {10: 4, 11: 2}), {})
+        self.assertEqual((self.backend.get(1, 10), self.backend.get(1, 11)), (1, 0))
+        with self.assertRaises(KeyError) as missing:
+            self.backend.decrement(1, {10: 1, 12: 1, 13: 1})
+        self.assertEqual(missing.exception.args[0], [12, 13])
+
+    def test_pending_and_acknowledge(self):
+        """Test that pending deltas decode per pair and acknowledged ones are removed"""
+        self.backend.load(1, 10, 5)
+        self.backend.load(2, 10, 5)
+        self.backend.decrement(1, {10: 2})
+        self.backend.increment(2, {10: 3})
+        self.assertEqual(self.backend.pending(), {(1, 10): -2, (2, 10): 3})
+
+        self.backend.acknowledge({(1, 10): -2, (2, 10): 1})
+        self.assertEqual(self.backend.pending(), {(2, 10): 2})
+        self.assertFalse(self.client.hexists(self.backend.pending_key, '1:10'))
+
+        # A reload after a flush counts the deltas not yet in the database
+        self.backend.forget(2, 10)
+        self.backend.load(2, 10, 5)
+        self.assertEqual(self.backend.get(2, 10), 7)
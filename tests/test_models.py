@@ -17,6 +17,11 @@ class CategoryModelTest(TestCase):
         with self.assertRaises(IntegrityError):
             Category.objects.create(name='Electronics')
 
+    def test_category_slug_generated(self):
+        self.assertEqual(self.category.slug, 'electronics')
+        other = Category.objects.create(name='Electronics!')
+        self.assertEqual(other.slug, 'electronics-2')
+
 
 class ProductModelTest(TestCase):
     def setUp(self):
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.intake import drain_store
+from orders.models import Order, OutboxMessage
+from products.models import Category, Product
+from project.tasks import drain_pending_orders
+from stores.models import Store, Inventory, StockChange
+
+
+@override_settings(QUEUED_ORDER_INTAKE=True, ORDER_POLL_INTERVAL=0.01)
+class QueuedOrderIntakeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(title='Phone', price=500, category=category)
+        self.cable = Product.objects.create(title='Cable', price=5, category=category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.phone_stock = Inventory.objects.create(store=self.store, product=self.phone, quantity=5)
+        self.cable_stock = Inventory.objects.create(store=self.store, product=self.cable, quantity=10)
+
+    def order(self, phones, cables=1):
+        return self.client.post(reverse('create_order'), {
+            'store_id': self.store.id,
+            'items': [
+                {'product_id': self.phone.id, 'quantity_requested': phones},
+                {'product_id': self.cable.id, 'quantity_requested': cables},
+            ]
+        }, format='json')
+
+    def test_order_accepted_as_pending(self):
+        """Test that queued orders are accepted without touching stock"""
+        response = self.order(phones=2)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Order.PENDING)
+        self.assertEqual(response.data['status_url'], reverse('order_detail', args=[response.data['order']['id']]))
+        self.phone_stock.refresh_from_db()
+        self.assertEqual(self.phone_stock.quantity, 5)
+
+    def test_drain_settles_batch_in_one_transaction(self):
+        """Test that a drain settles queued orders first come, first served with one write per row"""
+        first = self.order(phones=3).data['order']['id']
+        second = self.order(phones=3).data['order']['id']
+        third = self.order(phones=2).data['order']['id']
+
+        with self.captureOnCommitCallbacks():
+            with self.assertNumQueries(13):
+                self.assertEqual(drain_store(self.store.id), 3)
+
+        statuses = dict(Order.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[first], Order.CONFIRMED)
+        self.assertEqual(statuses[second], Order.REJECTED)
+        self.assertEqual(statuses[third], Order.CONFIRMED)
+        self.phone_stock.refresh_from_db()
+        self.cable_stock.refresh_from_db()
+        self.assertEqual(self.phone_stock.quantity, 0)
+        self.assertEqual(self.cable_stock.quantity, 8)
+        self.assertEqual(StockChange.objects.filter(source='order').count(), 2)
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+    def test_commit_schedules_drain(self):
+        """Test that accepting an order schedules its store's drain after the commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            order_id = self.order(phones=1).data['order']['id']
+        self.assertEqual(Order.objects.get(id=order_id).status, Order.CONFIRMED)
+
+    def test_long_poll(self):
+        """Test that status requests wait for pending orders up to the given time"""
+        order_id = self.order(phones=1).data['order']['id']
+        url = reverse('order_detail', args=[order_id])
+
+        response = self.client.get(url, {'wait': '0.05'})
+        self.assertEqual(response.data['status'], Order.PENDING)
+        self.assertEqual(self.client.get(url, {'wait': 'soon'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        drain_store(self.store.id)
+        response = self.client.get(url, {'wait': '5'})
+        self.assertEqual(response.data['status'], Order.CONFIRMED)
+        self.assertEqual(response.data['order']['total_items'], 2)
+
+    async def test_async_poll(self):
+        """Test the async status endpoint"""
+        order = await Order.objects.acreate(store=self.store)
+        response = await self.async_client.get(
+            reverse('order_detail_async', args=[order.id]), {'wait': '0.05'}
+        )
+        self.assertEqual(response.json()['status'], Order.PENDING)
+        response = await self.async_client.get(reverse('order_detail_async', args=[order.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sweep_drains_stale_queues(self):
+        """Test that the sweep schedules drains for orders that waited too long"""
+        order_id = self.order(phones=1).data['order']['id']
+        self.assertEqual(drain_pending_orders()['stores'], [])
+
+        Order.objects.filter(id=order_id).update(created_at=timezone.now() - timedelta(minutes=1))
+        cache.clear()
+        self.assertEqual(drain_pending_orders()['stores'], [self.store.id])
+        self.assertEqual(Order.objects.get(id=order_id).status, Order.CONFIRMED)
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders import rejections
+from orders.models import Order, OrderItem, OrderRejection
+from products.models import Category, Product
+from stores.models import Store, Inventory
+from stores.stock import availability_cache_key, get_availability
+
+
+@override_settings(REJECTION_LOG_BATCH_SIZE=100, REJECTION_LOG_FLUSH_INTERVAL=3600)
+class OrderRejectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        rejections.flush_rejections()
+        self.client = APIClient()
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(title='Phone', price=500, category=category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.phone_stock = Inventory.objects.create(store=self.store, product=self.phone, quantity=2)
+
+    def order(self, phones):
+        return self.client.post(reverse('create_order'), {
+            'store_id': self.store.id,
+            'items': [{'product_id': self.phone.id, 'quantity_requested': phones}]
+        }, format='json')
+
+    def test_precheck_rejects_without_transaction(self):
+        """Test that an order the cached stock rules out is rejected without writing an order"""
+        get_availability([self.phone.id])
+        # Store lookup and the re-read of the short product only: no savepoint, no inserts
+        with self.assertNumQueries(2):
+            response = self.order(phones=3)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], Order.REJECTED)
+        self.assertIsNone(response.data['order'])
+        self.assertEqual(response.data['insufficient_stock'], [
+            {'product_id': self.phone.id, 'available': 2, 'requested': 3}
+        ])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+        self.assertFalse(OrderRejection.objects.exists())  # Still buffered
+        self.assertEqual(rejections.flush_rejections(), 1)
+        rejection = OrderRejection.objects.get()
+        self.assertEqual(rejection.stage, OrderRejection.PRECHECK)
+        self.assertEqual(rejection.store_id, self.store.id)
+        self.assertEqual(rejection.items, {str(self.phone.id): 3})
+
+    def test_stale_cache_rejected_in_transaction(self):
+        """Test that stock gone since the pre-check is rejected in the order transaction"""
+        cache.set(availability_cache_key(self.phone.id), {self.store.id: 5})
+        response = self.order(phones=3)
+
+        self.assertEqual(response.data['status'], Order.REJECTED)
+        self.assertFalse(Order.objects.exists())
+        rejections.flush_rejections()
+        self.assertEqual(OrderRejection.objects.get().stage, OrderRejection.CHECKOUT)
+
+    def test_confirmed_order_passes_precheck(self):
+        """Test that orders within the cached stock go through"""
+        response = self.order(phones=2)
+        self.assertEqual(response.data['status'], Order.CONFIRMED)
+        self.assertEqual(rejections.flush_rejections(), 0)
+
+    @override_settings(REJECTION_LOG_BATCH_SIZE=2)
+    def test_rejections_written_in_batches(self):
+        """Test that buffered rejections are inserted once a batch is full"""
+        self.order(phones=3)
+        self.assertEqual(OrderRejection.objects.count(), 0)
+        self.order(phones=4)
+        self.assertEqual(OrderRejection.objects.count(), 2)
+
+    def test_short_cache_confirmed_on_primary(self):
+        """Test that an order the cache shows short goes through when the database has the stock"""
+        get_availability([self.phone.id])
+        # Restocked without the cache entry being dropped
+        Inventory.objects.filter(id=self.phone_stock.id).update(quantity=5)
+        response = self.order(phones=3)
+        self.assertEqual(response.data['status'], Order.CONFIRMED)
+        self.assertEqual(rejections.flush_rejections(), 0)
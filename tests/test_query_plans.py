@@ -0,0 +1,167 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products.models import Category, Product
+from stores.models import Store, Inventory, StockChange
+from orders.models import Order, OrderItem, ProductSalesRollup, StoreSalesRollup
+from orders.rollups import roll_up_sales
+from search.views import filter_products
+
+
+# Tables that grow with the catalog and order volume
+LARGE_TABLES = {
+    Product._meta.db_table,
+    Inventory._meta.db_table,
+    Order._meta.db_table,
+    OrderItem._meta.db_table,
+    StockChange._meta.db_table,
+    StoreSalesRollup._meta.db_table,
+    ProductSalesRollup._meta.db_table,
+}
+
+
+class QueryPlanTest(TestCase):
+    """
+    Capture the queries each endpoint and the rollup job actually run, EXPLAIN
+    them and fail on sequential scans of large tables, so index regressions
+    show up in the test suite.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create(
+            [Category(name=f'Category {i}', slug=f'category-{i}') for i in range(10)]
+        )
+        products = Product.objects.bulk_create([
+            Product(title=f'Product {i:04d}', price=i % 500 + 1, category=categories[i % 10])
+            for i in range(400)
+        ])
+        stores = Store.objects.bulk_create(
+            [Store(name=f'Store {i}', location='Somewhere') for i in range(10)]
+        )
+        Inventory.objects.bulk_create([
+            Inventory(store=store, product=product, quantity=(product.id + store.id) % 7)
+            for store in stores
+            for product in products
+        ])
+        orders = Order.objects.bulk_create([
+            Order(store=stores[i % 10], status=(Order.CONFIRMED, Order.REJECTED)[i % 2])
+            for i in range(400)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[i % 400], quantity_requested=1)
+            for i, order in enumerate(orders)
+        ])
+        StockChange.objects.bulk_create([
+            StockChange(store=stores[i % 10], product=products[i % 400], quantity=i % 7, delta=1)
+            for i in range(2000)
+        ])
+        cls.store = stores[0]
+        cls.product = products[0]
+        cls.category = categories[0]
+        cls.product_ids = [product.id for product in products]
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are always cheaper to scan; make the planner
+            # prove an index can serve the query instead.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+    def sequential_scans(self, plan):
+        if connection.vendor == 'postgresql':
+            tables = re.findall(r'Seq Scan on (\w+)', plan)
+        else:
+            tables = [
+                match.group(1)
+                for match in re.finditer(r'\bSCAN (\w+)(?: AS \w+)?(?P<index> USING (?:COVERING )?INDEX)?', plan)
+                if not match.group('index')
+            ]
+        return sorted(set(tables) & LARGE_TABLES)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                return '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        self.assertEqual(self.sequential_scans(plan), [], plan)
+
+    def assertQueriesUseIndexes(self, queries):
+        """EXPLAIN the reads and writes captured from the code under test."""
+        explained = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            plan = self.explain(sql)
+            self.assertEqual(self.sequential_scans(plan), [], f'{sql}\n{plan}')
+            explained += 1
+        self.assertGreater(explained, 0)
+
+    def get(self, name, params=None, **kwargs):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, kwargs=kwargs), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertQueriesUseIndexes(queries.captured_queries)
+        return response.json()
+
+    def test_store_inventory_queries(self):
+        params = {'limit': 50}
+        first = self.get('store_inventory', params, store_id=self.store.id)
+        params['cursor'] = first['pagination']['next_cursor']
+        self.get('store_inventory', params, store_id=self.store.id)
+        self.get('store_inventory', {
+            'category': self.category.slug, 'in_stock': '1', 'low_stock': '3', 'limit': 50
+        }, store_id=self.store.id)
+        self.get('store_inventory', {'since_version': 0}, store_id=self.store.id)
+
+    def test_availability_queries(self):
+        product_ids = ','.join(str(product_id) for product_id in self.product_ids[:20])
+        self.get('store_availability', {'product_ids': product_ids})
+        self.get('store_availability', {
+            'product_ids': product_ids, 'store_ids': str(self.store.id)
+        })
+
+    def test_stock_change_feed_queries(self):
+        self.get('stock_changes', {'cursor': 100})
+        self.get('stock_changes', {'cursor': 100, 'store_id': self.store.id})
+
+    def test_store_orders_queries(self):
+        self.get('store_orders', store_id=self.store.id)
+        self.get('store_orders', {'fields': 'id,status,total_items'}, store_id=self.store.id)
+
+    def test_rollup_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            roll_up_sales(batch_size=50)
+        self.assertQueriesUseIndexes(queries.captured_queries)
+        self.get('store_sales', {'period': 'hour'}, store_id=self.store.id)
+        self.get('store_sales', {'product_id': self.product.id}, store_id=self.store.id)
+
+    def test_search_filter_queries(self):
+        params = QueryDict(f'category={self.category.id}')
+        self.assertUsesIndexes(
+            filter_products(params).order_by('price')
+        )
+        params = QueryDict(f'category={self.category.slug}&in_stock=1&store_id={self.store.id}')
+        self.assertUsesIndexes(
+            filter_products(params).order_by('title')
+        )
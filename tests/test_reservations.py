@@ -0,0 +1,128 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.models import Order, Reservation
+from products.models import Category, Product
+from project.tasks import release_expired_reservations
+from stores.models import Store, Inventory, StockChange
+from stores.stock import adjust_stock
+
+
+class ReservationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(title='Phone', price=500, category=category)
+        self.cable = Product.objects.create(title='Cable', price=5, category=category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.phone_stock = Inventory.objects.create(store=self.store, product=self.phone, quantity=5)
+        self.cable_stock = Inventory.objects.create(store=self.store, product=self.cable, quantity=1)
+
+    def reserve(self, phones=2, cables=1):
+        return self.client.post(reverse('create_reservation'), {
+            'store_id': self.store.id,
+            'items': [
+                {'product_id': self.phone.id, 'quantity_requested': phones},
+                {'product_id': self.cable.id, 'quantity_requested': cables},
+            ]
+        }, format='json')
+
+    def quantities(self):
+        self.phone_stock.refresh_from_db()
+        self.cable_stock.refresh_from_db()
+        return self.phone_stock.quantity, self.cable_stock.quantity
+
+    def test_reserve_deducts_stock(self):
+        """Test that a reservation holds the stock and logs the changes"""
+        response = self.reserve()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], Reservation.ACTIVE)
+        self.assertEqual(len(response.data['reservation']['items']), 2)
+        self.assertEqual(self.quantities(), (3, 0))
+        self.assertEqual(
+            StockChange.objects.filter(source='reservation').count(), 2
+        )
+
+    def test_reservation_is_all_or_nothing(self):
+        """Test that a short item rejects the whole hold and keeps stock intact"""
+        response = self.reserve(phones=2, cables=3)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            response.data['insufficient_stock'],
+            [{'product_id': self.cable.id, 'requested': 3}]
+        )
+        self.assertEqual(self.quantities(), (5, 1))
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_confirm_creates_order_without_touching_stock(self):
+        """Test that confirming converts the hold into a confirmed order"""
+        reservation_id = self.reserve().data['reservation']['id']
+        changes = StockChange.objects.count()
+
+        url = reverse('confirm_reservation', kwargs={'reservation_id': reservation_id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], Order.CONFIRMED)
+        self.assertEqual(len(response.data['order']['order_items']), 2)
+        self.assertEqual(self.quantities(), (3, 0))
+        self.assertEqual(StockChange.objects.count(), changes)
+
+        # A hold converts once
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_409_CONFLICT)
+
+    def test_release_returns_stock(self):
+        """Test that releasing a hold puts its stock back"""
+        reservation_id = self.reserve().data['reservation']['id']
+        url = reverse('release_reservation', kwargs={'reservation_id': reservation_id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Reservation.RELEASED)
+        self.assertEqual(self.quantities(), (5, 1))
+
+        confirm = reverse('confirm_reservation', kwargs={'reservation_id': reservation_id})
+        self.assertEqual(self.client.post(confirm).status_code, status.HTTP_409_CONFLICT)
+
+    def test_expired_holds_are_swept(self):
+        """Test that the sweep returns expired stock in batches and blocks confirmation"""
+        first = self.reserve(phones=1, cables=1).data['reservation']['id']
+        # Restock the cable so a second hold can take it too
+        self.cable_stock.quantity = 1
+        self.cable_stock.save()
+        self.reserve(phones=2, cables=1)
+        Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.quantities(), (2, 0))
+
+        confirm = reverse('confirm_reservation', kwargs={'reservation_id': first})
+        response = self.client.post(confirm)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error'], 'Reservation has expired')
+
+        result = release_expired_reservations(batch_size=1)
+        self.assertEqual(result['expired'], 2)
+        self.assertEqual(self.quantities(), (5, 2))
+        self.assertEqual(
+            set(Reservation.objects.values_list('status', flat=True)), {Reservation.EXPIRED}
+        )
+        self.assertEqual(release_expired_reservations()['expired'], 0)
+
+    def test_orders_keep_concurrent_holds(self):
+        """Test that an order deducts on top of a hold placed while it runs"""
+        def hold_then_adjust(store_id, product_id, delta, source=None):
+            if product_id == self.phone.id:
+                # A hold commits between the order's check and its write
+                adjust_stock(store_id, product_id, -1, 'reservation')
+            return adjust_stock(store_id, product_id, delta, source)
+
+        with mock.patch('orders.views.adjust_stock', hold_then_adjust):
+            response = self.client.post(reverse('create_order'), {
+                'store_id': self.store.id,
+                'items': [{'product_id': self.phone.id, 'quantity_requested': 2}]
+            }, format='json')
+        self.assertEqual(response.data['status'], Order.CONFIRMED)
+        self.assertEqual(self.quantities(), (2, 1))
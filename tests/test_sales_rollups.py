@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem, ProductSalesRollup, StoreSalesRollup
+from orders.rollups import roll_up_sales
+from products.models import Category, Product
+from project.tasks import roll_up_sales as roll_up_sales_task
+from stores.models import Store
+
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(title='Phone', price=500, category=category)
+        self.cable = Product.objects.create(title='Cable', price=5, category=category)
+        self.store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+
+    def order(self, at, status=Order.CONFIRMED, phones=0, cables=0):
+        order = Order.objects.create(store=self.store, status=status)
+        Order.objects.filter(id=order.id).update(created_at=at)
+        for product, quantity in [(self.phone, phones), (self.cable, cables)]:
+            if quantity:
+                OrderItem.objects.create(order=order, product=product, quantity_requested=quantity)
+        return order
+
+    def test_incremental_rollup(self):
+        """Test that confirmed orders are added once and other orders are left out"""
+        day = datetime(2026, 3, 2, 9, 15, tzinfo=dt_timezone.utc)
+        self.order(day, phones=1, cables=2)
+        self.order(day + timedelta(minutes=30), cables=3)
+        self.order(day + timedelta(minutes=40), status=Order.REJECTED, phones=5)
+        self.assertEqual(roll_up_sales(batch_size=1), 2)
+        self.assertEqual(roll_up_sales(), 0)
+
+        self.order(day + timedelta(hours=2), phones=2)
+        self.assertEqual(roll_up_sales(), 1)
+
+        hours = StoreSalesRollup.objects.filter(period=StoreSalesRollup.HOUR).order_by('period_start')
+        self.assertEqual([(row.period_start.hour, row.units, row.orders) for row in hours], [(9, 6, 2), (11, 2, 1)])
+        daily = StoreSalesRollup.objects.get(period=StoreSalesRollup.DAY)
+        self.assertEqual((daily.period_start, daily.units, daily.orders), (day.replace(hour=0, minute=0), 8, 3))
+        phone = ProductSalesRollup.objects.get(product=self.phone, period=StoreSalesRollup.DAY)
+        self.assertEqual((phone.units, phone.orders), (3, 2))
+
+    def test_late_confirmations_are_counted(self):
+        """Test that an order confirmed after later orders were rolled up is still counted"""
+        now = datetime.now(dt_timezone.utc)
+        pending = self.order(now, status=Order.PENDING, phones=1)
+        self.order(now, cables=1)
+        self.assertEqual(roll_up_sales_task()['orders_rolled_up'], 1)
+
+        Order.objects.filter(id=pending.id).update(status=Order.CONFIRMED)
+        self.assertEqual(roll_up_sales(), 1)
+        self.assertEqual(roll_up_sales(), 0)
+        daily = StoreSalesRollup.objects.get(period=StoreSalesRollup.DAY)
+        self.assertEqual((daily.units, daily.orders), (2, 2))
+
+    def test_sales_api(self):
+        """Test that the sales endpoint serves series and top products from the rollups"""
+        day = datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc)
+        self.order(day, phones=1, cables=2)
+        self.order(day + timedelta(days=1), cables=4)
+        roll_up_sales()
+        url = reverse('store_sales', args=[self.store.id])
+
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'since': '2026-03-01', 'until': '2026-03-05'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['units'] for row in response.data['series']], [3, 4])
+        self.assertEqual(response.data['units'], 7)
+        self.assertEqual(
+            [(row['title'], row['units'], row['orders']) for row in response.data['top_products']],
+            [('Cable', 6, 2), ('Phone', 1, 1)]
+        )
+        self.assertIsNotNone(response.data['rolled_up_at'])
+
+        response = self.client.get(url, {
+            'period': 'hour', 'product_id': self.phone.id,
+            'since': '2026-03-02T09:30:00Z', 'until': '2026-03-03',
+        })
+        self.assertEqual([row['units'] for row in response.data['series']], [1])
+        self.assertNotIn('top_products', response.data)
+
+        self.assertEqual(self.client.get(url, {'period': 'week'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'since': 'monday'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,158 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from search import backends
+from search.backends.bm25 import BM25Index
+from search.backends.sqlite import SQLiteFTSSearchBackend
+
+
+class BM25IndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add(1, 'Desk Lamp', 'Lighting', 'Warm white light')
+        self.index.add(2, 'Reading Chair', 'Lamp Shop', 'Comfortable chair')
+        self.index.add(3, 'Bookshelf', 'Furniture', 'Pairs well with a lamp')
+        self.index.add(4, 'Desk', 'Furniture', 'Oak desk with drawers')
+
+    def ids(self, query):
+        return [product_id for product_id, _ in self.index.search(query, 10)]
+
+    def test_field_weights(self):
+        """Test that title matches outrank category matches, which outrank description matches"""
+        self.assertEqual(self.ids('lamp'), [1, 2, 3])
+
+    def test_all_terms_required(self):
+        """Test that a product must contain every query term"""
+        self.assertEqual(self.ids('desk lamp'), [1])
+        self.assertEqual(self.ids('desk sofa'), [])
+
+    def test_updates_and_compaction(self):
+        """Test that replaced and removed products leave the results after compaction too"""
+        self.index.add(1, 'Floor Lamp', 'Lighting', '')
+        self.index.remove(3)
+        self.assertEqual(self.ids('lamp'), [1, 2])
+        self.assertEqual(self.ids('desk'), [4])
+        before = self.index.state
+        self.index.compact()
+        self.assertEqual(len(self.index.doc_ids), 3)
+        # A search still holding the old state sees the old numbering whole
+        self.assertEqual(len(before.doc_ids), 5)
+        self.assertEqual(len(before.lengths['title']), 5)
+        self.assertEqual(self.ids('lamp'), [1, 2])
+
+    def test_save_and_map(self):
+        """Test that a saved index maps back with the same results and accepts changes"""
+        self.index.remove(4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'search.idx')
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+            self.assertEqual(loaded.search('lamp', 10), self.index.search('lamp', 10))
+            self.assertEqual(len(loaded), 3)
+
+            loaded.add(5, 'Lamp Shade', 'Lighting', '')
+            loaded.remove(2)
+            self.assertEqual([product_id for product_id, _ in loaded.search('lamp', 10)], [1, 5, 3])
+
+
+@override_settings(SEARCH_BACKEND='search.backends.bm25.BM25SearchBackend', CATALOG_SNAPSHOT=False)
+class BM25SearchBackendTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        backends._backends.clear()
+        self.client = APIClient()
+        self.lighting = Category.objects.create(name='Lighting')
+        self.furniture = Category.objects.create(name='Furniture')
+        Product.objects.create(title='Bookshelf', price=80, category=self.furniture,
+                               description='Pairs well with a lamp')
+        Product.objects.create(title='Desk Lamp', price=30, category=self.furniture)
+        Product.objects.create(title='Bulb', price=5, category=self.lighting)
+
+    def titles(self, **params):
+        response = self.client.get(reverse('search_products'), params)
+        return [item['title'] for item in response.data['results']]
+
+    def test_ranked_search(self):
+        """Test that searches are ranked by BM25 and still filter and sort"""
+        self.assertEqual(self.titles(q='lamp'), ['Desk Lamp', 'Bookshelf'])
+        self.assertEqual(self.titles(q='lamp', sort_by='price'), ['Desk Lamp', 'Bookshelf'])
+        self.assertEqual(self.titles(q='lamp', max_price=50), ['Desk Lamp'])
+        self.assertEqual(self.titles(q='lighting'), ['Bulb'])
+
+    @override_settings(SEARCH_BM25_MAX_RESULTS=1)
+    def test_result_cap_is_reported(self):
+        """Test that the cap on keyword matches is reported with the counts it limits"""
+        response = self.client.get(reverse('search_products'), {'q': 'lamp'})
+        self.assertEqual(response.data['pagination']['total_results'], 1)
+        self.assertEqual(response.data['pagination']['max_results'], 1)
+        response = self.client.get(reverse('search_products'))
+        self.assertNotIn('max_results', response.data['pagination'])
+
+    def test_incremental_updates(self):
+        """Test that committed product and category writes reach the index"""
+        self.assertEqual(self.titles(q='lamp'), ['Desk Lamp', 'Bookshelf'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(title='Lamp', price=20, category=self.lighting)
+            Product.objects.filter(title='Bookshelf').get().delete()
+        self.assertEqual(self.titles(q='lamp'), ['Lamp', 'Desk Lamp'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lighting.name = 'Lamps and Lighting'
+            self.lighting.save()
+        self.assertEqual(self.titles(q='lamps'), ['Bulb', 'Lamp'])
+
+
+@override_settings(CATALOG_SNAPSHOT=False)
+class SQLiteFTSSearchBackendTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        backends._backends.clear()
+        self.client = APIClient()
+        self.lighting = Category.objects.create(name='Lighting')
+        self.furniture = Category.objects.create(name='Furniture')
+        Product.objects.create(title='Bookshelf', price=80, category=self.furniture,
+                               description='Pairs well with a lamp')
+        self.lamp = Product.objects.create(title='Desk Lamp', price=30, category=self.furniture)
+        Product.objects.create(title='Bulb', price=5, category=self.lighting)
+
+    def titles(self, **params):
+        response = self.client.get(reverse('search_products'), params)
+        return [item['title'] for item in response.data['results']]
+
+    def test_default_on_sqlite(self):
+        """Test that SQLite databases with the FTS table use it by default"""
+        self.assertIsInstance(backends.get_search_backend(), SQLiteFTSSearchBackend)
+
+    def test_weighted_prefix_search(self):
+        """Test that words match as prefixes, ranked by the weighted columns"""
+        self.assertEqual(self.titles(q='lamp'), ['Desk Lamp', 'Bookshelf'])
+        self.assertEqual(self.titles(q='lig'), ['Bulb'])
+        self.assertEqual(self.titles(q='desk lamp'), ['Desk Lamp'])
+        self.assertEqual(self.titles(q='lamp', sort_by='price', max_price=100), ['Desk Lamp', 'Bookshelf'])
+        self.assertEqual(self.titles(q='lamp" ('), ['Desk Lamp', 'Bookshelf'])
+        self.assertEqual(self.titles(q='-'), [])
+
+    @override_settings(SEARCH_BM25_MAX_RESULTS=1)
+    def test_same_matches_for_every_sort(self):
+        """Test that the result cap keeps the same best matches whatever the sort order"""
+        self.assertEqual(self.titles(q='lamp'), ['Desk Lamp'])
+        self.assertEqual(self.titles(q='lamp', sort_by='price'), ['Desk Lamp'])
+        self.assertEqual(self.titles(q='lamp', sort_by='newest'), ['Desk Lamp'])
+
+    def test_triggers_keep_index_in_sync(self):
+        """Test that product and category writes of every kind reach the index directly"""
+        Product.objects.bulk_create([Product(title='Lamp Shade', price=12, category=self.lighting)])
+        self.lamp.delete()
+        self.assertEqual(self.titles(q='lamp'), ['Lamp Shade', 'Bookshelf'])
+
+        Product.objects.filter(title='Bulb').update(title='Bulb Lamp')
+        self.furniture.name = 'Oak Furniture'
+        self.furniture.save()
+        self.assertEqual(self.titles(q='lamp', sort_by='title'), ['Bookshelf', 'Bulb Lamp', 'Lamp Shade'])
+        self.assertEqual(self.titles(q='oak'), ['Bookshelf'])
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from products.catalog import bump_catalog_version
+from products.models import Category, Product
+from search import snapshot
+from stores.models import Store, Inventory
+from stores.stock import bump_stock_version
+
+
+@override_settings(CATALOG_SNAPSHOT_STOCK_INTERVAL=0)
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        snapshot._snapshot = None
+        self.client = APIClient()
+        electronics = Category.objects.create(name='Electronics')
+        books = Category.objects.create(name='Books')
+        store = Store.objects.create(name='Tech Store', location='123 Tech Street')
+        self.products = [
+            Product.objects.create(title=title, price=price, category=category)
+            for title, price, category in [
+                ('Phone', 500, electronics),
+                ('Cable', 5, electronics),
+                ('Novel', 15, books),
+                ('Atlas', 15, books),
+                ('Charger', 25, electronics),
+            ]
+        ]
+        self.stock = [
+            Inventory.objects.create(store=store, product=product, quantity=quantity)
+            for product, quantity in zip(self.products, [3, 0, 7, 0, 1])
+        ]
+
+    def search(self, **params):
+        response = self.client.get(reverse('search_products'), params)
+        return [item['title'] for item in response.data['results']], response.data['pagination']
+
+    def test_matches_sql_path(self):
+        """Test that snapshot searches return the same pages as the SQL queries"""
+        cases = [
+            {},
+            {'sort_by': 'price'},
+            {'sort_by': 'newest', 'page_size': 2, 'page': 2},
+            {'category': 'electronics', 'sort_by': 'price'},
+            {'min_price': '10', 'max_price': '25'},
+            {'in_stock': 'true', 'sort_by': 'newest'},
+            {'page': 9, 'page_size': 2},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                with override_settings(CATALOG_SNAPSHOT=False):
+                    expected = self.search(**params)
+                self.assertEqual(self.search(**params), expected)
+
+    def test_title_order_follows_database(self):
+        """Test that titles are ordered by the database collation, not by code point"""
+        category = self.products[0].category
+        with self.captureOnCommitCallbacks(execute=True):
+            for title in ['adapter', 'Éclair Lamp', 'Cable']:
+                Product.objects.create(title=title, price=9, category=category)
+        with override_settings(CATALOG_SNAPSHOT=False):
+            expected = self.search(page_size=20)
+        self.assertEqual(self.search(page_size=20), expected)
+
+    def test_served_without_catalog_query(self):
+        """Test that a warm snapshot only loads the products on the page"""
+        self.search()
+        with self.assertNumQueries(1):
+            titles, pagination = self.search(sort_by='price', page_size=2)
+        self.assertEqual(titles, ['Cable', 'Novel'])  # Price ties go by id
+        self.assertEqual(pagination['total_results'], 5)
+
+    def test_refreshes_on_version_change(self):
+        """Test that catalog and stock version bumps reach the snapshot"""
+        self.assertEqual(self.search(in_stock='true')[0], ['Charger', 'Novel', 'Phone'])
+
+        self.stock[1].quantity = 4
+        self.stock[1].save()
+        bump_stock_version()
+        self.assertEqual(self.search(in_stock='true')[0], ['Cable', 'Charger', 'Novel', 'Phone'])
+
+        Product.objects.create(title='Bookend', price=8, category=self.products[2].category)
+        bump_catalog_version()
+        self.assertEqual(self.search(category='books')[0], ['Atlas', 'Bookend', 'Novel'])
@@ -1,5 +1,15 @@
-from django.test import TestCase
-from project.tasks import send_order_confirmation_email, generate_daily_inventory_summary
+from smtplib import SMTPException
+from unittest import mock
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from orders.models import OutboxMessage
+from project.tasks import (
+    send_order_confirmation_email, send_order_confirmation_batch,
+    generate_daily_inventory_summary, relay_outbox, schedule_outbox_relay
+)
 
 
 class CeleryTaskTest(TestCase):
@@ -14,6 +24,10 @@ class CeleryTaskTest(TestCase):
         self.assertEqual(result['status'], 'success')
         self.assertEqual(result['order_id'], 123)
         self.assertEqual(result['email_sent_to'], 'test@example.com')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Order Confirmation - #123')
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.assertIn('Store: Test Store', mail.outbox[0].body)
 
     def test_generate_daily_inventory_summary(self):
         """Test the inventory summary generation task"""
@@ -46,4 +60,191 @@ class CeleryTaskTest(TestCase):
         summary = result['summary'][0]
         self.assertEqual(summary['store_name'], 'Test Store')
         self.assertEqual(summary['total_products'], 1)
-        self.assertEqual(summary['total_quantity'], 15)
\ No newline at end of file
+        self.assertEqual(summary['total_quantity'], 15)
+
+
+class OutboxTest(TestCase):
+    def test_create_order_writes_outbox_message(self):
+        """Test order confirmation is queued in the outbox and relayed after commit"""
+        from products.models import Category, Product
+        from stores.models import Store, Inventory
+        
+        category = Category.objects.create(name='Test Category')
+        product = Product.objects.create(title='Test Product', price=10, category=category)
+        store = Store.objects.create(name='Test Store', location='123 Test Street')
+        Inventory.objects.create(store=store, product=product, quantity=5)
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = APIClient().post(reverse('create_order'), {
+                'store_id': store.id,
+                'items': [{'product_id': product.id, 'quantity_requested': 1}]
+            }, format='json')
+        
+        self.assertEqual(response.data['status'], 'CONFIRMED')
+        # Stock changes add their own cache invalidation callbacks
+        self.assertEqual(callbacks.count(schedule_outbox_relay), 1)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.topic, OutboxMessage.ORDER_CONFIRMED)
+        self.assertEqual(message.payload['order_id'], response.data['order']['id'])
+        self.assertIsNone(message.dispatched_at)
+
+    def test_relay_outbox_dispatches_pending_messages(self):
+        """Test the relay publishes each pending message once"""
+        messages = [
+            OutboxMessage.objects.create(
+                topic=OutboxMessage.ORDER_CONFIRMED,
+                payload={'order_id': i, 'store_name': 'Store', 'customer_email': 'a@example.com'}
+            )
+            for i in range(3)
+        ]
+        
+        with mock.patch.object(send_order_confirmation_email, 'apply_async') as publish:
+            result = relay_outbox(batch_size=2)
+            self.assertEqual(result['dispatched'], 3)
+            self.assertEqual(publish.call_count, 3)
+            self.assertEqual(
+                publish.call_args_list[0].kwargs['kwargs']['message_id'], messages[0].id
+            )
+            
+            self.assertEqual(relay_outbox()['dispatched'], 0)
+        
+        self.assertFalse(OutboxMessage.objects.filter(dispatched_at__isnull=True).exists())
+
+    def test_redelivered_message_is_ignored(self):
+        """Test a message delivered twice only sends one confirmation"""
+        message = OutboxMessage.objects.create(topic=OutboxMessage.ORDER_CONFIRMED)
+        kwargs = {
+            'order_id': 1,
+            'store_name': 'Store',
+            'customer_email': 'a@example.com',
+            'message_id': message.id
+        }
+        
+        self.assertEqual(send_order_confirmation_email(**kwargs)['status'], 'success')
+        self.assertEqual(send_order_confirmation_email(**kwargs)['status'], 'duplicate')
+
+    def test_failed_send_is_retried(self):
+        """Test a failed send releases the message to the relay after a backoff"""
+        message = OutboxMessage.objects.create(
+            topic=OutboxMessage.ORDER_CONFIRMED, dispatched_at=timezone.now(), attempts=1
+        )
+        kwargs = {
+            'order_id': 1,
+            'store_name': 'Store',
+            'customer_email': 'a@example.com',
+            'message_id': message.id
+        }
+        
+        with mock.patch.object(mail.EmailMessage, 'send', side_effect=SMTPException('mailbox unavailable')):
+            self.assertEqual(send_order_confirmation_email(**kwargs)['status'], 'failed')
+        self.assertEqual(mail.outbox, [])
+        
+        message.refresh_from_db()
+        self.assertIsNone(message.dispatched_at)
+        self.assertIsNone(message.processed_at)
+        self.assertGreater(message.available_at, timezone.now())
+
+
+class BatchedConfirmationTest(TestCase):
+    def setUp(self):
+        self.messages = [
+            OutboxMessage.objects.create(
+                topic=OutboxMessage.ORDER_CONFIRMED,
+                payload={'order_id': i, 'store_name': 'Store', 'customer_email': f'c{i}@example.com'},
+                attempts=1
+            )
+            for i in range(3)
+        ]
+        self.ids = [message.id for message in self.messages]
+
+    @override_settings(ORDER_CONFIRMATION_BATCHING=True, ORDER_CONFIRMATION_BATCH_SIZE=2)
+    def test_relay_groups_confirmations_into_batches(self):
+        """Test the relay publishes confirmations as batch tasks of up to N messages"""
+        with mock.patch.object(send_order_confirmation_batch, 'apply_async') as publish:
+            relay_outbox()
+        
+        batches = [call.kwargs['kwargs']['message_ids'] for call in publish.call_args_list]
+        self.assertEqual(batches, [self.ids[:2], self.ids[2:]])
+
+    def test_batch_sends_over_one_connection(self):
+        """Test a batch renders and sends every confirmation on one connection"""
+        with mock.patch('project.tasks.get_connection', wraps=mail.get_connection) as connect:
+            result = send_order_confirmation_batch(self.ids)
+        
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(result['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].subject, 'Order Confirmation - #0')
+        self.assertIn('Order ID: 0', mail.outbox[0].body)
+        
+        # Redelivered batches do not send again
+        self.assertEqual(send_order_confirmation_batch(self.ids)['skipped'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_message_is_retried_with_backoff(self):
+        """Test one failing message is rescheduled without failing the batch"""
+        original_send = mail.EmailMessage.send
+        
+        def send(message, *args, **kwargs):
+            if message.to == ['c1@example.com']:
+                raise ConnectionError('mailbox unavailable')
+            return original_send(message, *args, **kwargs)
+        
+        with mock.patch.object(mail.EmailMessage, 'send', send):
+            result = send_order_confirmation_batch(self.ids)
+        
+        self.assertEqual((result['sent'], result['failed']), (2, 1))
+        failed = OutboxMessage.objects.get(id=self.ids[1])
+        self.assertIsNone(failed.processed_at)
+        self.assertIsNone(failed.dispatched_at)
+        self.assertGreater(failed.available_at, failed.created_at)
+    
+    def test_interrupted_batch_leaves_unsent_messages(self):
+        """Test a batch stopped partway leaves the unsent messages for its redelivery"""
+        original_send = mail.EmailMessage.send
+        
+        def send(message, *args, **kwargs):
+            if message.to == ['c1@example.com']:
+                raise SystemExit  # The worker is killed mid-send
+            return original_send(message, *args, **kwargs)
+        
+        with mock.patch.object(mail.EmailMessage, 'send', send):
+            with self.assertRaises(SystemExit):
+                send_order_confirmation_batch(self.ids)
+        self.assertEqual(
+            list(OutboxMessage.objects.filter(processed_at__isnull=True).values_list('id', flat=True)),
+            self.ids[1:]
+        )
+        
+        result = send_order_confirmation_batch(self.ids)
+        self.assertEqual((result['sent'], result['skipped']), (2, 1))
+        self.assertEqual([message.to for message in mail.outbox], [['c0@example.com'], ['c1@example.com'], ['c2@example.com']])
+
+
+class CeleryRoutingTest(TestCase):
+    def route(self, task):
+        from project.celery import app
+        return app.amqp.router.route({}, task.name)['queue'].name
+
+    def test_tasks_are_routed_by_class(self):
+        """Test order tasks and long-running jobs use separate queues"""
+        self.assertEqual(self.route(send_order_confirmation_email), 'orders')
+        self.assertEqual(self.route(send_order_confirmation_batch), 'orders')
+        self.assertEqual(self.route(relay_outbox), 'orders')
+        self.assertEqual(self.route(generate_daily_inventory_summary), 'maintenance')
+
+    def test_task_limits(self):
+        """Test long-running jobs are acked late and time limited"""
+        self.assertTrue(generate_daily_inventory_summary.acks_late)
+        self.assertEqual(generate_daily_inventory_summary.time_limit, 1800)
+        self.assertEqual(send_order_confirmation_email.time_limit, 30)
+
+    def test_beat_schedule_runs_periodic_tasks(self):
+        """Test every beat entry points at a registered task"""
+        from project.celery import app
+        app.loader.import_default_modules()
+        scheduled = {entry['task'] for entry in app.conf.beat_schedule.values()}
+        self.assertIn(generate_daily_inventory_summary.name, scheduled)
+        self.assertIn(relay_outbox.name, scheduled)
+        for task_name in scheduled:
+            self.assertIn(task_name, app.tasks)
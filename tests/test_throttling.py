@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory
+
+from project.throttling import SLIDING_WINDOW_SCRIPT, AnonRateThrottle
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class WindowThrottle(AnonRateThrottle):
+    rate = '3/min'
+    scope = 'test_window'
+
+
+class SlidingWindowThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        self.request.user = None
+
+    def check(self, now):
+        throttle = WindowThrottle()
+        with mock.patch.object(WindowThrottle, 'timer', return_value=now):
+            return throttle, throttle.allow_request(self.request, None)
+
+    def test_denies_after_limit(self):
+        """Test that requests over the limit are denied with a wait hint"""
+        for second in (0, 1, 2):
+            self.assertTrue(self.check(600 + second)[1])
+        throttle, allowed = self.check(603)
+        self.assertFalse(allowed)
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_previous_window_is_weighted(self):
+        """Test that the previous window counts in proportion to its overlap"""
+        for second in (50, 51, 52):
+            self.check(600 + second)
+        # 10s into the next window, the previous window still weighs 50/60
+        self.assertTrue(self.check(670)[1])
+        self.assertFalse(self.check(671)[1])
+        # 50s in, it weighs 10/60, leaving room for two more requests
+        self.assertTrue(self.check(710)[1])
+        self.assertTrue(self.check(711)[1])
+        self.assertFalse(self.check(712)[1])
+
+    def test_clients_are_independent(self):
+        """Test that one client's usage does not throttle another"""
+        for second in (0, 1, 2):
+            self.check(600 + second)
+        other = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.2')
+        other.user = None
+        with mock.patch.object(WindowThrottle, 'timer', return_value=603):
+            self.assertTrue(WindowThrottle().allow_request(other, None))
+
+
+@unittest.skipUnless(fakeredis, 'needs fakeredis[lua]')
+class RedisSlidingWindowTest(SimpleTestCase):
+    """The same throttle counted by SLIDING_WINDOW_SCRIPT, as with django-redis"""
+
+    def setUp(self):
+        client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        patcher = mock.patch(
+            'project.throttling._redis_script',
+            return_value=client.register_script(SLIDING_WINDOW_SCRIPT)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        self.request.user = None
+
+    def check(self, now):
+        throttle = WindowThrottle()
+        with mock.patch.object(WindowThrottle, 'timer', return_value=now):
+            return throttle, throttle.allow_request(self.request, None)
+
+    def test_limit_and_retry_after_in_window(self):
+        """Test that the script denies over the limit until the window ends"""
+        for second in (50, 51, 52):
+            self.assertTrue(self.check(600 + second)[1])
+        throttle, allowed = self.check(653)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 7)
+
+    def test_window_boundary_and_retry_after(self):
+        """Test that the previous window decays across the boundary and Retry-After is exact"""
+        for second in (0, 1, 2):
+            self.check(600 + second)
+        # On the boundary the previous window still weighs in full
+        throttle, allowed = self.check(660)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 1)
+        self.assertTrue(self.check(661)[1])
+        
+        throttle, allowed = self.check(662)
+        self.assertFalse(allowed)
+        # 3 * (60 - t) / 60 + 1 < 3 once more than 20s into the window
+        retry_after = throttle.wait()
+        self.assertEqual(retry_after, 19)
+        self.assertFalse(self.check(680)[1])
+        self.assertTrue(self.check(662 + retry_after)[1])
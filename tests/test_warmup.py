@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import TestCase
+
+from products.models import Category, Product
+from project.warmup import warm_caches
+from search.facets import facet_cache_keys
+from search.views import autocomplete_cache_key
+from stores.models import Store, Inventory
+from stores.listing import inventory_page_cache_key
+from stores.stock import get_inventory_version
+
+
+class CacheWarmupTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            title='Phone Charger',
+            price=19.99,
+            category=self.category
+        )
+        self.store = Store.objects.create(name='Test Store', location='123 Test Street')
+        Inventory.objects.create(store=self.store, product=self.product, quantity=5)
+
+    def test_warms_inventory_facets_and_autocomplete(self):
+        """Test that warm-up fills the inventory, facet and autocomplete caches"""
+        report = warm_caches(concurrency=1)
+
+        version = get_inventory_version(self.store.id)
+        self.assertIsNotNone(cache.get(inventory_page_cache_key(self.store.id, version)))
+        for query_string in ['', 'category=electronics']:
+            keys = facet_cache_keys(QueryDict(query_string))
+            self.assertEqual(len(cache.get_many(keys)), 2)
+        self.assertIsNotNone(cache.get(autocomplete_cache_key('pho')))
+        self.assertEqual(report['caches']['inventory']['warmed'], 1)
+        self.assertEqual(report['warmed'], 4)
+
+    def test_second_run_skips_warm_entries(self):
+        """Test that entries already cached for the current version are not rebuilt"""
+        warm_caches(concurrency=1)
+        report = warm_caches(concurrency=1)
+        self.assertEqual(report['warmed'], 0)
+        self.assertEqual(report['caches']['inventory']['skipped'], 1)
+
+    def test_served_from_cache_after_warmup(self):
+        """Test that the inventory endpoint hits the warmed entry"""
+        call_command('warm_caches', concurrency=1, stdout=StringIO())
+        response = self.client.get(f'/stores/{self.store.id}/inventory/')
+        self.assertTrue(response.json()['from_cache'])